@@ -0,0 +1,21 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench
+~~~~~~~~~~~~~~~~~
+
+Benchmark suites for the WeApRous stack.
+
+- http_bench: end-to-end HTTP throughput and latency of the backend engines.
+- micro: parse/serialize hot path microbenchmarks with a regression gate.
+"""
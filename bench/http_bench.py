@@ -0,0 +1,528 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.http_bench
+~~~~~~~~~~~~~~~~~
+
+End-to-end HTTP benchmark for the backend engines. The suite starts a
+:class:`WeApRous <WeApRous>` app in-process and drives it with a built-in
+load generator over real sockets.
+
+Two load models are provided:
+
+- closed loop: ``--concurrency`` workers each send a request, wait for the
+  response and immediately send the next one.
+- open loop: requests are scheduled at a fixed ``--rps`` regardless of how
+  fast the server answers. Latency is measured from the *scheduled* start,
+  so queueing delay is not hidden (no coordinated omission).
+
+Each scenario (static file GET, ``_json`` GET, JSON POST) is run with
+``Connection: keep-alive`` and ``Connection: close`` against every engine
+mode, and the suite reports RPS together with p50/p99/p999 latency.
+
+The ``unix`` engine serves the app on a Unix domain socket; ``proxy-tcp``
+and ``proxy-unix`` put the threaded proxy in front of a backend reached over
+loopback TCP or over a Unix socket, which measures what ``proxy_pass
+unix:/path.sock`` saves per proxied request.
+
+Usage Example:
+--------------
+>>> python -m bench.http_bench --duration 5 --concurrency 16
+>>> python -m bench.http_bench --engines proxy-tcp,proxy-unix --scenarios json
+>>> python -m bench.http_bench --mode open --rps 500 --save bench/http_baseline.json
+>>> python -m bench.http_bench --compare bench/http_baseline.json --max-regression 0.2
+
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from daemon.backend import create_backend
+from daemon.pool import UNIX, connect
+from daemon.proxy import create_proxy
+from daemon.proxyconf import compile_config
+from daemon.response import Response, _json
+from daemon.weaprous import WeApRous
+
+#: JSON body sent by the POST scenario (shape of a chat_room.js message).
+POST_BODY = json.dumps({
+    "from": "peer-peer1",
+    "to": "peer-peer2",
+    "message": "hello from the benchmark",
+    "ts": "12:00:00",
+}).encode("utf-8")
+
+#: Scenario name -> (method, path, body).
+SCENARIOS = {
+    "static": ("GET", "/css/styles.css", b""),
+    "json": ("GET", "/bench/json", b""),
+    "post": ("POST", "/bench/echo", POST_BODY),
+}
+
+
+def build_app():
+    """
+    Build the application under test.
+
+    :rtype WeApRous: app exposing one route per scenario.
+    """
+    app = WeApRous()
+
+    @app.route("/css/styles.css", methods=["GET"])
+    def static_file(req):
+        return Response(req)
+
+    @app.route("/bench/json", methods=["GET"])
+    def json_get(req):
+        return _json({"status": "ok", "active_peers": {"peer-peer1": {"ip": "127.0.0.1", "port": "9003"}}})
+
+    @app.route("/bench/echo", methods=["POST"])
+    def json_post(req):
+        return _json({"status": "ok", "received": req.json})
+
+    return app
+
+
+def free_port(ip="127.0.0.1"):
+    """Return a TCP port that is currently free on ``ip``."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((ip, 0))
+        return s.getsockname()[1]
+
+
+def socket_path():
+    """Return the path of a Unix socket in a fresh temporary directory."""
+    return os.path.join(tempfile.mkdtemp(prefix="weaprous-bench-"), "backend.sock")
+
+
+def wait_listening(address, timeout=5.0):
+    """Block until something accepts connections on ``address``."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with connect(address, 0.2):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError("server on {} did not start".format(address))
+
+
+def start_threaded(app):
+    """
+    Engine ``threaded``: :func:`create_backend` with one thread per connection.
+
+    :rtype tuple: the (ip, port) address the engine listens on.
+    """
+    ip, port = "127.0.0.1", free_port()
+    thread = threading.Thread(target=create_backend, args=(ip, port, app.routes), daemon=True)
+    thread.start()
+    wait_listening((ip, port))
+    return (ip, port)
+
+
+def start_unix(app):
+    """
+    Engine ``unix``: :func:`create_backend` listening on a Unix socket.
+
+    :rtype tuple: the (``UNIX``, path) address the engine listens on.
+    """
+    path = socket_path()
+    thread = threading.Thread(target=create_backend, args=(None, None, app.routes),
+                              kwargs={"unix": path}, daemon=True)
+    thread.start()
+    wait_listening((UNIX, path))
+    return (UNIX, path)
+
+
+def start_proxied(upstream):
+    """
+    Start the threaded proxy forwarding ``bench.local`` to ``upstream``.
+
+    :params upstream (str): ``proxy_pass`` target of the host.
+
+    :rtype tuple: the (ip, port) address the proxy listens on.
+    """
+    routes = compile_config("host bench.local {{ proxy_pass {}; }}".format(upstream))
+    ip, port = "127.0.0.1", free_port()
+    thread = threading.Thread(target=create_proxy, args=(ip, port, routes), daemon=True)
+    thread.start()
+    wait_listening((ip, port))
+    return (ip, port)
+
+
+def start_proxy_tcp(app):
+    """Engine ``proxy-tcp``: the proxy in front of a loopback TCP backend."""
+    ip, port = start_threaded(app)
+    return start_proxied("http://{}:{}".format(ip, port))
+
+
+def start_proxy_unix(app):
+    """Engine ``proxy-unix``: the proxy in front of a Unix socket backend."""
+    return start_proxied("unix:{}".format(start_unix(app)[1]))
+
+
+#: Engine mode name -> starter returning the listening address.
+ENGINES = {
+    "threaded": start_threaded,
+    "unix": start_unix,
+    "proxy-tcp": start_proxy_tcp,
+    "proxy-unix": start_proxy_unix,
+}
+
+
+class HttpClient:
+    """
+    Minimal blocking HTTP/1.1 client used by the load generator.
+
+    With ``keep_alive`` the connection is reused as long as the server does
+    not close it; ``connects`` counts how many connections were opened.
+    """
+
+    def __init__(self, address, keep_alive):
+        self.address = address
+        self.keep_alive = keep_alive
+        self.sock = None
+        self.connects = 0
+
+    def request(self, payload):
+        """
+        Send ``payload`` and read one full response.
+
+        :rtype int: the response status code.
+        """
+        if self.sock is None:
+            self.sock = connect(self.address, 10)
+            self.connects += 1
+        try:
+            self.sock.sendall(payload)
+            status, close = self._read_response()
+        except OSError:
+            self.close()
+            raise
+        if close or not self.keep_alive:
+            self.close()
+        return status
+
+    def _read_response(self):
+        data = b""
+        while b"\r\n\r\n" not in data:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("connection closed before response head")
+            data += chunk
+        head, _, body = data.partition(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        status = int(lines[0].split()[1])
+        length = None
+        close = False
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value.strip())
+            elif name == "connection":
+                close = value.strip().lower() == "close"
+
+        if length is None:
+            # No framing: the body ends when the server closes.
+            while self.sock.recv(65536):
+                pass
+            return status, True
+        remaining = length - len(body)
+        while remaining > 0:
+            chunk = self.sock.recv(min(remaining, 65536))
+            if not chunk:
+                raise ConnectionError("connection closed inside response body")
+            remaining -= len(chunk)
+        return status, close
+
+    def close(self):
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            finally:
+                self.sock = None
+
+
+def build_payload(method, path, body, keep_alive):
+    """Serialize one request of a scenario."""
+    lines = [
+        "{} {} HTTP/1.1".format(method, path),
+        "Host: bench.local",
+        "User-Agent: weaprous-bench",
+        "Accept: */*",
+        "Connection: {}".format("keep-alive" if keep_alive else "close"),
+    ]
+    if body:
+        lines.append("Content-Type: application/json")
+        lines.append("Content-Length: {}".format(len(body)))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100.0 * len(sorted_values)) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+class Recorder:
+    """Thread-safe collector of per-request latencies and errors."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.errors = 0
+        self.connects = 0
+
+    def add(self, latencies, errors, connects):
+        with self.lock:
+            self.latencies.extend(latencies)
+            self.errors += errors
+            self.connects += connects
+
+
+def closed_loop(address, payload, keep_alive, concurrency, duration):
+    """
+    Run ``concurrency`` workers back to back for ``duration`` seconds.
+
+    :rtype tuple: (Recorder, elapsed seconds).
+    """
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def worker():
+        client = HttpClient(address, keep_alive)
+        latencies, errors = [], 0
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= deadline:
+                break
+            try:
+                status = client.request(payload)
+                if status >= 500:
+                    errors += 1
+            except OSError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+        client.close()
+        recorder.add(latencies, errors, client.connects)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder, time.perf_counter() - start
+
+
+def open_loop(address, payload, keep_alive, concurrency, duration, rps):
+    """
+    Issue requests at a fixed rate of ``rps`` for ``duration`` seconds.
+
+    Request ``i`` is scheduled at ``start + i / rps``. ``concurrency`` workers
+    take the next ticket; when all of them are busy the schedule slips and
+    the delay is charged to the requests' latency.
+
+    :rtype tuple: (Recorder, elapsed seconds).
+    """
+    recorder = Recorder()
+    total = int(duration * rps)
+    lock = threading.Lock()
+    next_ticket = [0]
+    start = time.perf_counter() + 0.05
+
+    def worker():
+        client = HttpClient(address, keep_alive)
+        latencies, errors = [], 0
+        while True:
+            with lock:
+                ticket = next_ticket[0]
+                next_ticket[0] += 1
+            if ticket >= total:
+                break
+            scheduled = start + ticket / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                status = client.request(payload)
+                if status >= 500:
+                    errors += 1
+            except OSError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - scheduled)
+        client.close()
+        recorder.add(latencies, errors, client.connects)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder, time.perf_counter() - start
+
+
+def summarize(recorder, elapsed):
+    """Reduce a run to RPS and latency percentiles (milliseconds)."""
+    latencies = sorted(recorder.latencies)
+    return {
+        "requests": len(latencies),
+        "errors": recorder.errors,
+        "connects": recorder.connects,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "p999_ms": round(percentile(latencies, 99.9) * 1000, 3),
+    }
+
+
+def run_suite(engines, scenarios, modes, args):
+    """
+    Run every (engine, scenario, connection mode) combination.
+
+    :rtype list of dict: one result row per combination.
+    """
+    results = []
+    app = build_app()
+    for engine in engines:
+        # The server logs every request; keep the report readable and avoid
+        # measuring the console instead of the stack. The readiness probe is
+        # an empty connection, which the backend reports on stderr.
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            address = ENGINES[engine](app)
+        for scenario in scenarios:
+            method, path, body = SCENARIOS[scenario]
+            for keep_alive in modes:
+                payload = build_payload(method, path, body, keep_alive)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if args.mode == "closed":
+                        recorder, elapsed = closed_loop(address, payload, keep_alive,
+                                                        args.concurrency, args.duration)
+                    else:
+                        recorder, elapsed = open_loop(address, payload, keep_alive,
+                                                      args.concurrency, args.duration, args.rps)
+                row = {
+                    "engine": engine,
+                    "scenario": scenario,
+                    "connection": "keep-alive" if keep_alive else "close",
+                    "mode": args.mode,
+                }
+                row.update(summarize(recorder, elapsed))
+                results.append(row)
+                print_row(row)
+    return results
+
+
+def result_key(row):
+    return "{engine}/{scenario}/{connection}/{mode}".format(**row)
+
+
+def print_header():
+    print("{:<10} {:<8} {:<11} {:<7} {:>9} {:>9} {:>9} {:>9} {:>7} {:>8}".format(
+        "engine", "scenario", "connection", "mode", "rps", "p50 ms", "p99 ms", "p999 ms", "errors", "connects"))
+
+
+def print_row(row):
+    print("{engine:<10} {scenario:<8} {connection:<11} {mode:<7} {rps:>9} {p50_ms:>9} {p99_ms:>9} "
+          "{p999_ms:>9} {errors:>7} {connects:>8}".format(**row))
+
+
+def compare(results, baseline_path, max_regression):
+    """
+    Compare results against a saved run.
+
+    A combination regresses when its RPS drops, or its p99 grows, by more
+    than ``max_regression`` (a fraction).
+
+    :rtype list of str: human readable regressions, empty when none.
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {result_key(row): row for row in json.load(f)["results"]}
+
+    regressions = []
+    for row in results:
+        base = baseline.get(result_key(row))
+        if not base:
+            continue
+        if base["rps"] and row["rps"] < base["rps"] * (1 - max_regression):
+            regressions.append("{}: rps {} -> {}".format(result_key(row), base["rps"], row["rps"]))
+        if base["p99_ms"] and row["p99_ms"] > base["p99_ms"] * (1 + max_regression):
+            regressions.append("{}: p99 {} ms -> {} ms".format(result_key(row), base["p99_ms"], row["p99_ms"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='http_bench', description='End-to-end HTTP benchmark for WeApRous engines')
+    parser.add_argument('--engines', default=",".join(ENGINES),
+        help='Comma separated engine modes. Available: {}'.format(", ".join(ENGINES)))
+    parser.add_argument('--scenarios', default=",".join(SCENARIOS),
+        help='Comma separated scenarios. Available: {}'.format(", ".join(SCENARIOS)))
+    parser.add_argument('--connection', choices=['both', 'keep-alive', 'close'], default='both')
+    parser.add_argument('--mode', choices=['closed', 'open'], default='closed',
+        help='closed: fixed concurrency; open: fixed request rate')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rps', type=float, default=200.0, help='Request rate of the open loop')
+    parser.add_argument('--duration', type=float, default=3.0, help='Seconds per combination')
+    parser.add_argument('--save', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline JSON file to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+        help='Allowed fractional RPS drop / p99 growth before failing. Default is 0.2')
+    args = parser.parse_args(argv)
+
+    engines = [e for e in args.engines.split(",") if e]
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    for name in engines:
+        if name not in ENGINES:
+            parser.error("unknown engine {}".format(name))
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario {}".format(name))
+    modes = {"both": [True, False], "keep-alive": [True], "close": [False]}[args.connection]
+
+    print_header()
+    results = run_suite(engines, scenarios, modes, args)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print("[Bench] Results saved to {}".format(args.save))
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.max_regression)
+        if regressions:
+            print("[Bench] Regressions against {}:".format(args.compare))
+            for line in regressions:
+                print("   " + line)
+            return 1
+        print("[Bench] No regression against {}".format(args.compare))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,397 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+bench.micro
+~~~~~~~~~~~~~~~~~
+
+Microbenchmarks and regression gate for the parse and serialize hot paths:
+:meth:`Request.prepare`, :meth:`Request.prepare_headers`,
+:meth:`Request.prepare_cookies`, :meth:`Response.build_response_header` and
+:class:`CaseInsensitiveDict <CaseInsensitiveDict>` lookups.
+
+Every case runs on a realistic corpus (a browser GET with cookies, a JSON
+POST as sent by ``chat_room.js``, a request with large headers) and records:
+
+- ``ns``: best time per operation over several repeats.
+- ``peak_bytes``: peak memory traced by ``tracemalloc`` during one operation.
+- ``blocks``: memory blocks still allocated per operation when its result is
+  kept alive (what the operation hands back to the caller).
+
+Timings are also stored relative to a fixed pure-Python calibration loop so a
+baseline recorded on one machine can be checked on another. The gate fails
+(exit status 1) when a case is slower, or allocates more, than the baseline
+by more than the configured thresholds.
+
+Usage Example:
+--------------
+>>> python -m bench.micro                 # compare against bench/micro_baseline.json
+>>> python -m bench.micro --update        # record a new baseline
+>>> python -m bench.micro --case prepare --time-threshold 0.3
+
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from daemon.request import Request
+from daemon.response import Response
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "micro_baseline.json")
+
+BROWSER_GET = (
+    "GET /get-list HTTP/1.1\r\n"
+    "Host: app.local:8080\r\n"
+    "Connection: keep-alive\r\n"
+    "sec-ch-ua: \"Chromium\";v=\"124\", \"Google Chrome\";v=\"124\", \"Not-A.Brand\";v=\"99\"\r\n"
+    "sec-ch-ua-mobile: ?0\r\n"
+    "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36\r\n"
+    "sec-ch-ua-platform: \"Windows\"\r\n"
+    "Accept: */*\r\n"
+    "Sec-Fetch-Site: same-origin\r\n"
+    "Sec-Fetch-Mode: cors\r\n"
+    "Sec-Fetch-Dest: empty\r\n"
+    "Referer: http://app.local:8080/\r\n"
+    "Accept-Encoding: gzip, deflate, br\r\n"
+    "Accept-Language: en-US,en;q=0.9,vi;q=0.8\r\n"
+    "Cookie: auth=true; username=peer1\r\n"
+    "\r\n"
+)
+
+_CHAT_BODY = json.dumps({
+    "from": "peer-peer1",
+    "to": "peer-peer2",
+    "message": "Hello peer2, are you there? Let's open a channel.",
+    "ts": "12:34:56",
+})
+
+JSON_POST = (
+    "POST /send-peer HTTP/1.1\r\n"
+    "Host: 192.168.1.3:9003\r\n"
+    "Connection: keep-alive\r\n"
+    "Content-Length: {}\r\n"
+    "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36\r\n"
+    "Content-Type: application/json\r\n"
+    "Accept: */*\r\n"
+    "Origin: http://192.168.1.3:9003\r\n"
+    "Referer: http://192.168.1.3:9003/chat_room.html\r\n"
+    "Accept-Encoding: gzip, deflate, br\r\n"
+    "Accept-Language: en-US,en;q=0.9\r\n"
+    "Cookie: auth=true; username=peer1\r\n"
+    "\r\n"
+    "{}"
+).format(len(_CHAT_BODY), _CHAT_BODY)
+
+LARGE_HEADERS = (
+    "GET /js/chat_channel.js HTTP/1.1\r\n"
+    "Host: app.local:8080\r\n"
+    + "".join("X-Custom-Header-{0}: {1}\r\n".format(i, "v" * 64) for i in range(40))
+    + "Cookie: " + "; ".join("k{0}={1}".format(i, "c" * 24) for i in range(60)) + "; auth=true; username=peer1\r\n"
+    "User-Agent: Mozilla/5.0 (X11; Linux x86_64) Gecko/20100101 Firefox/125.0\r\n"
+    "\r\n"
+)
+
+#: Corpus name -> raw request.
+CORPORA = {
+    "browser_get": BROWSER_GET,
+    "json_post": JSON_POST,
+    "large_headers": LARGE_HEADERS,
+}
+
+
+@contextlib.contextmanager
+def _quiet():
+    """The request parser logs every call; send that to the null device."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _make_prepare(raw):
+    def op():
+        return Request().prepare(raw)
+    return op
+
+
+def _make_prepare_headers(raw):
+    req = Request()
+
+    def op():
+        return req.prepare_headers(raw)
+    return op
+
+
+def _make_prepare_cookies(raw):
+    req = Request()
+    cookies = Request().prepare(raw).headers.get("Cookie", "")
+
+    def op():
+        req.prepare_cookies(cookies)
+        return req.cookies
+    return op
+
+
+def _make_response_header(raw):
+    req = Request().prepare(raw)
+
+    def op():
+        resp = Response(req)
+        resp.status_code = 200
+        resp.headers["Content-Type"] = "application/json"
+        resp.content = b'{"active_peers": {}}'
+        resp.cookies["auth"] = "true"
+        return resp.build_response_header(req)
+    return op
+
+
+def _make_dict_lookup(raw):
+    headers = Request().prepare(raw).headers
+    keys = ("Host", "Content-Type", "Cookie", "cookie", "User-Agent", "Accept", "Origin", "Connection")
+
+    def op():
+        get = headers.get
+        return [get(k) for k in keys]
+    return op
+
+
+#: Case name -> factory building the operation for one raw request.
+CASES = {
+    "prepare": _make_prepare,
+    "prepare_headers": _make_prepare_headers,
+    "prepare_cookies": _make_prepare_cookies,
+    "build_response_header": _make_response_header,
+    "dict_lookup": _make_dict_lookup,
+}
+
+
+def calibrate(loops=200000):
+    """Time a fixed pure-Python workload (ns per iteration)."""
+    best = None
+    for _ in range(5):
+        start = time.perf_counter_ns()
+        d = {}
+        for i in range(loops):
+            d[i & 63] = str(i).lower()
+        elapsed = (time.perf_counter_ns() - start) / loops
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def time_op(op, repeat=5, min_time=0.1):
+    """
+    Best time per call of ``op`` in nanoseconds.
+
+    The loop count is doubled until one repeat lasts ``min_time`` seconds.
+    """
+    loops = 1
+    while True:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            op()
+        if time.perf_counter_ns() - start >= min_time * 1e9:
+            break
+        loops *= 2
+
+    best = None
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            for _ in range(loops):
+                op()
+            per_op = (time.perf_counter_ns() - start) / loops
+            best = per_op if best is None else min(best, per_op)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return best
+
+
+def measure_allocations(op, keep=200):
+    """
+    Measure the memory behaviour of ``op`` with ``tracemalloc``.
+
+    :rtype tuple: (peak bytes of one call, blocks retained per call).
+    """
+    op()  # warm caches (interned strings, lazy imports)
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = op()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        del result
+
+        before = tracemalloc.take_snapshot()
+        results = [op() for _ in range(keep)]
+        after = tracemalloc.take_snapshot()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+        del results
+    finally:
+        tracemalloc.stop()
+    return peak, max(blocks, 0) / keep
+
+
+def measure(case, corpus, repeat, calibration):
+    """Time and trace one case on one corpus."""
+    op = CASES[case](CORPORA[corpus])
+    ns = time_op(op, repeat=repeat)
+    peak, blocks = measure_allocations(op)
+    return {
+        "ns": round(ns, 1),
+        "relative": round(ns / calibration, 3),
+        "peak_bytes": peak,
+        "blocks": round(blocks, 2),
+    }
+
+
+def run(cases, corpora, repeat, rounds=1):
+    """
+    Run the selected cases on the selected corpora.
+
+    :params rounds (int): measurements per case, the fastest one is kept.
+
+    :rtype dict: ``{"calibration_ns": float, "results": {name: metrics}}``.
+    """
+    calibration = calibrate()
+    results = {}
+    with _quiet():
+        for _ in range(rounds):
+            for case in cases:
+                for corpus in corpora:
+                    name = "{}/{}".format(case, corpus)
+                    metrics = measure(case, corpus, repeat, calibration)
+                    if name not in results or metrics["relative"] < results[name]["relative"]:
+                        results[name] = metrics
+    return {"calibration_ns": round(calibration, 3), "results": results}
+
+
+def confirm(current, baseline, args):
+    """
+    Re-measure the cases that failed the gate and keep their best timing.
+
+    Shared machines produce short slowdowns; a real regression shows up on
+    every attempt, noise rarely does.
+    """
+    for _ in range(args.confirm):
+        failing = {line.split(":", 1)[0] for line in
+                   check(current, baseline, args.time_threshold, args.alloc_threshold)}
+        if not failing:
+            break
+        with _quiet():
+            for name in failing:
+                case, corpus = name.split("/", 1)
+                again = measure(case, corpus, args.repeat, current["calibration_ns"])
+                if again["relative"] < current["results"][name]["relative"]:
+                    current["results"][name] = again
+    return check(current, baseline, args.time_threshold, args.alloc_threshold)
+
+
+def check(current, baseline, time_threshold, alloc_threshold):
+    """
+    Compare a run against the baseline.
+
+    :rtype list of str: one line per regression, empty when the gate passes.
+    """
+    failures = []
+    for name, now in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base:
+            continue
+        if now["relative"] > base["relative"] * (1 + time_threshold):
+            failures.append("{}: time {:.0f} ns -> {:.0f} ns ({:+.0%} normalized)".format(
+                name, base["ns"], now["ns"], now["relative"] / base["relative"] - 1))
+        for key in ("peak_bytes", "blocks"):
+            # A couple of blocks/bytes of slack absorbs allocator noise.
+            limit = base[key] * (1 + alloc_threshold) + 2
+            if now[key] > limit:
+                failures.append("{}: {} {} -> {}".format(name, key, base[key], now[key]))
+    return failures
+
+
+def print_report(current, baseline=None):
+    print("calibration: {} ns/iter".format(current["calibration_ns"]))
+    print("{:<42} {:>10} {:>10} {:>11} {:>8}".format("case/corpus", "ns/op", "baseline", "peak bytes", "blocks"))
+    for name, now in current["results"].items():
+        base = (baseline or {}).get("results", {}).get(name)
+        print("{:<42} {:>10} {:>10} {:>11} {:>8}".format(
+            name, now["ns"], base["ns"] if base else "-", now["peak_bytes"], now["blocks"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='micro', description='Hot path microbenchmarks and regression gate')
+    parser.add_argument('--case', action='append', choices=list(CASES),
+        help='Case to run (repeatable). Default: all cases')
+    parser.add_argument('--corpus', action='append', choices=list(CORPORA),
+        help='Corpus to run (repeatable). Default: all corpora')
+    parser.add_argument('--baseline', default=BASELINE, help='Baseline file. Default is {}'.format(BASELINE))
+    parser.add_argument('--update', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--time-threshold', type=float, default=0.25,
+        help='Allowed fractional slowdown (normalized). Default is 0.25')
+    parser.add_argument('--confirm', type=int, default=2,
+        help='Times a failing case is re-measured before it counts. Default is 2')
+    parser.add_argument('--alloc-threshold', type=float, default=0.10,
+        help='Allowed fractional growth of peak bytes / blocks. Default is 0.10')
+    args = parser.parse_args(argv)
+
+    # A baseline is recorded once and compared many times: spend more rounds
+    # on it so that it is not itself a noisy sample.
+    rounds = 3 if args.update else 1
+    current = run(args.case or list(CASES), args.corpus or list(CORPORA), args.repeat, rounds)
+
+    if args.update:
+        if args.case or args.corpus:
+            # Keep the entries that were not re-measured.
+            merged = {"results": {}}
+            if os.path.exists(args.baseline):
+                with open(args.baseline, "r", encoding="utf-8") as f:
+                    merged = json.load(f)
+            merged["calibration_ns"] = current["calibration_ns"]
+            merged["results"].update(current["results"])
+            current = merged
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print_report(current)
+        print("[Bench] Baseline written to {}".format(args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print_report(current)
+        print("[Bench] No baseline at {}, run with --update to create one".format(args.baseline))
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    failures = confirm(current, baseline, args)
+    print_report(current, baseline)
+    if failures:
+        print("[Bench] Regressions against {}:".format(args.baseline))
+        for line in failures:
+            print("   " + line)
+        return 1
+    print("[Bench] No regression against {}".format(args.baseline))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
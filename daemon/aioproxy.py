@@ -0,0 +1,690 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.aioproxy
+~~~~~~~~~~~~~~~~~
+
+This module implements the asyncio engine of the proxy server.
+
+It serves the same routing table as :mod:`daemon.proxy` (the hostname map
+built by ``parse_virtual_hosts``) and resolves backends with the same
+:func:`select_upstream <daemon.proxy.select_upstream>` policies, but
+every client and upstream socket is multiplexed on a single event loop
+instead of being owned by a thread. An idle connection costs a few kilobytes
+of buffers instead of a thread stack, so one process holds thousands of
+concurrent proxied connections.
+
+Messages are framed and relayed exactly like the threaded engine does:
+heads are parsed with :class:`MessageHead <daemon.framing.MessageHead>`,
+bodies are streamed in bounded pieces, waiting for the receiving side to
+drain before reading more, and upstream connections are kept alive and
+reused per backend.
+
+Usage Example:
+--------------
+>>> create_proxy("0.0.0.0", 8080, routes, engine="asyncio")
+
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from . import tracing
+from .cache import CACHE, FRESH, STALE, conditional_headers, lookup_request, render, response_storable
+from .coalesce import SingleFlight, coalesce_key
+from .framing import (CHUNKED, LENGTH, MAX_HEAD_SIZE, NO_BODY, RELAY_BUFFER_SIZE,
+                      UNTIL_CLOSE, FramingError, MessageHead, body_framing, chunk_size)
+from .health import HEALTH
+from .hedge import RequestRetries, get_policy
+from .httpadapter import BAD_REQUEST, KEEPALIVE_TIMEOUT, MAX_KEEPALIVE_REQUESTS
+from .pool import CONNECT_TIMEOUT, IDLE_TTL, MAX_IDLE, READ_TIMEOUT, UNIX, upstream_address
+from .proxy import (HOP_HEADERS, NOT_FOUND, fail_upstream, revalidate_entry, select_alternate,
+                    select_upstream, start_checks)
+from .proxyconf import current_routes, resolve_location
+from .ratelimit import check_limits, too_many_requests
+from .static import static_response
+from .tunnel import TOO_MANY_TUNNELS, TUNNELS, is_upgrade, tunnel_settings
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+#: Pending connections the listening socket may queue.
+BACKLOG = 1024
+
+
+class AsyncConnectionPool:
+    """
+    Idle keep-alive upstream connections of one backend, for the event loop.
+
+    The asyncio counterpart of :class:`ConnectionPool <daemon.pool.ConnectionPool>`;
+    it needs no lock since it is only used from the loop thread.
+
+    :attrs address (tuple): (host, port) of the upstream, or (``UNIX``, path).
+    """
+
+    def __init__(self, address, max_idle=MAX_IDLE, idle_ttl=IDLE_TTL):
+        self.address = address
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        #: (reader, writer, time it became idle), most recently used at the right.
+        self.idle = deque()
+
+    async def acquire(self):
+        """
+        Get a connection, reusing a healthy idle one when possible.
+
+        :rtype tuple: (reader, writer, reused).
+        """
+        now = time.monotonic()
+        while self.idle:
+            reader, writer, since = self.idle.pop()
+            # The loop has already seen the EOF if the backend closed the
+            # connection while it was idle.
+            if now - since < self.idle_ttl and not reader.at_eof():
+                return reader, writer, True
+            writer.close()
+        reader, writer = await self.connect()
+        return reader, writer, False
+
+    async def connect(self):
+        """
+        Open a new connection to the upstream.
+
+        :rtype tuple: (reader, writer).
+        """
+        if self.address[0] == UNIX:
+            connect = asyncio.open_unix_connection(self.address[1], limit=MAX_HEAD_SIZE)
+        else:
+            connect = asyncio.open_connection(*self.address, limit=MAX_HEAD_SIZE)
+        return await asyncio.wait_for(connect, CONNECT_TIMEOUT)
+
+    def release(self, reader, writer):
+        """Return a connection whose last response was fully read."""
+        self.idle.append((reader, writer, time.monotonic()))
+        if len(self.idle) > self.max_idle:
+            self.idle.popleft()[1].close()
+
+
+POOLS = {}
+
+#: Flights of coalesced requests, awaited on the loop.
+FLIGHTS = SingleFlight(asyncio.Event)
+
+
+def get_pool(address):
+    pool = POOLS.get(address)
+    if pool is None:
+        pool = POOLS[address] = AsyncConnectionPool(address)
+    return pool
+
+
+async def read_head(reader, timeout=None):
+    """
+    Read one message head from ``reader``.
+
+    :rtype MessageHead: the head, or None if the peer closed before sending
+                        anything.
+    """
+    try:
+        data = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise FramingError("connection closed inside message head")
+        return None
+    except asyncio.LimitOverrunError:
+        raise FramingError("message head larger than {} bytes".format(MAX_HEAD_SIZE))
+    return MessageHead.parse(data[:-4])
+
+
+async def _relay_exact(reader, writer, size, tee=None):
+    remaining = size
+    while remaining:
+        data = await asyncio.wait_for(reader.read(min(remaining, RELAY_BUFFER_SIZE)), READ_TIMEOUT)
+        if not data:
+            raise FramingError("connection closed inside message body")
+        writer.write(data)
+        if tee is not None:
+            tee += data
+        await writer.drain()
+        remaining -= len(data)
+
+
+async def _read_line(reader):
+    try:
+        return (await asyncio.wait_for(reader.readuntil(b"\r\n"), READ_TIMEOUT))[:-2]
+    except asyncio.IncompleteReadError:
+        raise FramingError("connection closed inside chunked body")
+    except asyncio.LimitOverrunError:
+        raise FramingError("chunk line too long")
+
+
+async def relay_body(reader, writer, framing, tee=None):
+    """
+    Stream a body from ``reader`` to ``writer``, ending at the message end.
+
+    At most ``RELAY_BUFFER_SIZE`` bytes are read before waiting for
+    ``writer`` to drain, which propagates backpressure to the sender. A
+    ``Content-Length`` body is also appended to ``tee`` when given.
+    """
+    kind, length = framing
+    if kind == NO_BODY:
+        return
+
+    if kind == LENGTH:
+        await _relay_exact(reader, writer, length, tee)
+        return
+
+    if kind == CHUNKED:
+        while True:
+            line = await _read_line(reader)
+            # Checked before anything of the chunk is forwarded.
+            size = chunk_size(line)
+            writer.write(line + b"\r\n")
+            if size == 0:
+                while True:
+                    trailer = await _read_line(reader)
+                    writer.write(trailer + b"\r\n")
+                    if not trailer:
+                        await writer.drain()
+                        return
+            await _relay_exact(reader, writer, size + 2)
+
+    # UNTIL_CLOSE
+    while True:
+        data = await asyncio.wait_for(reader.read(RELAY_BUFFER_SIZE), READ_TIMEOUT)
+        if not data:
+            return
+        writer.write(data)
+        await writer.drain()
+
+
+async def hedged_read_head(head, retries, primary, delay):
+    """
+    Read the response head of ``primary``, hedging to a second upstream if
+    none arrives within ``delay`` seconds.
+
+    :params primary (tuple): (reader, writer, host, port, lease, reused) of
+                             the upstream the request was sent to.
+
+    :rtype tuple: (response head, the same fields for the upstream it came
+                  from). The other upstream is dropped.
+    """
+    first = asyncio.ensure_future(read_head(primary[0], READ_TIMEOUT))
+    done, _ = await asyncio.wait([first], timeout=delay)
+    alternate = None if done else retries.next_upstream(hedge=True)
+    if alternate is None:
+        return await first, primary
+
+    host, port, lease = alternate
+    try:
+        up_reader, up_writer, reused = await get_pool((host, port)).acquire()
+        up_writer.write(head.to_bytes())
+    except (OSError, asyncio.TimeoutError) as e:
+        print("[Proxy] Hedge to {}:{} failed: {}".format(host, port, str(e) or type(e).__name__))
+        fail_upstream(host, port, lease, 0.0)
+        return await first, primary
+
+    print("[Proxy] Hedging {} to {}:{}".format(head.start_line, host, port))
+    hedge = (up_reader, up_writer, host, port, lease, reused)
+    second = asyncio.ensure_future(read_head(up_reader, READ_TIMEOUT))
+    done, _ = await asyncio.wait([first, second], return_when=asyncio.FIRST_COMPLETED)
+    tasks = [(first, primary), (second, hedge)]
+    if second in done and first not in done:
+        tasks.reverse()
+    (task, winner), (other, loser) = tasks
+    if task.exception() is not None or task.result() is None:
+        # The first to answer failed: the other one may still succeed.
+        await asyncio.wait([other])
+        (task, winner), (other, loser) = (other, loser), (task, winner)
+    other.cancel()
+    loser[1].close()
+    if loser[4] is not None:
+        loser[4].done()
+    return task.result(), winner
+
+
+async def forward_request(host, port, head, reader, writer, keep_alive, parent, lease=None,
+                          cache_key=None, stale=None, flight=None, retries=None):
+    """
+    Forward one request to a backend and stream the response to the client.
+
+    Same behaviour as :func:`daemon.proxy.forward_request`.
+
+    :rtype bool: True if the client connection can carry another request.
+    """
+    span = tracing.start_span(
+        "forward {}:{}".format(host, port),
+        kind="client",
+        parent=parent,
+        attributes={"net.peer": "{}:{}".format(host, port)},
+    )
+    for name in HOP_HEADERS:
+        head.remove(name)
+    head.set("Connection", "keep-alive")
+    head.set(tracing.TRACEPARENT, span.context.to_header())
+    validators = []
+    if stale is not None and not head.get("If-None-Match") and not head.get("If-Modified-Since"):
+        validators = conditional_headers(stale)
+        for name, value in validators:
+            head.set(name, value)
+    request_framing = body_framing(head)
+    started = time.monotonic()
+    hedge_delay = retries.hedge_delay(head) if retries is not None else None
+
+    try:
+        while True:
+            pool = get_pool((host, port))
+            if retries is not None:
+                retries.tried.append("{}:{}".format(host, port))
+            try:
+                up_reader, up_writer, reused = await pool.acquire()
+            except (OSError, asyncio.TimeoutError) as e:
+                alternate = retries.next_upstream() if retries is not None else None
+                if alternate is None:
+                    raise
+                print("[Proxy] Cannot connect to {}:{} ({}), retrying".format(
+                    host, port, str(e) or type(e).__name__))
+                fail_upstream(host, port, lease, time.monotonic() - started)
+                host, port, lease = alternate
+                span.set_attribute("net.peer", "{}:{}".format(host, port))
+                span.set_attribute("net.retried", True)
+                continue
+            try:
+                up_writer.write(head.to_bytes())
+                await relay_body(reader, up_writer, request_framing)
+                if hedge_delay is not None:
+                    resp, hedged = await hedged_read_head(
+                        head, retries, (up_reader, up_writer, host, port, lease, reused), hedge_delay)
+                    up_reader, up_writer, host, port, lease, reused = hedged
+                    pool = get_pool((host, port))
+                    span.set_attribute("net.peer", "{}:{}".format(host, port))
+                else:
+                    resp = await read_head(up_reader, READ_TIMEOUT)
+                if resp is None:
+                    raise FramingError("upstream closed the connection")
+            except (OSError, FramingError) as e:
+                up_writer.close()
+                if reused and request_framing[0] == NO_BODY and not isinstance(e, asyncio.TimeoutError):
+                    span.set_attribute("net.retried", True)
+                    continue
+                raise
+            break
+    except (OSError, asyncio.TimeoutError, FramingError) as e:
+        print("Socket error: {}".format(e))
+        span.set_attribute("error", str(e) or type(e).__name__)
+        span.finish()
+        fail_upstream(host, port, lease, time.monotonic() - started)
+        writer.write(NOT_FOUND)
+        await writer.drain()
+        return False
+
+    ttfb = time.monotonic() - started
+    ok = True
+    if retries is not None:
+        retries.record(ttfb)
+
+    try:
+        framing = body_framing(resp, request_method=head.method)
+        until_close = framing[0] == UNTIL_CLOSE
+        keep_alive = keep_alive and not until_close
+        span.set_attribute("net.reused", reused)
+        span.set_attribute("http.status_line", resp.start_line)
+
+        if validators and resp.status == 304:
+            CACHE.refresh(stale, resp)
+            for name, _ in validators:
+                head.remove(name)
+            await write_cached(writer, *render(stale, head, keep_alive, status="REVALIDATED"))
+        else:
+            for name in HOP_HEADERS:
+                resp.remove(name)
+            resp.set("Connection", "keep-alive" if keep_alive else "close")
+            storable = False
+            if cache_key is not None:
+                resp.set("X-Cache", "MISS")
+                storable = response_storable(head, resp, framing, CACHE.max_entry_bytes)
+            shared = flight is not None and flight.shareable(resp, framing)
+            tee = bytearray() if storable or shared else None
+            writer.write(resp.to_bytes())
+            await relay_body(up_reader, writer, framing, tee)
+            if storable:
+                CACHE.store(cache_key, resp, tee)
+            if shared:
+                FLIGHTS.complete(flight, resp, tee)
+    except (OSError, asyncio.TimeoutError, FramingError) as e:
+        print("[Proxy] Relay from {}:{} aborted: {}".format(host, port, e))
+        # A body cut short by the upstream counts against it.
+        if isinstance(e, FramingError):
+            ok = False
+        span.set_attribute("error", str(e) or type(e).__name__)
+        up_writer.close()
+        return False
+    finally:
+        span.finish()
+        HEALTH.observe("{}:{}".format(host, port), ttfb, ok)
+        if lease is not None:
+            lease.done(ttfb, ok)
+
+    if resp.keep_alive() and not until_close:
+        pool.release(up_reader, up_writer)
+    else:
+        up_writer.close()
+    return keep_alive
+
+
+async def _pipe(reader, writer, activity, idle):
+    """Copy one direction of a tunnel until EOF, or ``idle`` seconds of silence."""
+    while True:
+        timeout = idle - (time.monotonic() - activity[0])
+        try:
+            data = await asyncio.wait_for(reader.read(RELAY_BUFFER_SIZE), max(timeout, 0))
+        except asyncio.TimeoutError:
+            # The other direction may have carried traffic meanwhile.
+            if time.monotonic() - activity[0] < idle:
+                continue
+            raise
+        if not data:
+            if writer.can_write_eof():
+                writer.write_eof()
+            return
+        activity[0] = time.monotonic()
+        writer.write(data)
+        await writer.drain()
+
+
+async def relay_tunnel(reader, writer, up_reader, up_writer, idle):
+    """
+    Relay bytes both ways between the client and a backend until the tunnel
+    ends, like :func:`daemon.tunnel.relay_tunnel`.
+    """
+    activity = [time.monotonic()]
+    tasks = [asyncio.ensure_future(_pipe(reader, up_writer, activity, idle)),
+             asyncio.ensure_future(_pipe(up_reader, writer, activity, idle))]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+    for task in done:
+        error = task.exception()
+        if isinstance(error, asyncio.TimeoutError):
+            print("[Proxy] Tunnel idle for {:.0f}s, closing".format(idle))
+        elif error is not None:
+            raise error
+
+
+async def tunnel_request(hostname, table, head, reader, writer, addr, params):
+    """
+    Forward a request asking for a protocol upgrade and tunnel the
+    connection once the backend switched protocols.
+
+    Same behaviour as :func:`daemon.proxy.tunnel_request`.
+    """
+    if not TUNNELS.acquire(hostname, params):
+        print("[Proxy] Tunnel limit of {} reached, refusing upgrade".format(hostname))
+        writer.write(TOO_MANY_TUNNELS)
+        return
+    host, port, lease = select_upstream(hostname, table, head, addr)
+    if not host:
+        TUNNELS.release(hostname)
+        writer.write(NOT_FOUND)
+        return
+    host, port = upstream_address(host, port)
+    span = tracing.start_span(
+        "tunnel {}".format(head.start_line),
+        kind="server",
+        parent=tracing.SpanContext.from_header(head.get(tracing.TRACEPARENT)),
+        attributes={"http.host": hostname, "net.peer": "{}:{}".format(host, port)},
+    )
+    for name in ("Keep-Alive", "Proxy-Connection"):
+        head.remove(name)
+    head.set("Connection", "Upgrade")
+    head.set(tracing.TRACEPARENT, span.context.to_header())
+    started = time.monotonic()
+    up_writer = None
+    ttfb = None
+    try:
+        up_reader, up_writer = await get_pool((host, port)).connect()
+        up_writer.write(head.to_bytes())
+        await relay_body(reader, up_writer, body_framing(head))
+        await up_writer.drain()
+        resp = await read_head(up_reader, READ_TIMEOUT)
+        if resp is None:
+            raise FramingError("upstream closed the connection")
+        ttfb = time.monotonic() - started
+        HEALTH.observe("{}:{}".format(host, port), ttfb, True)
+        if lease is not None:
+            lease.done(ttfb, True)
+        span.set_attribute("http.status_line", resp.start_line)
+        if resp.status != 101:
+            for name in HOP_HEADERS:
+                resp.remove(name)
+            resp.set("Connection", "close")
+            writer.write(resp.to_bytes())
+            await relay_body(up_reader, writer, body_framing(resp, request_method=head.method))
+            return
+        writer.write(resp.to_bytes())
+        await writer.drain()
+        print("[Proxy] Tunnel {} to {}:{} opened".format(hostname, host, port))
+        await relay_tunnel(reader, writer, up_reader, up_writer, tunnel_settings(params)["idle"])
+        print("[Proxy] Tunnel {} to {}:{} closed after {:.1f}s".format(
+            hostname, host, port, time.monotonic() - started))
+    except (OSError, asyncio.TimeoutError, FramingError) as e:
+        print("[Proxy] Tunnel to {}:{} failed: {}".format(host, port, str(e) or type(e).__name__))
+        span.set_attribute("error", str(e) or type(e).__name__)
+        if ttfb is None:
+            fail_upstream(host, port, lease, time.monotonic() - started)
+            writer.write(NOT_FOUND)
+    finally:
+        TUNNELS.release(hostname)
+        span.finish()
+        if up_writer is not None:
+            up_writer.close()
+
+
+async def write_cached(writer, head_bytes, body):
+    """Send a response rendered from the cache."""
+    writer.write(head_bytes)
+    if body:
+        # A disk entry is an mmap: copy it so that a later eviction does
+        # not pull the mapping from under the transport.
+        writer.write(body if isinstance(body, bytes) else bytes(body))
+    await writer.drain()
+
+
+async def send_static(writer, root, head, keep_alive):
+    """Answer a request from the files under ``root`` (see :mod:`daemon.static`)."""
+    head_bytes, path, size = static_response(root, head, keep_alive)
+    writer.write(head_bytes)
+    await writer.drain()
+    if path is not None:
+        with open(path, "rb") as f:
+            # os.sendfile on the transport socket, or a plain copy if the
+            # transport cannot.
+            sent = await asyncio.get_running_loop().sendfile(writer.transport, f, 0, size)
+        if sent != size:
+            raise OSError("{} changed while being sent".format(path))
+
+
+async def handle_client(reader, writer, routes):
+    """
+    Serve the requests of one client connection.
+
+    Requests are resolved against ``routes`` with ``select_upstream``
+    and forwarded until the client, or the response framing, ends the
+    connection.
+
+    :params reader (asyncio.StreamReader): client side reader.
+    :params writer (asyncio.StreamWriter): client side writer.
+    :params routes (dict): dictionary mapping hostnames and location.
+    """
+    addr = writer.get_extra_info("peername") or ("", 0)
+    try:
+        for served in range(1, MAX_KEEPALIVE_REQUESTS + 1):
+            try:
+                head = await read_head(reader, KEEPALIVE_TIMEOUT)
+                if head is None:
+                    break
+                # Ambiguous framing is refused before any upstream sees it.
+                body_framing(head)
+            except asyncio.TimeoutError:
+                break
+            except FramingError as e:
+                print("[Proxy] Bad request from {}: {}".format(addr, e))
+                writer.write(BAD_REQUEST)
+                break
+
+            hostname = (head.get("Host") or "").split(":")[0].strip()
+            if not hostname:
+                print(f"[Proxy] Skipping invalid request from {addr}: {head.start_line}")
+                break
+
+            keep_alive = head.keep_alive() and served < MAX_KEEPALIVE_REQUESTS
+            table = current_routes(routes)
+            route = resolve_location(table.get(hostname), head.target)
+            params = route[2] if route and len(route) > 2 else None
+
+            # Limited clients are answered before any upstream is involved.
+            wait = check_limits(params, hostname, head, addr)
+            if wait:
+                keep_alive = keep_alive and body_framing(head)[0] == NO_BODY
+                writer.write(too_many_requests(wait, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+                continue
+
+            root = params.get("root") if params else None
+            if root is not None:
+                keep_alive = keep_alive and body_framing(head)[0] == NO_BODY
+                await send_static(writer, root, head, keep_alive)
+                if not keep_alive:
+                    break
+                continue
+
+            # Upgraded connections (WebSocket) become a tunnel to a backend.
+            if is_upgrade(head):
+                await tunnel_request(hostname, table, head, reader, writer, addr, params)
+                break
+
+            key, entry = lookup_request(route, hostname, head)
+            if entry is not None and entry.state() != STALE:
+                fresh = entry.state() == FRESH
+                await write_cached(writer, *render(entry, head, keep_alive,
+                                                   status="HIT" if fresh else "STALE"))
+                if not fresh:
+                    revalidate_entry(entry, head, hostname, table, addr)
+                if not keep_alive:
+                    break
+                continue
+
+            # Identical requests in flight share the response of the first.
+            flight = None
+            flight_key = coalesce_key(params, hostname, head)
+            if flight_key is not None:
+                flight, leader = FLIGHTS.join(flight_key)
+                if not leader:
+                    try:
+                        await asyncio.wait_for(flight.done.wait(), READ_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        pass
+                    if flight.response is not None:
+                        writer.write(flight.render(keep_alive))
+                        await writer.drain()
+                        if not keep_alive:
+                            break
+                        continue
+                    flight = None
+
+            try:
+                resolved_host, resolved_port, lease = select_upstream(hostname, table, head, addr)
+                try:
+                    resolved_host, resolved_port = upstream_address(resolved_host, resolved_port)
+                except ValueError:
+                    print("[Proxy] Resolved_port is not a valid integer")
+
+                if not resolved_host:
+                    writer.write(NOT_FOUND)
+                    break
+
+                print("[Proxy] Host name {} is forwarded to {}:{}".format(hostname, resolved_host, resolved_port))
+                # Spans are passed explicitly: the current span is thread-local
+                # and every connection shares the loop thread.
+                span = tracing.start_span(
+                    "proxy {}".format(head.start_line),
+                    kind="server",
+                    parent=tracing.SpanContext.from_header(head.get(tracing.TRACEPARENT)),
+                    attributes={"http.host": hostname, "net.peer": "{}:{}".format(*addr[:2])},
+                )
+                retries = None
+                policy = get_policy(hostname, params)
+                if policy is not None:
+                    retries = RequestRetries(policy, lambda exclude: select_alternate(
+                        hostname, table, head, addr, exclude))
+                try:
+                    keep_alive = await forward_request(resolved_host, resolved_port, head,
+                                                       reader, writer, keep_alive, span, lease,
+                                                       key, entry, flight, retries)
+                finally:
+                    span.finish()
+            finally:
+                if flight is not None and not flight.done.is_set():
+                    FLIGHTS.complete(flight)
+            if not keep_alive:
+                break
+        await writer.drain()
+    except (OSError, asyncio.TimeoutError) as e:
+        print("[Proxy] Connection {} aborted: {}".format(addr, e))
+    finally:
+        writer.close()
+
+
+def raise_fd_limit():
+    """Allow as many open sockets as the hard limit permits."""
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+async def serve(ip, port, routes):
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_client(reader, writer, routes),
+        ip, port, limit=MAX_HEAD_SIZE, backlog=BACKLOG, reuse_address=True)
+    print("[Proxy] Listening on IP {} port {} (asyncio engine)".format(ip, port))
+    async with server:
+        await server.serve_forever()
+
+
+def run_aioproxy(ip, port, routes):
+    """
+    Starts the asyncio proxy server and serves until interrupted.
+
+    :params ip (str): IP address to bind the proxy server.
+    :params port (int): port number to listen on.
+    :params routes (dict): dictionary mapping hostnames and location.
+    """
+    tracing.set_service("proxy:{}".format(port))
+    raise_fd_limit()
+    start_checks(routes)
+    try:
+        asyncio.run(serve(ip, port, routes))
+    except OSError as e:
+        print("[Proxy] Socket error: {}".format(e))
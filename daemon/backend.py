@@ -34,20 +34,28 @@ Notes:
 - The current implementation error handling is minimal, socket errors are printed to the console.
 - The actual request processing is delegated to the HttpAdapter class.
 
+A backend on the same machine as the proxy may listen on a Unix domain
+socket instead (``unix="/tmp/app.sock"``, reached with ``proxy_pass
+unix:/tmp/app.sock;``), which skips the TCP/IP stack on every request.
+
 Usage Example:
 --------------
 >>> create_backend("127.0.0.1", 9000, routes={})
+>>> create_backend(None, None, routes={}, unix="/tmp/app.sock")
 
 """
 
+import os
 import socket
+import stat
 import threading
 import traceback
 
+from . import tracing
 from .response import *
 from .httpadapter import HttpAdapter
 
-def handle_client(ip, port, conn, addr, routes):
+def handle_client(ip, port, conn, addr, routes, cors=None):
     """
     Initializes an HttpAdapter instance and delegates the client handling logic to it.
 
@@ -56,9 +64,10 @@ def handle_client(ip, port, conn, addr, routes):
     :param conn (socket.socket): Client connection socket.
     :param addr (tuple): client address (IP, port).
     :param routes (dict): Dictionary of route handlers.
+    :param cors (CorsPolicy): Optional CORS policy answering preflights.
     """
     try:
-        daemon = HttpAdapter(ip, port, conn, addr, routes)
+        daemon = HttpAdapter(ip, port, conn, addr, routes, cors)
 
         # Handle client
         daemon.handle_client(conn, addr, routes)
@@ -75,7 +84,25 @@ def handle_client(ip, port, conn, addr, routes):
             except Exception:
                 pass
 
-def run_backend(ip, port, routes):
+def listen_unix(path):
+    """
+    Bind a stream socket to the Unix socket ``path``.
+
+    A socket file left by a previous run is removed first; any other file
+    at ``path`` is an error.
+
+    :rtype socket.socket: the bound socket.
+    """
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.unlink(path)
+    except FileNotFoundError:
+        pass
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    return server
+
+def run_backend(ip, port, routes, cors=None, unix=None):
     """
     Starts the backend server, binds to the specified IP and port, and listens for incoming
     connections. Each connection is handled in a separate thread. The backend accepts incoming
@@ -85,13 +112,22 @@ def run_backend(ip, port, routes):
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict): Dictionary of route handlers.
+    :param cors (CorsPolicy): Optional CORS policy answering preflights.
+    :param unix (str): Optional Unix socket path to listen on instead of ip:port.
     """
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    tracing.set_service("backend:{}".format("unix:" + unix if unix else port))
 
     try:
-        server.bind((ip, port))
+        if unix:
+            server = listen_unix(unix)
+        else:
+            server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            server.bind((ip, port))
         server.listen(50)
-        print("[Backend] Listening on port {}".format(port))
+        if unix:
+            print("[Backend] Listening on unix socket {}".format(unix))
+        else:
+            print("[Backend] Listening on port {}".format(port))
         if routes != {}:
             print("[Backend] Registered routes:")
             for (method, path), func in routes.items():
@@ -105,7 +141,7 @@ def run_backend(ip, port, routes):
                 #        using multi-thread programming with the
                 #        provided handle_client routine
                 #
-                thread = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes), daemon=True)
+                thread = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes, cors), daemon=True)
                 thread.start()
             except Exception as exc:
                 conn.close()
@@ -113,13 +149,15 @@ def run_backend(ip, port, routes):
     except socket.error as e:
         print("Socket error: {}".format(e))
 
-def create_backend(ip, port, routes={}):
+def create_backend(ip, port, routes={}, cors=None, unix=None):
     """
     Entry point for creating and running the backend server.
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict, optional): Dictionary of route handlers. Defaults to empty dict.
+    :param cors (CorsPolicy, optional): CORS policy answering preflights. Defaults to None.
+    :param unix (str, optional): Unix socket path to listen on instead of ip:port.
     """
 
-    run_backend(ip, port, routes)
\ No newline at end of file
+    run_backend(ip, port, routes, cors, unix)
\ No newline at end of file
@@ -0,0 +1,418 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.balancer
+~~~~~~~~~~~~~~~~~
+
+This module provides the load balancing policies selected by ``dist_policy``
+in ``proxy.conf``.
+
+==============  =============================================  ============
+policy          picks                                          cost/pick
+==============  =============================================  ============
+round-robin     backends in turn                               O(1)
+least-conn      the backend with the fewest requests in flight O(log n)
+weighted        backends in proportion to ``weight=N``         O(1)
+ewma            the lower peak-EWMA latency x load of two      O(1)
+p2c             the less loaded of two random backends         O(1)
+hash            a consistent hash of the request ``hash_key``  O(log n)
+==============  =============================================  ============
+
+Every balancer is thread-safe. A pick returns a :class:`Lease <Lease>` that
+the proxy completes with the request latency, so that busy or slow backends
+automatically receive less traffic.
+
+Usage Example:
+--------------
+>>> balancer = get_balancer("app.local", ["127.0.0.1:9001", "127.0.0.1:9002"], "ewma")
+>>> lease = balancer.acquire()
+>>> lease.backend
+'127.0.0.1:9001'
+>>> lease.done(latency=0.012)
+
+"""
+
+import bisect
+import hashlib
+import math
+import random
+import threading
+import time
+from http.cookies import CookieError, SimpleCookie
+
+#: Decay time constant (seconds) of the ewma policy.
+EWMA_DECAY = 10.0
+#: Latency sample (seconds) recorded for a failed request.
+FAILURE_PENALTY = 1.0
+#: Points of each backend (times its weight) on the hash ring.
+VIRTUAL_NODES = 160
+
+
+class Lease:
+    """
+    One request dispatched to a backend.
+
+    :attrs backend (str): chosen ``host:port``.
+    """
+
+    __slots__ = ("balancer", "index", "backend", "finished")
+
+    def __init__(self, balancer, index, backend):
+        self.balancer = balancer
+        self.index = index
+        self.backend = backend
+        self.finished = False
+
+    def done(self, latency=None, ok=True):
+        """
+        Report the end of the request; later calls are ignored.
+
+        :params latency (float): seconds until the response head, None if
+                                 the request was not measured.
+        :params ok (bool): False if the backend failed to answer.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        if not ok:
+            latency = max(latency or 0.0, FAILURE_PENALTY)
+        self.balancer.release(self.index, latency, ok)
+
+
+class Balancer:
+    """
+    Base policy: picks backends in turn (``round-robin``).
+
+    :attrs backends (list): ``host:port`` strings.
+    :attrs active (list): requests in flight per backend.
+    """
+
+    def __init__(self, backends, weights=None):
+        self.backends = list(backends)
+        self.active = [0] * len(self.backends)
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def pick(self, key=None):
+        """
+        Index of the next backend, called with the lock held.
+
+        :params key (str): request affinity key, only used by ``hash``.
+        """
+        index = self.counter % len(self.backends)
+        self.counter += 1
+        return index
+
+    def fallback(self, index, key, available):
+        """
+        Replacement for an unavailable pick: the next available backend.
+
+        Only walked when backends are ejected. If none is available the
+        original pick is kept, trying a backend beats refusing the request.
+        """
+        count = len(self.backends)
+        for step in range(1, count):
+            candidate = (index + step) % count
+            if available(self.backends[candidate]):
+                return candidate
+        return index
+
+    def acquire(self, key=None, available=None):
+        """
+        Choose a backend for a new request.
+
+        :params key (str): request affinity key, only used by ``hash``.
+        :params available (callable): ``available(backend)`` tells whether a
+                                      backend may be used (health state).
+
+        :rtype Lease: the choice, to be completed with :meth:`Lease.done`.
+        """
+        with self.lock:
+            index = self.pick(key)
+            if available is not None and not available(self.backends[index]):
+                index = self.fallback(index, key, available)
+            self.active[index] += 1
+            self.on_acquire(index)
+        return Lease(self, index, self.backends[index])
+
+    def release(self, index, latency, ok):
+        with self.lock:
+            self.active[index] -= 1
+            self.on_release(index, latency, ok)
+
+    def on_acquire(self, index):
+        pass
+
+    def on_release(self, index, latency, ok):
+        pass
+
+
+class LeastConnBalancer(Balancer):
+    """
+    ``least-conn``: the backend with the fewest requests in flight.
+
+    Backends live in a binary min-heap keyed on (in flight, last pick) with
+    an index of heap positions, so that a pick and a completion both update
+    one entry in O(log n). Ties go to the backend picked least recently.
+    """
+
+    def __init__(self, backends, weights=None):
+        super().__init__(backends)
+        self.heap = list(range(len(self.backends)))
+        self.position = list(range(len(self.backends)))
+        self.last = [0] * len(self.backends)
+
+    def _key(self, index):
+        return (self.active[index], self.last[index])
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.position[heap[i]] = i
+        self.position[heap[j]] = j
+
+    def _sift(self, pos):
+        heap = self.heap
+        while pos > 0:
+            parent = (pos - 1) // 2
+            if self._key(heap[pos]) >= self._key(heap[parent]):
+                break
+            self._swap(pos, parent)
+            pos = parent
+        size = len(heap)
+        while True:
+            smallest = pos
+            for child in (2 * pos + 1, 2 * pos + 2):
+                if child < size and self._key(heap[child]) < self._key(heap[smallest]):
+                    smallest = child
+            if smallest == pos:
+                return
+            self._swap(pos, smallest)
+            pos = smallest
+
+    def pick(self, key=None):
+        self.counter += 1
+        return self.heap[0]
+
+    def on_acquire(self, index):
+        self.last[index] = self.counter
+        self._sift(self.position[index])
+
+    def on_release(self, index, latency, ok):
+        self._sift(self.position[index])
+
+
+class WeightedBalancer(Balancer):
+    """
+    ``weighted``: backends in proportion to their ``weight=N``.
+
+    The smooth weighted round-robin sequence (the one of nginx, which spreads
+    the picks of a heavy backend instead of sending them in a burst) is
+    computed once; picking walks it in O(1).
+    """
+
+    def __init__(self, backends, weights=None):
+        super().__init__(backends)
+        weights = list(weights or [1] * len(self.backends))
+        divisor = 0
+        for weight in weights:
+            divisor = math.gcd(divisor, weight)
+        weights = [w // divisor for w in weights]
+
+        current = [0] * len(weights)
+        total = sum(weights)
+        self.schedule = []
+        for _ in range(total):
+            for i, weight in enumerate(weights):
+                current[i] += weight
+            best = max(range(len(weights)), key=current.__getitem__)
+            current[best] -= total
+            self.schedule.append(best)
+
+    def pick(self, key=None):
+        index = self.schedule[self.counter % len(self.schedule)]
+        self.counter += 1
+        return index
+
+
+class P2CBalancer(Balancer):
+    """
+    ``p2c``: power of two choices, the less loaded of two random backends.
+
+    Nearly as good as scanning for the least loaded backend, in O(1), and
+    without the herd effect of always picking the same minimum.
+    """
+
+    def __init__(self, backends, weights=None):
+        super().__init__(backends)
+        self.random = random.Random()
+
+    def cost(self, index):
+        return self.active[index]
+
+    def pick(self, key=None):
+        if len(self.backends) == 1:
+            return 0
+        a, b = self.random.sample(range(len(self.backends)), 2)
+        return a if self.cost(a) <= self.cost(b) else b
+
+
+class EwmaBalancer(P2CBalancer):
+    """
+    ``ewma``: power of two choices on peak-EWMA latency times load.
+
+    Each backend keeps an exponentially weighted moving average of its
+    response latency that jumps up immediately on a slower sample (peak) and
+    decays with ``EWMA_DECAY``, towards new samples and, while none arrive,
+    towards zero. The cost ``ewma * (in flight + 1)`` steers
+    traffic away from backends that are slow or already busy.
+    """
+
+    def __init__(self, backends, weights=None):
+        super().__init__(backends)
+        self.ewma = [0.0] * len(self.backends)
+        self.stamp = [time.monotonic()] * len(self.backends)
+
+    def decayed(self, index, now):
+        """
+        EWMA of a backend decayed towards zero since its last sample, so
+        that a backend left idle after a slow answer or a failure is tried
+        again and measured anew instead of being starved.
+        """
+        return self.ewma[index] * math.exp(-(now - self.stamp[index]) / EWMA_DECAY)
+
+    def cost(self, index):
+        return self.decayed(index, time.monotonic()) * (self.active[index] + 1)
+
+    def on_release(self, index, latency, ok):
+        if latency is None:
+            return
+        now = time.monotonic()
+        current = self.decayed(index, now)
+        if latency > current:
+            self.ewma[index] = latency
+        else:
+            weight = math.exp(-(now - self.stamp[index]) / EWMA_DECAY)
+            self.ewma[index] = current + latency * (1 - weight)
+        self.stamp[index] = now
+
+
+class HashBalancer(Balancer):
+    """
+    ``hash``: session affinity through a consistent hash ring.
+
+    Every backend owns ``VIRTUAL_NODES`` x weight points on a 64-bit ring; a
+    request goes to the first point following the hash of its key. Adding or
+    removing one of N backends only moves the keys of the arcs it owns, about
+    1/N of them, so the other backends keep their users and warm caches.
+    Requests without a key are spread in turn.
+    """
+
+    def __init__(self, backends, weights=None):
+        super().__init__(backends)
+        weights = list(weights or [1] * len(self.backends))
+        points = []
+        for index, backend in enumerate(self.backends):
+            for vnode in range(VIRTUAL_NODES * weights[index]):
+                points.append((ring_hash("{}#{}".format(backend, vnode)), index))
+        points.sort()
+        self.ring = [point for point, _ in points]
+        self.owners = [index for _, index in points]
+
+    def pick(self, key=None):
+        if key is None:
+            return super().pick()
+        pos = bisect.bisect(self.ring, ring_hash(key))
+        return self.owners[pos % len(self.ring)]
+
+    def fallback(self, index, key, available):
+        # Keep walking the ring: users of an ejected backend spread over the
+        # others while everybody else keeps their backend.
+        if key is None:
+            return super().fallback(index, key, available)
+        pos = bisect.bisect(self.ring, ring_hash(key))
+        for step in range(1, len(self.ring)):
+            candidate = self.owners[(pos + step) % len(self.ring)]
+            if candidate != index and available(self.backends[candidate]):
+                return candidate
+        return index
+
+
+def ring_hash(value):
+    """Position of ``value`` on the 64-bit hash ring."""
+    digest = hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def request_key(spec, head, addr):
+    """
+    Affinity key of a request for the ``hash`` policy.
+
+    :params spec (str): ``hash_key`` value: ``ip``, ``cookie:<name>`` or
+                        ``header:<name>``.
+    :params head (MessageHead): head of the request.
+    :params addr (tuple): client address.
+
+    :rtype str: the key, or None when the request does not carry it.
+    """
+    kind, _, name = (spec or "ip").partition(":")
+    if kind == "cookie":
+        try:
+            morsel = SimpleCookie(head.get("Cookie") or "").get(name)
+        except CookieError:
+            return None
+        if morsel is None or not morsel.value:
+            return None
+        return morsel.value
+    if kind == "header":
+        return head.get(name) or None
+    return addr[0] if addr else None
+
+
+#: dist_policy name -> balancer class.
+POLICIES = {
+    "round-robin": Balancer,
+    "least-conn": LeastConnBalancer,
+    "weighted": WeightedBalancer,
+    "ewma": EwmaBalancer,
+    "p2c": P2CBalancer,
+    "hash": HashBalancer,
+}
+
+_balancers = {}
+_balancers_lock = threading.Lock()
+
+
+def get_balancer(hostname, backends, policy, weights=None):
+    """
+    Balancer of a virtual host, created on first use.
+
+    :params hostname (str): virtual host name.
+    :params backends (list): ``host:port`` strings.
+    :params policy (str): ``dist_policy`` value.
+    :params weights (list): per-backend weights of the ``weighted`` policy.
+
+    :rtype Balancer: the balancer, shared by every request of the host, or
+                     None for an unknown policy.
+    """
+    if policy not in POLICIES:
+        return None
+    key = (hostname, tuple(backends), policy, tuple(weights or ()))
+    balancer = _balancers.get(key)
+    if balancer is None:
+        with _balancers_lock:
+            balancer = _balancers.get(key)
+            if balancer is None:
+                balancer = POLICIES[policy](backends, weights)
+                _balancers[key] = balancer
+    return balancer
@@ -0,0 +1,513 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.cache
+~~~~~~~~~~~~~~~~~
+
+This module provides the shared HTTP response cache of the proxy.
+
+Hosts with ``proxy_cache on;`` in ``proxy.conf`` have their cacheable GET
+responses stored once for all clients and backends. Storage follows what the
+upstream announces (RFC 9111, simplified for a shared cache):
+
+- a ``200`` answer is stored when it has a ``Content-Length`` body, no
+  ``Set-Cookie`` or ``Vary``, is not ``no-store``/``private``, and carries
+  a freshness lifetime (``s-maxage``, ``max-age`` or ``Expires``) or a
+  validator (``ETag``, ``Last-Modified``);
+- a fresh entry is served by the proxy without contacting any backend;
+- a stale entry within its ``stale-while-revalidate`` window is served
+  immediately while one background conditional request refreshes it;
+- older entries are revalidated with ``If-None-Match``/``If-Modified-Since``;
+  a ``304 Not Modified`` refreshes the entry and the proxy answers from it.
+
+Entries live in a memory LRU bounded by bytes. With a disk directory
+configured, entries evicted from memory move to a second LRU of files that
+are served through ``mmap``, also bounded by bytes.
+
+Usage Example:
+--------------
+>>> configure(memory_bytes=32 << 20, disk_dir="/tmp/weaprous-cache")
+>>> entry = CACHE.lookup(cache_key("app.local", head))
+>>> if entry is not None and entry.state() == FRESH:
+>>>     head_bytes, body = render(entry, head, keep_alive=True)
+
+"""
+
+import hashlib
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+from .framing import LENGTH, NO_BODY, FramingError, MessageHead, body_framing, read_body, read_head
+from .pool import POOLS
+
+#: Bytes of response bodies kept in memory.
+MEMORY_BYTES = 32 * 1024 * 1024
+#: Bytes of response bodies kept in the disk tier (when enabled).
+DISK_BYTES = 256 * 1024 * 1024
+#: Largest body stored.
+MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+#: Entry states returned by :meth:`CacheEntry.state`.
+FRESH = "fresh"
+STALE_WHILE_REVALIDATE = "stale-while-revalidate"
+STALE = "stale"
+
+#: Response headers not stored with an entry.
+UNSTORED_HEADERS = ("connection", "keep-alive", "proxy-connection", "transfer-encoding",
+                    "age", "x-cache", "traceparent")
+#: Response headers replaced by those of a ``304 Not Modified``.
+REFRESHED_HEADERS = ("date", "cache-control", "expires", "etag", "last-modified")
+
+
+def cache_control(value):
+    """
+    Parse a ``Cache-Control`` header.
+
+    :rtype dict: directive -> value (None for flags), names lowercased.
+    """
+    directives = {}
+    for part in (value or "").split(","):
+        name, sep, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') if sep else None
+    return directives
+
+
+def _seconds(value):
+    try:
+        return max(int(value), 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _http_time(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+class CacheEntry:
+    """
+    One stored response.
+
+    :attrs key (str): cache key.
+    :attrs start_line (str): status line.
+    :attrs headers (list): stored [name, value] headers.
+    :attrs size (int): body size.
+    :attrs stored (float): time (``time.time()``) the entry was stored or
+                           last revalidated.
+    :attrs fresh_until (float): time the entry becomes stale.
+    :attrs swr (float): seconds it may still be served while revalidating.
+    """
+
+    __slots__ = ("key", "start_line", "headers", "body", "size", "stored",
+                 "fresh_until", "swr", "age", "path", "map", "revalidating")
+
+    def __init__(self, key, start_line, headers, body):
+        self.key = key
+        self.start_line = start_line
+        self.headers = headers
+        self.body = body
+        self.size = len(body)
+        self.path = None
+        self.map = None
+        self.revalidating = False
+        self.update_freshness()
+
+    def get(self, name):
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+    def update_freshness(self):
+        """Compute the lifetime from the stored headers."""
+        now = time.time()
+        directives = cache_control(self.get("Cache-Control"))
+        lifetime = _seconds(directives.get("s-maxage"))
+        if lifetime is None:
+            lifetime = _seconds(directives.get("max-age"))
+        if lifetime is None and self.get("Expires"):
+            expires = _http_time(self.get("Expires"))
+            date = _http_time(self.get("Date")) or now
+            lifetime = max(expires - date, 0) if expires is not None else 0
+        if lifetime is None or "no-cache" in directives:
+            lifetime = 0
+        self.age = _seconds(self.get("Age")) or 0
+        self.stored = now
+        self.fresh_until = now + lifetime - self.age
+        self.swr = 0
+        if "must-revalidate" not in directives and "proxy-revalidate" not in directives:
+            self.swr = _seconds(directives.get("stale-while-revalidate")) or 0
+
+    def state(self, now=None):
+        """``FRESH``, ``STALE_WHILE_REVALIDATE`` or ``STALE``."""
+        now = time.time() if now is None else now
+        if now < self.fresh_until:
+            return FRESH
+        if now < self.fresh_until + self.swr:
+            return STALE_WHILE_REVALIDATE
+        return STALE
+
+    def content(self):
+        """Body as bytes, or as a read-only mmap for disk entries."""
+        return self.body if self.body is not None else self.map
+
+
+class ResponseCache:
+    """
+    LRU of stored responses bounded by body bytes, with an optional mmap
+    backed disk tier.
+
+    :attrs memory_bytes (int): budget of the memory tier.
+    :attrs disk_dir (str): directory of the disk tier, None to disable it.
+    :attrs disk_bytes (int): budget of the disk tier.
+    """
+
+    def __init__(self, memory_bytes=MEMORY_BYTES, disk_dir=None, disk_bytes=DISK_BYTES,
+                 max_entry_bytes=MAX_ENTRY_BYTES):
+        self.max_entry_bytes = max_entry_bytes
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        self.disk = OrderedDict()
+        self.memory_used = 0
+        self.disk_used = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "revalidated": 0}
+        self.configure(memory_bytes, disk_dir, disk_bytes)
+
+    def configure(self, memory_bytes=MEMORY_BYTES, disk_dir=None, disk_bytes=DISK_BYTES):
+        """Set the budgets and the disk directory, dropping every entry."""
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        with self.lock:
+            for key in list(self.memory) + list(self.disk):
+                self._remove(key)
+            self.memory_bytes = memory_bytes
+            self.disk_dir = disk_dir
+            self.disk_bytes = disk_bytes
+
+    def lookup(self, key):
+        """
+        Entry stored under ``key``, marked as recently used.
+
+        :rtype CacheEntry: the entry, or None.
+        """
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+            else:
+                entry = self.disk.get(key)
+                if entry is not None:
+                    self.disk.move_to_end(key)
+            self.stats["hits" if entry is not None else "misses"] += 1
+            return entry
+
+    def store(self, key, head, body):
+        """
+        Store the response ``head`` with its complete ``body``.
+
+        :params key (str): cache key.
+        :params head (MessageHead): response head.
+        :params body (bytes): response body.
+
+        :rtype CacheEntry: the new entry, or None if it is too large.
+        """
+        if len(body) > min(self.max_entry_bytes, self.memory_bytes):
+            return None
+        headers = [[name, value] for name, value in head.headers
+                   if name.lower() not in UNSTORED_HEADERS]
+        entry = CacheEntry(key, head.start_line, headers, bytes(body))
+        with self.lock:
+            self._remove(key)
+            self.memory[key] = entry
+            self.memory_used += entry.size
+            self.stats["stores"] += 1
+            demoted = self._evict_memory()
+        self._demote(demoted)
+        return entry
+
+    def refresh(self, entry, head):
+        """
+        Update ``entry`` from the ``304 Not Modified`` answer ``head``.
+
+        :rtype CacheEntry: the refreshed entry.
+        """
+        updates = [[name, value] for name, value in head.headers
+                   if name.lower() in REFRESHED_HEADERS]
+        replaced = {name.lower() for name, _ in updates}
+        with self.lock:
+            entry.headers = [h for h in entry.headers if h[0].lower() not in replaced] + updates
+            entry.update_freshness()
+            entry.revalidating = False
+            self.stats["revalidated"] += 1
+        return entry
+
+    def invalidate(self, key):
+        with self.lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self.memory.pop(key, None)
+        if entry is not None:
+            self.memory_used -= entry.size
+        entry = self.disk.pop(key, None)
+        if entry is not None:
+            self.disk_used -= entry.size
+            self._unlink(entry)
+
+    def _evict_memory(self):
+        """Pop least recently used entries over budget, called locked."""
+        evicted = []
+        while self.memory_used > self.memory_bytes and self.memory:
+            _, entry = self.memory.popitem(last=False)
+            self.memory_used -= entry.size
+            evicted.append(entry)
+        return evicted
+
+    def _demote(self, entries):
+        """Move entries evicted from memory to the disk tier."""
+        if not self.disk_dir:
+            return
+        for entry in entries:
+            if entry.size == 0 or entry.size > self.disk_bytes:
+                continue
+            path = os.path.join(self.disk_dir, hashlib.sha1(entry.key.encode("utf-8")).hexdigest())
+            try:
+                with open(path, "wb") as f:
+                    f.write(entry.body)
+                with open(path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except OSError as e:
+                print("[Proxy] Cache disk tier write failed: {}".format(e))
+                continue
+            with self.lock:
+                if entry.key in self.memory or entry.key in self.disk:
+                    continue
+                entry.path, entry.map, entry.body = path, mapped, None
+                self.disk[entry.key] = entry
+                self.disk_used += entry.size
+                while self.disk_used > self.disk_bytes and self.disk:
+                    _, old = self.disk.popitem(last=False)
+                    self.disk_used -= old.size
+                    self._unlink(old)
+
+    @staticmethod
+    def _unlink(entry):
+        # The mapping is released once no response still sends from it.
+        entry.map = None
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+def cache_key(hostname, head):
+    """Cache key of a request: virtual host and target."""
+    return "{} {}".format(hostname, head.target)
+
+
+def lookup_request(route, hostname, head):
+    """
+    Cache lookup of a request to a virtual host.
+
+    :params route (tuple): routing table entry of the host, or None.
+    :params hostname (str): virtual host name.
+    :params head (MessageHead): request head.
+
+    :rtype tuple: (key, entry); key is None when the host does not cache or
+                  the request cannot be answered from the cache, entry is
+                  None on a miss.
+    """
+    params = route[2] if route and len(route) > 2 else {}
+    if not params.get("proxy_cache") or not request_cacheable(head):
+        return None, None
+    key = cache_key(hostname, head)
+    return key, CACHE.lookup(key)
+
+
+def request_cacheable(head):
+    """Whether a request may be answered from the cache."""
+    if head.method != "GET" or head.get("Authorization"):
+        return False
+    if body_framing(head)[0] != NO_BODY:
+        return False
+    directives = cache_control(head.get("Cache-Control"))
+    return "no-store" not in directives and "no-cache" not in directives \
+        and (head.get("Pragma") or "").lower() != "no-cache"
+
+
+def response_storable(request, response, framing, max_entry_bytes=MAX_ENTRY_BYTES):
+    """
+    Whether ``response`` to ``request`` may be stored by the shared cache.
+
+    :params request (MessageHead): request head.
+    :params response (MessageHead): response head.
+    :params framing (tuple): framing of the response body.
+    """
+    if request.method != "GET" or request.get("Authorization") or response.status != 200:
+        return False
+    if framing[0] not in (LENGTH, NO_BODY) or (framing[1] or 0) > max_entry_bytes:
+        return False
+    if response.get("Set-Cookie") is not None or response.get("Vary") is not None:
+        return False
+    directives = cache_control(response.get("Cache-Control"))
+    if "no-store" in directives or "private" in directives:
+        return False
+    return ("max-age" in directives or "s-maxage" in directives or "no-cache" in directives
+            or response.get("Expires") is not None or response.get("ETag") is not None
+            or response.get("Last-Modified") is not None)
+
+
+def not_modified(entry, request):
+    """Whether the client's conditional headers match ``entry``."""
+    etags = request.get("If-None-Match")
+    if etags is not None:
+        etag = entry.get("ETag")
+        if etag is None:
+            return False
+        # Weak comparison (RFC 9110 section 13.1.2).
+        tags = [_opaque(t.strip()) for t in etags.split(",")]
+        return "*" in tags or _opaque(etag) in tags
+    since = _http_time(request.get("If-Modified-Since"))
+    modified = _http_time(entry.get("Last-Modified"))
+    return since is not None and modified is not None and modified <= since
+
+
+def _opaque(etag):
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def render(entry, request, keep_alive, status="HIT"):
+    """
+    Answer ``request`` from ``entry``.
+
+    :params entry (CacheEntry): stored response.
+    :params request (MessageHead): client request head.
+    :params keep_alive (bool): whether the client connection stays open.
+    :params status (str): ``X-Cache`` value.
+
+    :rtype tuple: (head bytes, body) where body is bytes, an mmap, or None
+                  for a ``304 Not Modified``.
+    """
+    age = int(entry.age + time.time() - entry.stored)
+    connection = "keep-alive" if keep_alive else "close"
+    if not_modified(entry, request):
+        lines = ["HTTP/1.1 304 Not Modified"]
+        lines.extend("{}: {}".format(name, value) for name, value in entry.headers
+                     if name.lower() in REFRESHED_HEADERS)
+        body = None
+    else:
+        lines = [entry.start_line]
+        lines.extend("{}: {}".format(name, value) for name, value in entry.headers)
+        body = entry.content()
+    lines.append("Age: {}".format(age))
+    lines.append("X-Cache: {}".format(status))
+    lines.append("Connection: {}".format(connection))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"), body
+
+
+def conditional_headers(entry):
+    """Validators to revalidate ``entry`` with, as (name, value) pairs."""
+    headers = []
+    if entry.get("ETag"):
+        headers.append(("If-None-Match", entry.get("ETag")))
+    if entry.get("Last-Modified"):
+        headers.append(("If-Modified-Since", entry.get("Last-Modified")))
+    return headers
+
+
+def revalidate(cache, entry, host, port, request, on_done=None):
+    """
+    Revalidate ``entry`` with one conditional request to ``host:port``.
+
+    Used for ``stale-while-revalidate`` in a background thread: a ``304``
+    refreshes the entry, a storable ``200`` replaces it, anything else
+    drops it.
+
+    :params request (MessageHead): head of the client request that found
+                                   the entry stale.
+    :params on_done (callable): ``on_done(latency, ok)`` when finished.
+    """
+    started = time.monotonic()
+    pool = POOLS.get((host, port))
+    ok = False
+    try:
+        head = MessageHead(request.start_line, [list(h) for h in request.headers])
+        for name in ("If-None-Match", "If-Modified-Since", "Connection"):
+            head.remove(name)
+        for name, value in conditional_headers(entry):
+            head.set(name, value)
+        head.set("Connection", "keep-alive")
+
+        sock, _ = pool.acquire()
+        buffer = bytearray()
+        try:
+            sock.sendall(head.to_bytes())
+            resp = read_head(sock, buffer)
+            if resp is None:
+                raise FramingError("upstream closed the connection")
+            framing = body_framing(resp, request_method="GET")
+            body = read_body(sock, buffer, framing)
+        except (OSError, FramingError):
+            pool.discard(sock)
+            raise
+        if resp.keep_alive() and framing[0] in (LENGTH, NO_BODY) and not buffer:
+            pool.release(sock)
+        else:
+            pool.discard(sock)
+
+        ok = resp.status < 500
+        if resp.status == 304:
+            cache.refresh(entry, resp)
+        elif response_storable(head, resp, framing, cache.max_entry_bytes):
+            cache.store(entry.key, resp, body)
+        else:
+            cache.invalidate(entry.key)
+    except (OSError, FramingError) as e:
+        print("[Proxy] Cache revalidation of {} failed: {}".format(entry.key, e))
+    finally:
+        entry.revalidating = False
+        if on_done is not None:
+            on_done(time.monotonic() - started, ok)
+
+
+def revalidate_in_background(cache, entry, host, port, request, on_done=None):
+    """
+    Start :func:`revalidate` in a thread unless one already runs for ``entry``.
+
+    :rtype bool: True if a revalidation was started.
+    """
+    with cache.lock:
+        if entry.revalidating:
+            return False
+        entry.revalidating = True
+    threading.Thread(target=revalidate, args=(cache, entry, host, port, request, on_done),
+                     daemon=True).start()
+    return True
+
+
+#: Cache shared by every connection of the proxy.
+CACHE = ResponseCache()
+
+
+def configure(memory_bytes=MEMORY_BYTES, disk_dir=None, disk_bytes=DISK_BYTES):
+    """Set the budgets of the shared cache."""
+    CACHE.configure(memory_bytes, disk_dir, disk_bytes)
+    return CACHE
@@ -0,0 +1,181 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.coalesce
+~~~~~~~~~~~~~~~~~
+
+This module provides request coalescing (single-flight) for the proxy.
+
+Hosts with ``proxy_coalesce`` in ``proxy.conf`` have concurrent identical
+GET requests to the listed paths merged: the first one (the *leader*) goes to
+a backend, the others wait for it and receive a copy of its response. A
+refresh stampede on ``/get-list`` then costs the tracker one request instead
+of one per browser.
+
+Requests are identical when they share the host, the request target and the
+values of the ``vary`` headers (``Cookie`` and ``Authorization`` unless
+configured otherwise), so that users never receive each other's private
+answers. A response is only shared when it has a ``Content-Length`` body of
+at most ``MAX_SHARED_BYTES`` and no ``Set-Cookie``; otherwise, or when the
+leader fails, waiters send their own request.
+
+Usage Example:
+--------------
+>>> key = coalesce_key(params, "tracker.local", head)
+>>> flight, leader = FLIGHTS.join(key)
+>>> if not leader and flight.done.wait(READ_TIMEOUT) and flight.response:
+>>>     conn.sendall(flight.render(keep_alive=True))
+
+"""
+
+import threading
+
+from .framing import LENGTH, NO_BODY, body_framing
+
+#: Largest response body copied to waiting requests.
+MAX_SHARED_BYTES = 8 * 1024 * 1024
+#: Request headers a response may depend on, by default.
+DEFAULT_VARY = ("Cookie", "Authorization")
+
+
+def parse_coalesce(args):
+    """
+    Settings of a ``proxy_coalesce`` directive.
+
+    :params args (list): directive arguments, path prefixes (``/`` for every
+                         path) and an optional ``vary=Header,Header``
+                         (``vary=`` alone coalesces across users).
+
+    :rtype dict: {"paths": (...), "vary": (...)}.
+    """
+    paths, vary = [], DEFAULT_VARY
+    for arg in args:
+        if arg.startswith("vary="):
+            vary = tuple(name for name in arg[len("vary="):].split(",") if name)
+        elif arg.startswith("/"):
+            paths.append(arg)
+        else:
+            raise ValueError("expected a path or vary=, found {!r}".format(arg))
+    if not paths:
+        raise ValueError("expected at least one path")
+    return {"paths": tuple(paths), "vary": vary}
+
+
+def coalesce_key(params, hostname, head):
+    """
+    Single-flight key of a request.
+
+    :params params (dict): route parameters of the host.
+    :params hostname (str): virtual host name.
+    :params head (MessageHead): request head.
+
+    :rtype str: the key, or None when the request is not coalesced.
+    """
+    settings = params.get("coalesce") if params else None
+    if not settings or head.method != "GET" or body_framing(head)[0] != NO_BODY:
+        return None
+    path = head.target.split("?", 1)[0]
+    if not any(path.startswith(prefix) for prefix in settings["paths"]):
+        return None
+    parts = [hostname, head.target]
+    parts.extend(head.get(name) or "" for name in settings["vary"])
+    return "\n".join(parts)
+
+
+class Flight:
+    """
+    One upstream request shared by identical client requests.
+
+    :attrs key (str): single-flight key.
+    :attrs done: event set once the leader finished.
+    :attrs response (MessageHead): response head, None if it cannot be shared.
+    :attrs body (bytes): response body.
+    :attrs followers (int): requests waiting for the leader.
+    """
+
+    __slots__ = ("key", "done", "response", "body", "followers")
+
+    def __init__(self, key, done):
+        self.key = key
+        self.done = done
+        self.response = None
+        self.body = b""
+        self.followers = 0
+
+    def shareable(self, response, framing):
+        """Whether ``response`` can be copied to the followers."""
+        return (framing[0] in (LENGTH, NO_BODY) and (framing[1] or 0) <= MAX_SHARED_BYTES
+                and response.get("Set-Cookie") is None)
+
+    def render(self, keep_alive):
+        """The shared response for one follower, as bytes."""
+        lines = [self.response.start_line]
+        lines.extend("{}: {}".format(name, value) for name, value in self.response.headers
+                     if name.lower() not in ("connection", "keep-alive", "proxy-connection"))
+        lines.append("Connection: {}".format("keep-alive" if keep_alive else "close"))
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + self.body
+
+
+class SingleFlight:
+    """
+    Flights in progress, keyed by :func:`coalesce_key`.
+
+    :params event_factory (callable): creates the completion event of a
+                                      flight, ``threading.Event`` or
+                                      ``asyncio.Event``.
+    """
+
+    def __init__(self, event_factory=threading.Event):
+        self.event_factory = event_factory
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def join(self, key):
+        """
+        Lead a new flight for ``key`` or follow the one in progress.
+
+        :rtype tuple: (flight, leader); the leader must call :meth:`complete`.
+        """
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = self.flights[key] = Flight(key, self.event_factory())
+                return flight, True
+            flight.followers += 1
+            return flight, False
+
+    def complete(self, flight, response=None, body=b""):
+        """
+        End ``flight`` and wake its followers.
+
+        Requests arriving from now on start a new flight, they never get an
+        older response.
+
+        :params response (MessageHead): response to share, None if followers
+                                        must send their own request.
+        :params body (bytes): its body.
+        """
+        with self.lock:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+            if response is not None:
+                flight.response = response
+                flight.body = bytes(body)
+        if flight.followers and response is not None:
+            print("[Proxy] Coalesced {} requests into one upstream request".format(
+                flight.followers + 1))
+        flight.done.set()
+
+
+#: Flights of the threaded proxy engine.
+FLIGHTS = SingleFlight()
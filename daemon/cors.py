@@ -0,0 +1,159 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.cors
+~~~~~~~~~~~~~~~~~
+
+This module provides the :class:`CorsPolicy <CorsPolicy>` object holding the
+cross-origin rules of a :class:`WeApRous <WeApRous>` app.
+
+Preflight (``OPTIONS``) answers are rendered once per origin and kept as raw
+bytes; only the ``Date`` line is spliced in per request. They carry
+``Access-Control-Max-Age`` so browsers cache the preflight instead of
+repeating it before every cross-origin ``fetch``. The
+:class:`HttpAdapter <HttpAdapter>` answers preflights from this cache without
+routing the request to a handler.
+
+Usage Example:
+--------------
+>>> app = WeApRous()
+>>> app.cors = CorsPolicy(allow_credentials=True, max_age=600)
+>>> app.cors.preflight("http://192.168.1.3:9003")
+b'HTTP/1.1 204 No Content\\r\\n...'
+
+"""
+
+import threading
+from collections import OrderedDict
+
+from .utils import http_date
+
+
+class CorsPolicy:
+    """
+    Cross-origin rules of an app and the cache of rendered preflights.
+
+    :attrs allow_origins (tuple): allowed origins, ``"*"`` allows any origin.
+    :attrs allow_methods (tuple): methods announced to the browser.
+    :attrs allow_headers (tuple): request headers announced to the browser.
+    :attrs allow_credentials (bool): allow cookies; the origin is then echoed
+                                     back instead of ``*``.
+    :attrs max_age (int): seconds a browser may cache a preflight answer.
+    :attrs max_cached_origins (int): bound of the per-origin caches when any
+                                     origin is echoed back.
+    """
+
+    def __init__(self, allow_origins=("*",), allow_methods=("GET", "POST", "OPTIONS"),
+                 allow_headers=("Content-Type",), allow_credentials=False,
+                 max_age=600, max_cached_origins=256):
+        self.allow_origins = tuple(allow_origins)
+        self.allow_methods = tuple(m.upper() for m in allow_methods)
+        self.allow_headers = tuple(allow_headers)
+        self.allow_credentials = allow_credentials
+        self.max_age = max_age
+        self.max_cached_origins = max_cached_origins
+
+        self._any_origin = "*" in self.allow_origins
+        self._lock = threading.Lock()
+        #: origin -> (head bytes before Date, bytes after Date)
+        self._preflights = OrderedDict()
+        #: origin -> response headers for actual (non-preflight) requests
+        self._headers = OrderedDict()
+
+    def is_allowed(self, origin):
+        """Whether ``origin`` may access the app."""
+        return bool(origin) and (self._any_origin or origin in self.allow_origins)
+
+    def _allow_origin_value(self, origin):
+        """``Access-Control-Allow-Origin`` for ``origin``, None if refused."""
+        if self._any_origin and not self.allow_credentials:
+            return "*"
+        if self.is_allowed(origin):
+            return origin
+        return None
+
+    def _cache_key(self, origin):
+        # Without credentials every origin gets the same "*" answer.
+        if self._any_origin and not self.allow_credentials:
+            return "*"
+        return origin if self.is_allowed(origin) else None
+
+    def _cached(self, cache, key, render):
+        with self._lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+                return value
+        value = render()
+        with self._lock:
+            cache[key] = value
+            if len(cache) > self.max_cached_origins:
+                cache.popitem(last=False)
+        return value
+
+    def headers_for(self, origin):
+        """
+        CORS headers to add to an actual response for ``origin``.
+
+        :params origin (str): value of the request ``Origin`` header.
+
+        :rtype dict: headers (empty when the origin is not allowed). The dict
+                     is shared between requests and must not be modified.
+        """
+        key = self._cache_key(origin)
+        return self._cached(self._headers, key, lambda: self._render_headers(key))
+
+    def _render_headers(self, key):
+        allow_origin = self._allow_origin_value(key)
+        if allow_origin is None:
+            return {}
+        headers = {
+            "Access-Control-Allow-Origin": allow_origin,
+            "Access-Control-Allow-Methods": ", ".join(self.allow_methods),
+            "Access-Control-Allow-Headers": ", ".join(self.allow_headers),
+        }
+        if self.allow_credentials:
+            headers["Access-Control-Allow-Credentials"] = "true"
+        if allow_origin != "*":
+            headers["Vary"] = "Origin"
+        return headers
+
+    def preflight(self, origin):
+        """
+        Complete ``204 No Content`` answer to a preflight from ``origin``.
+
+        Refused origins get a 204 without CORS headers, which the browser
+        treats as a denial.
+
+        :params origin (str): value of the request ``Origin`` header.
+
+        :rtype bytes: the encoded HTTP response.
+        """
+        key = self._cache_key(origin)
+        before, after = self._cached(self._preflights, key, lambda: self._render_preflight(key))
+        return before + http_date().encode("ascii") + after
+
+    def _render_preflight(self, key):
+        lines = ["HTTP/1.1 204 No Content", "Server: WeApRous/0.1"]
+        before = ("\r\n".join(lines) + "\r\nDate: ").encode("ascii")
+
+        lines = [""]
+        headers = self._render_headers(key)
+        for name, value in headers.items():
+            lines.append("{}: {}".format(name, value))
+        if headers:
+            lines.append("Access-Control-Max-Age: {}".format(self.max_age))
+        lines.append("Content-Length: 0")
+        lines.append("Connection: close")
+        after = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        return before, after
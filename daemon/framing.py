@@ -0,0 +1,432 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.framing
+~~~~~~~~~~~~~~~~~
+
+This module provides HTTP/1.1 message framing for sockets: reading a message
+head, deciding how its body is delimited (``Content-Length``, chunked
+transfer coding or connection close) and reading exactly that body.
+
+Knowing where a message ends is what allows a connection to carry several
+requests (keep-alive) instead of being closed, or timed out, after each one.
+
+Usage Example:
+--------------
+>>> buffer = bytearray()
+>>> head = read_head(sock, buffer)
+>>> head.status, head.get("Content-Type")
+(200, 'application/json')
+>>> body = read_body(sock, buffer, body_framing(head, request_method="GET"))
+
+"""
+
+import re
+
+#: Upper bound of a message head, protects against endless header streams.
+MAX_HEAD_SIZE = 64 * 1024
+
+#: Upper bound of a request body read by :func:`read_body` on a backend.
+MAX_BODY_SIZE = 10 * 1024 * 1024
+
+#: Size of the fixed buffer used by :func:`relay_body`.
+RELAY_BUFFER_SIZE = 64 * 1024
+
+#: Chunk size of a chunk line, chunk extensions removed.
+_CHUNK_SIZE = re.compile(rb"[0-9A-Fa-f]{1,16}")
+
+#: Framing kinds returned by :func:`body_framing`.
+NO_BODY = "none"
+LENGTH = "length"
+CHUNKED = "chunked"
+UNTIL_CLOSE = "close"
+
+
+class FramingError(Exception):
+    """The peer sent a malformed message or closed in the middle of one."""
+
+
+class BodyTooLarge(FramingError):
+    """The peer announced or sent a body larger than the allowed size."""
+
+
+class MessageHead:
+    """
+    Start line and headers of an HTTP message.
+
+    Header names keep their original case and order; lookups are
+    case-insensitive.
+
+    :attrs start_line (str): request line or status line.
+    :attrs headers (list): list of [name, value] pairs.
+    """
+
+    __slots__ = ("start_line", "headers")
+
+    def __init__(self, start_line, headers=None):
+        self.start_line = start_line
+        self.headers = headers if headers is not None else []
+
+    @classmethod
+    def parse(cls, data):
+        """
+        Parse a head (without the blank line terminator).
+
+        :params data (bytes): raw head bytes.
+
+        :rtype MessageHead: the parsed head.
+        """
+        lines = data.decode("latin-1").split("\r\n")
+        if not lines[0]:
+            raise FramingError("empty start line")
+        headers = []
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise FramingError("malformed header line {!r}".format(line))
+            headers.append([name.strip(), value.strip()])
+        return cls(lines[0], headers)
+
+    def get(self, name, default=None):
+        """Value of the first header called ``name``."""
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return default
+
+    def set(self, name, value):
+        """Replace every ``name`` header by a single one."""
+        self.remove(name)
+        self.headers.append([name, value])
+
+    def remove(self, name):
+        """Drop every ``name`` header."""
+        name = name.lower()
+        self.headers = [h for h in self.headers if h[0].lower() != name]
+
+    def has_token(self, name, token):
+        """Whether the comma separated header ``name`` contains ``token``."""
+        value = self.get(name)
+        if not value:
+            return False
+        token = token.lower()
+        return any(part.strip().lower() == token for part in value.split(","))
+
+    @property
+    def version(self):
+        """Protocol version (``HTTP/1.1``) of a request or a response."""
+        parts = self.start_line.split(" ", 2)
+        if parts[0].startswith("HTTP/"):
+            return parts[0]
+        return parts[2] if len(parts) == 3 else "HTTP/1.0"
+
+    @property
+    def method(self):
+        """Method of a request head."""
+        return self.start_line.split(" ", 1)[0]
+
+    @property
+    def target(self):
+        """Request target (path and query) of a request head."""
+        parts = self.start_line.split(" ", 2)
+        return parts[1] if len(parts) > 1 else ""
+
+    @property
+    def status(self):
+        """Status code of a response head."""
+        try:
+            return int(self.start_line.split(" ", 2)[1])
+        except (IndexError, ValueError):
+            raise FramingError("malformed status line {!r}".format(self.start_line))
+
+    def keep_alive(self):
+        """Whether the sender expects the connection to stay open."""
+        if self.version == "HTTP/1.1":
+            return not self.has_token("Connection", "close")
+        return self.has_token("Connection", "keep-alive")
+
+    def to_bytes(self):
+        """Serialize the head, blank line included."""
+        lines = [self.start_line]
+        lines.extend("{}: {}".format(name, value) for name, value in self.headers)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def read_head(sock, buffer, max_size=MAX_HEAD_SIZE):
+    """
+    Read one message head from ``sock``.
+
+    Bytes received past the head stay in ``buffer`` for the body or for the
+    next message on the connection.
+
+    :params sock (socket.socket): connected socket.
+    :params buffer (bytearray): bytes already received, updated in place.
+    :params max_size (int): maximum head size.
+
+    :rtype MessageHead: the head, or None if the peer closed before sending
+                        anything.
+    """
+    start = 0
+    while True:
+        end = buffer.find(b"\r\n\r\n", start)
+        if end >= 0:
+            head = MessageHead.parse(bytes(buffer[:end]))
+            del buffer[:end + 4]
+            return head
+        if len(buffer) > max_size:
+            raise FramingError("message head larger than {} bytes".format(max_size))
+        start = max(len(buffer) - 3, 0)
+        chunk = sock.recv(65536)
+        if not chunk:
+            if buffer:
+                raise FramingError("connection closed inside message head")
+            return None
+        buffer += chunk
+
+
+def body_framing(head, request_method=None):
+    """
+    Decide how the body following ``head`` is delimited (RFC 9112 section 6).
+
+    :params head (MessageHead): request or response head.
+    :params request_method (str): for a response, the method of the request
+                                  it answers; None when ``head`` is a request.
+
+    :rtype tuple: (kind, length) where kind is one of ``NO_BODY``, ``LENGTH``,
+                  ``CHUNKED`` or ``UNTIL_CLOSE``.
+    """
+    if request_method is not None:
+        status = head.status
+        if request_method == "HEAD" or 100 <= status < 200 or status in (204, 304):
+            return NO_BODY, 0
+
+    if head.has_token("Transfer-Encoding", "chunked"):
+        return CHUNKED, None
+
+    length = content_length(head)
+    if length is not None:
+        return (LENGTH, length) if length > 0 else (NO_BODY, 0)
+
+    # Requests without framing headers have no body; responses run until
+    # the server closes the connection.
+    if request_method is None:
+        return NO_BODY, 0
+    return UNTIL_CLOSE, None
+
+
+def content_length(head):
+    """
+    Value of the ``Content-Length`` headers of ``head``.
+
+    A length that is not a plain decimal number, or several headers (or
+    list members) that disagree, would let two parties split the stream
+    differently (request smuggling), so they are errors.
+
+    :rtype int: the length, None without the header.
+    """
+    values = set()
+    for name, value in head.headers:
+        if name.lower() == "content-length":
+            values.update(part.strip() for part in value.split(","))
+    if not values:
+        return None
+    if len(values) > 1:
+        raise FramingError("conflicting Content-Length {}".format(sorted(values)))
+    value = values.pop()
+    if not (value.isascii() and value.isdigit()):
+        raise FramingError("invalid Content-Length {!r}".format(value))
+    return int(value)
+
+
+def _fill(sock, buffer, size):
+    """Receive until ``buffer`` holds at least ``size`` bytes."""
+    while len(buffer) < size:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise FramingError("connection closed inside message body")
+        buffer += chunk
+
+
+def _read_line(sock, buffer):
+    while True:
+        end = buffer.find(b"\r\n")
+        if end >= 0:
+            line = bytes(buffer[:end])
+            del buffer[:end + 2]
+            return line
+        if len(buffer) > MAX_HEAD_SIZE:
+            raise FramingError("chunk line too long")
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise FramingError("connection closed inside chunked body")
+        buffer += chunk
+
+
+def chunk_size(line):
+    """
+    Size of the chunk announced by a chunk line (without its CRLF).
+
+    :rtype int: the size.
+
+    :raises FramingError: unless the size is hex digits only.
+    """
+    # Only hex digits: int(x, 16) would also take "-5", "+5", "0x5" or
+    # "1_0", and a size the next hop reads differently splits the stream
+    # at another place (request smuggling).
+    size = line.split(b";", 1)[0].rstrip(b" \t")
+    if not _CHUNK_SIZE.fullmatch(size):
+        raise FramingError("invalid chunk size {!r}".format(line))
+    return int(size, 16)
+
+
+def read_body(sock, buffer, framing, max_size=None):
+    """
+    Read a complete body as announced by ``framing``.
+
+    Chunked bodies are returned in their encoded form so that they can be
+    relayed unchanged.
+
+    :params sock (socket.socket): connected socket.
+    :params buffer (bytearray): bytes already received, updated in place.
+    :params framing (tuple): result of :func:`body_framing`.
+    :params max_size (int): largest body accepted, None for no limit.
+
+    :rtype bytes: the body.
+
+    :raises BodyTooLarge: when the body is larger than ``max_size``; it is
+                          detected before the body is received when the
+                          length is announced.
+    """
+    kind, length = framing
+    if kind == NO_BODY:
+        return b""
+
+    if kind == LENGTH:
+        if max_size is not None and length > max_size:
+            raise BodyTooLarge("body of {} bytes, at most {} allowed".format(length, max_size))
+        _fill(sock, buffer, length)
+        body = bytes(buffer[:length])
+        del buffer[:length]
+        return body
+
+    if kind == CHUNKED:
+        out = bytearray()
+        while True:
+            line = _read_line(sock, buffer)
+            out += line + b"\r\n"
+            size = chunk_size(line)
+            if max_size is not None and len(out) + size > max_size:
+                raise BodyTooLarge("chunked body over {} bytes".format(max_size))
+            if size == 0:
+                # Trailer section ends with an empty line.
+                while True:
+                    trailer = _read_line(sock, buffer)
+                    out += trailer + b"\r\n"
+                    if not trailer:
+                        return bytes(out)
+            _fill(sock, buffer, size + 2)
+            out += buffer[:size + 2]
+            del buffer[:size + 2]
+
+    # UNTIL_CLOSE
+    out = bytearray(buffer)
+    del buffer[:]
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            return bytes(out)
+        out += chunk
+        if max_size is not None and len(out) > max_size:
+            raise BodyTooLarge("body over {} bytes".format(max_size))
+
+
+def relay_body(src, dst, buffer, framing, bufsize=RELAY_BUFFER_SIZE, tee=None):
+    """
+    Stream a body from ``src`` to ``dst`` as it arrives.
+
+    Bytes go through one fixed ``bufsize`` buffer and each piece is sent
+    before the next is received, so a slow receiver slows the sender down
+    instead of letting the body pile up in memory. Reads never go past the
+    end of the message: what follows it stays in ``buffer``. Chunked bodies
+    are relayed in their encoded form.
+
+    :params src (socket.socket): socket the body is read from.
+    :params dst (socket.socket): socket the body is written to.
+    :params buffer (bytearray): bytes already received from ``src``, updated
+                                in place.
+    :params framing (tuple): result of :func:`body_framing`.
+    :params bufsize (int): size of the relay buffer.
+    :params tee (bytearray): if given, a ``Content-Length`` body is also
+                             appended to it (used by the response cache).
+
+    :rtype int: number of bytes relayed.
+    """
+    kind, length = framing
+    if kind == NO_BODY:
+        return 0
+
+    view = memoryview(bytearray(bufsize))
+    if kind == LENGTH:
+        return _relay_exact(src, dst, buffer, length, view, tee)
+
+    if kind == CHUNKED:
+        total = 0
+        while True:
+            line = _read_line(src, buffer)
+            # Checked before anything of the chunk is forwarded.
+            size = chunk_size(line)
+            dst.sendall(line + b"\r\n")
+            total += len(line) + 2
+            if size == 0:
+                while True:
+                    trailer = _read_line(src, buffer)
+                    dst.sendall(trailer + b"\r\n")
+                    total += len(trailer) + 2
+                    if not trailer:
+                        return total
+            total += _relay_exact(src, dst, buffer, size + 2, view)
+
+    # UNTIL_CLOSE
+    total = len(buffer)
+    if buffer:
+        dst.sendall(buffer)
+        del buffer[:]
+    while True:
+        received = src.recv_into(view)
+        if not received:
+            return total
+        dst.sendall(view[:received])
+        total += received
+
+
+def _relay_exact(src, dst, buffer, size, view, tee=None):
+    """Relay exactly ``size`` bytes, starting with those in ``buffer``."""
+    pending = min(len(buffer), size)
+    if pending:
+        dst.sendall(buffer[:pending])
+        if tee is not None:
+            tee += buffer[:pending]
+        del buffer[:pending]
+    remaining = size - pending
+    while remaining:
+        received = src.recv_into(view, min(remaining, len(view)))
+        if not received:
+            raise FramingError("connection closed inside message body")
+        dst.sendall(view[:received])
+        if tee is not None:
+            tee += view[:received]
+        remaining -= received
+    return size
@@ -0,0 +1,297 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.health
+~~~~~~~~~~~~~~~~~
+
+This module tracks the health of proxy upstreams so that traffic avoids
+backends that are down or misbehaving.
+
+Two signals decide whether a backend may receive requests:
+
+- **passive outlier detection**: every proxied request reports its outcome.
+  ``max_fails`` consecutive failures, or responses slower than both
+  ``slow_factor`` times the backend's usual latency and ``slow_min``
+  seconds, eject the backend for ``fail_timeout`` seconds (doubled on each
+  new ejection). When the time is up the backend is *half-open*: a single
+  trial request is let through, and its outcome closes the circuit again or
+  renews the ejection.
+- **active health checks**: with ``health_check`` in ``proxy.conf`` a
+  background thread probes each backend every ``interval`` seconds; ``fall``
+  failed probes mark it down and ``rise`` successful ones bring it back.
+
+Usage Example:
+--------------
+>>> HEALTH.observe("127.0.0.1:9001", latency=0.004, ok=True)
+>>> HEALTH.available("127.0.0.1:9001")
+True
+
+"""
+
+import threading
+import time
+
+from .framing import FramingError, read_head
+from .pool import UNIX, connect, upstream_address
+
+#: Consecutive failures ejecting a backend.
+MAX_FAILS = 3
+#: First ejection duration in seconds, doubled on repeated ejections.
+FAIL_TIMEOUT = 10.0
+#: Longest ejection in seconds.
+MAX_EJECTION = 120.0
+#: A response slower than SLOW_FACTOR x the usual latency is a failure...
+SLOW_FACTOR = 10.0
+#: ...provided it also took more than SLOW_MIN seconds.
+SLOW_MIN = 1.0
+#: Smoothing of the usual latency.
+LATENCY_ALPHA = 0.1
+
+#: Default settings of an active health check.
+CHECK_DEFAULTS = {"path": "/", "interval": 5.0, "timeout": 1.0, "fall": 3, "rise": 2}
+
+
+class UpstreamState:
+    """
+    Circuit of one backend.
+
+    :attrs failures (int): consecutive failed requests.
+    :attrs ejected_until (float): monotonic time the ejection ends, 0 if none.
+    :attrs ejections (int): ejections in a row, drives the back-off.
+    :attrs probing (float): start of the half-open trial request in flight,
+                            0 if none.
+    :attrs down (bool): marked down by the active health check.
+    """
+
+    __slots__ = ("failures", "ejected_until", "ejections", "probing",
+                 "down", "probe_fails", "probe_passes", "latency")
+
+    def __init__(self):
+        self.failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.probing = 0.0
+        self.down = False
+        self.probe_fails = 0
+        self.probe_passes = 0
+        self.latency = None
+
+
+class HealthRegistry:
+    """
+    Health of every upstream, keyed by ``host:port``.
+
+    Thread-safe; shared by the threaded and asyncio proxy engines.
+    """
+
+    def __init__(self, max_fails=MAX_FAILS, fail_timeout=FAIL_TIMEOUT):
+        self.max_fails = max_fails
+        self.fail_timeout = fail_timeout
+        self.lock = threading.Lock()
+        self.states = {}
+
+    def _state(self, backend):
+        state = self.states.get(backend)
+        if state is None:
+            state = self.states[backend] = UpstreamState()
+        return state
+
+    def available(self, backend):
+        """
+        Whether ``backend`` may receive a request now.
+
+        Once an ejection expires the first caller gets True and becomes the
+        half-open trial; later callers get False until it reports back.
+        """
+        state = self.states.get(backend)
+        if state is None:
+            return True
+        with self.lock:
+            if state.down:
+                return False
+            if not state.ejected_until:
+                return True
+            now = time.monotonic()
+            # A trial that never reported back does not block the backend.
+            if now < state.ejected_until or now - state.probing < self.fail_timeout:
+                return False
+            state.probing = now
+            return True
+
+    def observe(self, backend, latency, ok):
+        """
+        Record the outcome of a request proxied to ``backend``.
+
+        :params backend (str): ``host:port`` of the upstream.
+        :params latency (float): seconds until the response head.
+        :params ok (bool): False if the upstream could not be reached or
+                           broke the response.
+        """
+        with self.lock:
+            state = self._state(backend)
+            if ok and latency is not None:
+                usual = state.latency
+                if usual is not None and latency > max(SLOW_FACTOR * usual, SLOW_MIN):
+                    ok = False
+                else:
+                    state.latency = latency if usual is None else (
+                        usual + LATENCY_ALPHA * (latency - usual))
+
+            if ok:
+                if state.ejected_until:
+                    print("[Proxy] Upstream {} recovered".format(backend))
+                state.failures = 0
+                state.ejected_until = 0.0
+                state.ejections = 0
+                state.probing = 0.0
+                return
+
+            state.failures += 1
+            if state.probing or state.failures >= self.max_fails:
+                state.ejections += 1
+                duration = min(self.fail_timeout * 2 ** (state.ejections - 1), MAX_EJECTION)
+                state.ejected_until = time.monotonic() + duration
+                state.probing = 0.0
+                state.failures = 0
+                print("[Proxy] Upstream {} ejected for {:.0f}s".format(backend, duration))
+
+    def probe_result(self, backend, ok, fall, rise):
+        """Record an active health check result."""
+        with self.lock:
+            state = self._state(backend)
+            if ok:
+                state.probe_fails = 0
+                state.probe_passes += 1
+                if state.down and state.probe_passes >= rise:
+                    state.down = False
+                    print("[Proxy] Health check: upstream {} is up".format(backend))
+            else:
+                state.probe_passes = 0
+                state.probe_fails += 1
+                if not state.down and state.probe_fails >= fall:
+                    state.down = True
+                    print("[Proxy] Health check: upstream {} is down".format(backend))
+
+
+def probe(backend, path, timeout):
+    """
+    Send one health check request.
+
+    A backend answering with a status below 500 is alive; connection errors,
+    timeouts and 5xx answers are failures.
+
+    :params backend (str): ``host:port`` of the upstream.
+    :params path (str): request target of the probe.
+    :params timeout (float): seconds allowed for connect and answer.
+
+    :rtype bool: probe outcome.
+    """
+    if backend.startswith(UNIX + ":"):
+        host, port = backend.split(":", 1)
+    else:
+        host, port = backend.rsplit(":", 1)
+    try:
+        with connect(upstream_address(host, port), timeout) as sock:
+            sock.settimeout(timeout)
+            sock.sendall("GET {} HTTP/1.1\r\nHost: {}\r\nUser-Agent: WeApRous-health\r\n"
+                         "Connection: close\r\n\r\n".format(path, backend).encode("latin-1"))
+            head = read_head(sock, bytearray())
+            return head is not None and head.status < 500
+    except (OSError, ValueError, FramingError):
+        return False
+
+
+class HealthChecker:
+    """
+    Background thread probing the backends of every route with a
+    ``health_check`` setting.
+
+    :attrs routes (dict): routing table, replaced with :meth:`update`.
+    """
+
+    def __init__(self, registry, routes):
+        self.registry = registry
+        self.routes = routes
+        self.next_due = {}
+        self.thread = threading.Thread(target=self.run, name="health-checker", daemon=True)
+
+    def update(self, routes):
+        """Probe the backends of a new routing table from now on."""
+        self.routes = routes
+
+    def targets(self):
+        """(backend, settings) of every backend to probe."""
+        targets = {}
+        mappings = list(self.routes.values())
+        for mapping in self.routes.values():
+            locations = mapping[2].get("locations") if len(mapping) > 2 else None
+            if locations is not None:
+                mappings.extend(locations.routes())
+        for mapping in mappings:
+            params = mapping[2] if len(mapping) > 2 else {}
+            check = params.get("health_check")
+            if not check:
+                continue
+            backends = mapping[0] if isinstance(mapping[0], (list, tuple)) else [mapping[0]]
+            for backend in backends:
+                targets[backend] = check
+        return targets
+
+    def run(self):
+        while True:
+            now = time.monotonic()
+            for backend, check in self.targets().items():
+                if self.next_due.get(backend, 0) > now:
+                    continue
+                self.next_due[backend] = now + check["interval"]
+                ok = probe(backend, check["path"], check["timeout"])
+                self.registry.probe_result(backend, ok, check["fall"], check["rise"])
+            time.sleep(0.5)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+
+def parse_health_check(options):
+    """
+    Settings of a ``health_check`` directive.
+
+    :params options (str): directive arguments, e.g.
+                           ``/login interval=5 timeout=1 fall=3 rise=2``.
+
+    :rtype dict: settings completed with ``CHECK_DEFAULTS``.
+    """
+    check = dict(CHECK_DEFAULTS)
+    for token in options.split():
+        name, sep, value = token.partition("=")
+        if not sep:
+            check["path"] = token
+        elif name in ("interval", "timeout"):
+            check[name] = float(value)
+        elif name in ("fall", "rise"):
+            check[name] = max(int(value), 1)
+    return check
+
+
+#: Health of the upstreams of this proxy process.
+HEALTH = HealthRegistry()
+
+
+def start_health_checks(routes):
+    """
+    Start probing the backends of ``routes`` that have a ``health_check``.
+
+    :rtype HealthChecker: the running checker.
+    """
+    return HealthChecker(HEALTH, routes).start()
@@ -0,0 +1,256 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.hedge
+~~~~~~~~~~~~~~~~~
+
+This module decides when the proxy tries another upstream for a request.
+
+- **retries** (``proxy_retry <tries>``): a request whose upstream cannot be
+  connected to is sent to another backend, up to ``tries`` more times.
+  Nothing was sent yet, so this is safe for every method.
+- **hedging** (``proxy_hedge p95``): an idempotent request without body
+  that has no response head after the host's 95th percentile latency is
+  sent to a second backend as well; the first response wins and the other
+  connection is dropped. The delay follows the recent latencies of the host
+  and can be bounded with ``min=``/``max=`` milliseconds.
+
+Both draw from a per-host **retry budget**: each request earns ``budget``
+(0.2 by default) of a token and each retry or hedge spends one, plus a small
+reserve per second. While every backend is failing, extra requests are thus
+limited to about 20% of the traffic instead of multiplying it.
+
+Usage Example:
+--------------
+>>> policy = get_policy("app.local", params)
+>>> retries = RequestRetries(policy, reselect)
+>>> retries.hedge_delay()
+0.042
+
+"""
+
+import threading
+import time
+
+#: Latency samples kept per host.
+WINDOW_SIZE = 256
+#: Samples needed before hedging starts.
+MIN_SAMPLES = 20
+#: Tokens earned per request.
+BUDGET_RATIO = 0.2
+#: Tokens earned per second, so that low traffic hosts may still retry.
+BUDGET_RESERVE = 5.0
+#: Largest token balance.
+BUDGET_CAP = 100.0
+#: Methods that may be sent twice.
+IDEMPOTENT = ("GET", "HEAD", "OPTIONS")
+
+
+class LatencyWindow:
+    """
+    Last ``size`` latencies of a host and their percentile.
+
+    The percentile is recomputed every ``size // 16`` samples rather than on
+    every request.
+    """
+
+    def __init__(self, size=WINDOW_SIZE):
+        self.samples = [0.0] * size
+        self.count = 0
+        self.cached = {}
+        self.lock = threading.Lock()
+
+    def record(self, latency):
+        with self.lock:
+            self.samples[self.count % len(self.samples)] = latency
+            self.count += 1
+            if self.count % max(len(self.samples) // 16, 1) == 0:
+                self.cached = {}
+
+    def percentile(self, p):
+        """``p``-th percentile (0-100) in seconds, None without enough samples."""
+        if self.count < MIN_SAMPLES:
+            return None
+        value = self.cached.get(p)
+        if value is None:
+            with self.lock:
+                ordered = sorted(self.samples[:min(self.count, len(self.samples))])
+            value = ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+            self.cached[p] = value
+        return value
+
+
+class RetryBudget:
+    """Token bucket bounding retries and hedges to a share of the requests."""
+
+    def __init__(self, ratio=BUDGET_RATIO, reserve=BUDGET_RESERVE, cap=BUDGET_CAP):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.cap = cap
+        self.balance = reserve
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        """Account one request."""
+        with self.lock:
+            self.balance = min(self.balance + self.ratio, self.cap)
+
+    def withdraw(self):
+        """
+        Take one token for a retry or a hedge.
+
+        :rtype bool: False if the budget is exhausted.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.balance = min(self.balance + (now - self.stamp) * self.reserve, self.cap)
+            self.stamp = now
+            if self.balance < 1.0:
+                return False
+            self.balance -= 1.0
+            return True
+
+
+class UpstreamPolicy:
+    """
+    Retry and hedging settings of a host, with its latency window and budget.
+
+    :attrs retries (int): connect retries per request.
+    :attrs hedge (dict): ``proxy_hedge`` settings, None when disabled.
+    """
+
+    def __init__(self, retries=0, hedge=None, ratio=BUDGET_RATIO):
+        self.retries = retries
+        self.hedge = hedge
+        self.window = LatencyWindow()
+        self.budget = RetryBudget(ratio)
+
+    def hedge_delay(self):
+        """Seconds to wait for a response head before hedging, or None."""
+        if not self.hedge:
+            return None
+        delay = self.window.percentile(self.hedge["percentile"])
+        if delay is None:
+            return None
+        return min(max(delay, self.hedge["min"]), self.hedge["max"])
+
+
+class RequestRetries:
+    """
+    Retries and hedges left to one request.
+
+    :params policy (UpstreamPolicy): settings of the host.
+    :params reselect (callable): ``reselect(exclude)`` picks another upstream
+                                 than the ``host:port`` in ``exclude`` and
+                                 returns ``(host, port, lease)``, or None.
+    """
+
+    def __init__(self, policy, reselect):
+        self.policy = policy
+        self.reselect = reselect
+        self.tried = []
+        self.retries = 0
+        policy.budget.deposit()
+
+    def hedge_delay(self, head):
+        """Hedge delay of the request ``head``, None if it is not hedged."""
+        if head.method not in IDEMPOTENT or head.get("Content-Length") or head.get("Transfer-Encoding"):
+            return None
+        return self.policy.hedge_delay()
+
+    def record(self, latency):
+        """Record the time to the response head of a successful request."""
+        self.policy.window.record(latency)
+
+    def next_upstream(self, hedge=False):
+        """
+        Another upstream for a retry (or a hedge), if allowed.
+
+        :rtype tuple: (host, port, lease), or None.
+        """
+        if not hedge and self.retries >= self.policy.retries:
+            return None
+        if not self.policy.budget.withdraw():
+            print("[Proxy] Retry budget exhausted, not trying another upstream")
+            return None
+        choice = self.reselect(tuple(self.tried))
+        if choice is not None and not hedge:
+            self.retries += 1
+        return choice
+
+
+def parse_retry(args):
+    """
+    Settings of a ``proxy_retry <tries> [budget=<ratio>]`` directive.
+
+    :rtype dict: {"tries": int, "budget": float}.
+    """
+    if not args:
+        raise ValueError("expected a number of tries")
+    settings = {"tries": max(int(args[0]), 0), "budget": BUDGET_RATIO}
+    for arg in args[1:]:
+        name, _, value = arg.partition("=")
+        if name != "budget":
+            raise ValueError("unknown option {!r}".format(arg))
+        settings["budget"] = float(value)
+    return settings
+
+
+def parse_hedge(args):
+    """
+    Settings of a ``proxy_hedge p<NN> [min=<ms>] [max=<ms>]`` directive.
+
+    :rtype dict: {"percentile": float, "min": seconds, "max": seconds}.
+    """
+    if not args or not args[0].startswith("p"):
+        raise ValueError("expected a percentile such as p95")
+    settings = {"percentile": float(args[0][1:]), "min": 0.005, "max": 2.0}
+    if not 0 < settings["percentile"] < 100:
+        raise ValueError("percentile out of range")
+    for arg in args[1:]:
+        name, _, value = arg.partition("=")
+        if name not in ("min", "max"):
+            raise ValueError("unknown option {!r}".format(arg))
+        settings[name] = float(value) / 1000.0
+    return settings
+
+
+_policies = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(hostname, params):
+    """
+    Retry and hedging policy of a host, None if it has neither.
+
+    Policies are kept across configuration reloads while the host settings
+    stay the same, so that the latency window is not lost.
+    """
+    if not params:
+        return None
+    retry, hedge = params.get("retry"), params.get("hedge")
+    if not retry and not hedge:
+        return None
+    # Locations keep their own latency window.
+    key = (hostname, params.get("location"), tuple(sorted((retry or {}).items())),
+           tuple(sorted((hedge or {}).items())))
+    policy = _policies.get(key)
+    if policy is None:
+        with _policies_lock:
+            policy = _policies.get(key)
+            if policy is None:
+                policy = _policies[key] = UpstreamPolicy(
+                    (retry or {}).get("tries", 0), hedge,
+                    (retry or {}).get("budget", BUDGET_RATIO))
+    return policy
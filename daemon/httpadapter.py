@@ -20,9 +20,37 @@ raw URL paths and RESTful route definitions, and integrates with
 Request and Response objects to handle client-server communication.
 """
 
+import socket
+
+from . import tracing
+from .framing import (MAX_BODY_SIZE, BodyTooLarge, FramingError, MessageHead, body_framing,
+                      read_body, read_head)
 from .request import Request
 from .response import Response
 
+#: Seconds a keep-alive connection may stay idle between requests.
+KEEPALIVE_TIMEOUT = 5
+#: Requests served on one connection before it is closed.
+MAX_KEEPALIVE_REQUESTS = 100
+
+BAD_REQUEST = (
+    b"HTTP/1.1 400 Bad Request\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Content-Length: 15\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b"400 Bad Request"
+)
+
+PAYLOAD_TOO_LARGE = (
+    b"HTTP/1.1 413 Content Too Large\r\n"
+    b"Content-Type: text/plain\r\n"
+    b"Content-Length: 21\r\n"
+    b"Connection: close\r\n"
+    b"\r\n"
+    b"413 Content Too Large"
+)
+
 class HttpAdapter:
     """
     A mutable :class:`HTTP adapter <HTTP adapter>` for managing client connections
@@ -41,6 +69,7 @@ class HttpAdapter:
         routes (dict): Mapping of route paths to handler functions.
         request (Request): Request object for parsing incoming data.
         response (Response): Response object for building and sending replies.
+        cors (CorsPolicy): Optional CORS policy answering preflight requests.
     """
 
     __attrs__ = [
@@ -51,9 +80,10 @@ class HttpAdapter:
         "routes",
         "request",
         "response",
+        "cors",
     ]
 
-    def __init__(self, ip, port, conn, connaddr, routes):
+    def __init__(self, ip, port, conn, connaddr, routes, cors=None):
         """
         Initialize a new HttpAdapter instance.
 
@@ -62,6 +92,7 @@ class HttpAdapter:
         :param conn (socket): Active socket connection.
         :param connaddr (tuple): Address of the connected client.
         :param routes (dict): Mapping of route paths to handler functions.
+        :param cors (CorsPolicy): Optional CORS policy answering preflights.
         """
 
         #: IP address.
@@ -78,15 +109,21 @@ class HttpAdapter:
         self.request = Request()
         #: Response
         self.response = Response()
+        #: CORS policy
+        self.cors = cors
 
     def handle_client(self, conn, addr, routes):
         """
         Handle an incoming client connection.
 
-        This method reads the request from the socket, prepares the request object,
+        This method reads requests from the socket, prepares the request object,
         invokes the appropriate route handler if available, builds the response,
         and sends it back to the client.
 
+        With HTTP keep-alive several requests are served on the connection. It
+        is closed when the client asks for ``Connection: close``, stays idle for
+        ``KEEPALIVE_TIMEOUT`` seconds, or after ``MAX_KEEPALIVE_REQUESTS``.
+
         :param conn (socket): The client socket connection.
         :param addr (tuple): The client's address.
         :param routes (dict): The route mapping for dispatching requests.
@@ -95,42 +132,153 @@ class HttpAdapter:
         self.conn = conn        
         # Connection address.
         self.connaddr = addr
+        conn.settimeout(KEEPALIVE_TIMEOUT)
+        buffer = bytearray()
+        try:
+            for served in range(1, MAX_KEEPALIVE_REQUESTS + 1):
+                try:
+                    head = read_head(conn, buffer)
+                    if head is None:
+                        break
+                    body = read_body(conn, buffer, body_framing(head), MAX_BODY_SIZE)
+                except socket.timeout:
+                    break
+                except BodyTooLarge as e:
+                    print("[HttpAdapter] Request from {} refused: {}".format(addr, e))
+                    conn.sendall(PAYLOAD_TOO_LARGE)
+                    break
+                except FramingError as e:
+                    print("[HttpAdapter] Bad request from {}: {}".format(addr, e))
+                    conn.sendall(BAD_REQUEST)
+                    break
+
+                msg = (head.to_bytes() + body).decode("utf-8", errors="replace")
+                keep_alive = head.keep_alive() and served < MAX_KEEPALIVE_REQUESTS
+                if not self.handle_request(conn, addr, routes, msg, keep_alive):
+                    break
+        finally:
+            conn.close()
+
+    def handle_request(self, conn, addr, routes, msg, keep_alive=False):
+        """
+        Serve one request read from the connection.
+
+        :param conn (socket): The client socket connection.
+        :param addr (tuple): The client's address.
+        :param routes (dict): The route mapping for dispatching requests.
+        :param msg (str): The complete raw request.
+        :param keep_alive (bool): Whether the client asked to keep the connection.
+
+        :rtype: bool - True if the connection can serve another request.
+        """
         # Request handler
-        msg = conn.recv(4096).decode()
+        self.request = Request()
+        self.response = Response()
         req = self.request
         req.prepare(msg, routes)
-        # Handle request hook
-        #     #
-        #     # TODO: handle for App hook here
-        #     #
-        req.hook = self.routes.get((req.method, req.path))
-        print("[HttpAdapter] Hook assigned for", req.method, req.path, "->", f"{req.hook.__name__}(req)" if req.hook else 'None')        
-        resp = self.response
-        
 
-        if req.hook:
-            result = req.hook(req)
-            if isinstance(result, Response):
-                resp_obj = result
-            else:
-                try:
-                    status, headers, body = result
-                except Exception:
-                    resp_obj = Response(request=req)
-                    resp_obj.status_code = 502
-                    resp_obj.content = b"502 Bad Gateway"
-                    resp_obj.headers['Content-Type'] = 'text/plain'
+        # Continue the caller's trace (if any) with a server span so that
+        # outgoing Request.send calls made by the hook become its children.
+        span = tracing.start_span(
+            "{} {}".format(req.method, req.path),
+            kind="server",
+            parent=tracing.extract(req.headers),
+            attributes={"http.method": req.method, "http.path": req.path,
+                        "net.peer": "{}:{}".format(*addr[:2]) if addr else None},
+        )
+        with tracing.activate(span, finish=True):
+            # Preflights are answered from the policy's pre-rendered bytes,
+            # without routing or calling a handler.
+            if req.method == "OPTIONS" and self.cors is not None:
+                conn.sendall(self.cors.preflight(req.headers.get("Origin", "")))
+                span.set_attribute("http.status_code", 204)
+                return False
+
+            # Handle request hook
+            #     #
+            #     # TODO: handle for App hook here
+            #     #
+            req.hook = self.routes.get((req.method, req.path))
+            print("[HttpAdapter] Hook assigned for", req.method, req.path, "->", f"{req.hook.__name__}(req)" if req.hook else 'None')        
+            resp = self.response
+            resp_obj = resp
+
+            if req.hook:
+                result = req.hook(req)
+                if isinstance(result, Response):
+                    resp_obj = result
                 else:
-                    resp_obj = Response(request=req)
-                    resp_obj.status_code = status
-                    resp_obj.headers.update(headers or {})
-                    resp_obj.content = body or b''
-
-            conn.sendall(resp_obj.build_response(req))
-        else:
-            response = resp.build_response(req)
+                    try:
+                        status, headers, body = result
+                    except Exception:
+                        resp_obj = Response(request=req)
+                        resp_obj.status_code = 502
+                        resp_obj.content = b"502 Bad Gateway"
+                        resp_obj.headers['Content-Type'] = 'text/plain'
+                    else:
+                        resp_obj = Response(request=req)
+                        resp_obj.status_code = status
+                        resp_obj.headers.update(headers or {})
+                        resp_obj.content = body or b''
+
+            if resp_obj.stream is not None:
+                self.send_stream(conn, req, resp_obj)
+                span.set_attribute("http.status_code", resp_obj.status_code or 200)
+                return False
+
+            if keep_alive:
+                resp_obj.headers["Connection"] = "keep-alive"
+            response = resp_obj.build_response(req)
             conn.sendall(response)
-        conn.close()
+            span.set_attribute("http.status_code", resp_obj.status_code or 200)
+        return keep_alive and self.reusable(response)
+
+    def send_stream(self, conn, req, resp):
+        """
+        Send a response whose body is produced while it is sent.
+
+        The head goes first, then every chunk of ``resp.stream`` as soon as
+        it is produced, with chunked transfer coding. The stream is closed
+        when it ends or the client goes away, so that a generator releases
+        what it holds in its ``finally`` clause. The connection is not reused.
+
+        :param conn (socket): The client socket connection.
+        :param req (Request): The request being answered.
+        :param resp (Response): Response with a ``stream`` of bytes.
+        """
+        resp.headers["Connection"] = "close"
+        conn.sendall(resp.build_response_header(req))
+        try:
+            for chunk in resp.stream:
+                if chunk:
+                    conn.sendall(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            conn.sendall(b"0\r\n\r\n")
+        except socket.error as e:
+            print("[HttpAdapter] Stream to {} ended: {}".format(self.connaddr, e))
+        finally:
+            close = getattr(resp.stream, "close", None)
+            if close is not None:
+                close()
+
+    @staticmethod
+    def reusable(response):
+        """
+        Whether the connection may carry another request after ``response``.
+
+        Some responses are pre-formatted with ``Connection: close`` or have no
+        ``Content-Length``; the client can only find their end when the
+        connection closes.
+
+        :param response (bytes): The encoded response that was sent.
+        :rtype: bool
+        """
+        if not response.startswith(b"HTTP/"):
+            return False
+        try:
+            head = MessageHead.parse(response.split(b"\r\n\r\n", 1)[0])
+        except FramingError:
+            return False
+        return head.get("Content-Length") is not None and not head.has_token("Connection", "close")
 
     @property
     def extract_cookies(self, req, resp):
@@ -0,0 +1,131 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.middleware
+~~~~~~~~~~~~~~~~~
+
+This module provides the middleware pipeline of :class:`WeApRous <WeApRous>`
+and the built-in auth and CORS middlewares.
+
+A middleware is a callable ``middleware(req, call_next)`` that either returns
+a response on its own (short-circuit) or calls ``call_next(req)`` and returns,
+possibly after decorating, what the rest of the chain produced. The result
+types are the ones accepted from route handlers: a :class:`Response <Response>`
+or a ``(status, headers, body)`` tuple.
+
+Chains are compiled once at start-up by :func:`compile_chain` into nested
+closures, one callable per route, so that dispatching a request never walks
+a middleware list.
+
+Usage Example:
+--------------
+>>> app = WeApRous()
+>>> app.use(cors())
+>>> login_required = auth(lambda: app.peer_client.username)
+>>> @app.route('/get-messages', methods=['GET'], middleware=[login_required])
+>>> def get_messages(req):
+>>>     return _json({"messages": MESSAGES})
+
+"""
+
+import functools
+
+from .cors import CorsPolicy
+from .response import Response, _json
+from .utils import auth_check
+
+
+def _bind(middleware, call_next):
+    def step(req):
+        return middleware(req, call_next)
+    return step
+
+
+def compile_chain(handler, middlewares):
+    """
+    Fold ``middlewares`` around ``handler`` into a single callable.
+
+    The first middleware is the outermost one: it sees the request first and
+    the response last. Without middleware the handler itself is returned.
+
+    :params handler (callable): route handler ``handler(req)``.
+    :params middlewares (list): middlewares ``mw(req, call_next)``.
+
+    :rtype callable: ``pipeline(req)`` carrying the handler's name.
+    """
+    if not middlewares:
+        return handler
+
+    pipeline = handler
+    for middleware in reversed(middlewares):
+        pipeline = _bind(middleware, pipeline)
+    return functools.wraps(handler)(pipeline)
+
+
+def auth(username):
+    """
+    Build a middleware accepting only the logged-in owner of this app.
+
+    The request passes when its cookies carry ``auth=true`` and the expected
+    ``username`` (see :func:`auth_check <daemon.utils.auth_check>`); otherwise
+    the chain stops with ``401 Unauthorized`` and the handler is not called.
+
+    :params username (str or callable): expected username, or a zero-argument
+                                        callable returning it when the app is
+                                        configured after the routes.
+
+    :rtype callable: the middleware.
+    """
+    expected = username if callable(username) else (lambda: username)
+
+    def auth_middleware(req, call_next):
+        if auth_check(expected(), req):
+            return call_next(req)
+        return _json({"error": "Unauthorized"}, 401)
+    return auth_middleware
+
+
+def cors(policy=None):
+    """
+    Build a middleware adding CORS headers to every response of a route.
+
+    The headers come from a :class:`CorsPolicy <daemon.cors.CorsPolicy>`,
+    rendered once per origin. Preflight ``OPTIONS`` requests are answered with
+    ``204 No Content`` directly by the middleware, without calling the handler
+    (apps with ``app.cors`` set answer them even before routing).
+
+    :params policy (CorsPolicy): rules to apply. Defaults to any origin,
+                                 ``GET, POST, OPTIONS`` and ``Content-Type``.
+
+    :rtype callable: the middleware.
+    """
+    if policy is None:
+        policy = CorsPolicy()
+
+    def cors_middleware(req, call_next):
+        headers = policy.headers_for(req.headers.get("Origin", ""))
+        if req.method == "OPTIONS":
+            resp = Response(req)
+            resp.status_code = 204
+            resp.content = b""
+            resp.headers.update(headers)
+            return resp
+
+        result = call_next(req)
+        if isinstance(result, Response):
+            result.headers.update(headers)
+        elif isinstance(result, tuple) and len(result) == 3:
+            status, resp_headers, body = result
+            result = (status, dict(resp_headers or {}, **headers), body)
+        return result
+    return cors_middleware
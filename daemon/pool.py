@@ -0,0 +1,223 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.pool
+~~~~~~~~~~~~~~~~~
+
+This module provides keep-alive connection pools towards proxy upstreams.
+
+Every upstream address gets a :class:`ConnectionPool <ConnectionPool>` holding
+idle HTTP/1.1 connections. A connection is validated before reuse (it must
+not be older than the idle TTL, nor closed or readable by the peer), and is
+returned to the pool only when the response it carried was completely read.
+Connections are shared between all client requests of the proxy, which
+removes the connect latency and ephemeral port churn of one TCP connection
+per proxied request.
+
+An address ``("unix", "/path/app.sock")`` (from ``proxy_pass
+unix:/path/app.sock``) is reached through an ``AF_UNIX`` stream socket: a
+backend on the same machine is then spoken to without the TCP stack.
+
+Usage Example:
+--------------
+>>> pool = POOLS.get(("127.0.0.1", 9001))
+>>> sock, reused = pool.acquire()
+>>> ...  # send the request, read the complete response
+>>> pool.release(sock)       # or pool.discard(sock) when it cannot be reused
+
+"""
+
+import socket
+import threading
+import time
+from collections import deque
+
+#: Idle connections kept per upstream.
+MAX_IDLE = 16
+#: Seconds an idle connection may wait in the pool (backends close after 5s).
+IDLE_TTL = 4.0
+#: Connect timeout towards upstreams.
+CONNECT_TIMEOUT = 2.0
+#: Timeout of each send/recv on an upstream connection.
+READ_TIMEOUT = 30.0
+#: Host part of the address of an upstream listening on a Unix socket.
+UNIX = "unix"
+
+
+class ConnectionPool:
+    """
+    Idle keep-alive connections to one upstream address.
+
+    :attrs address (tuple): (host, port) of the upstream, or (``UNIX``, path).
+    :attrs max_idle (int): idle connections kept at most.
+    :attrs idle_ttl (float): seconds an idle connection stays reusable.
+    """
+
+    def __init__(self, address, max_idle=MAX_IDLE, idle_ttl=IDLE_TTL,
+                 connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+        self.address = address
+        self.max_idle = max_idle
+        self.idle_ttl = idle_ttl
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.lock = threading.Lock()
+        #: (socket, time it became idle), most recently used at the right.
+        self.idle = deque()
+        self.stats = {"connects": 0, "reuses": 0, "stale": 0}
+
+    def connect(self):
+        """Open a new connection to the upstream."""
+        sock = connect(self.address, self.connect_timeout)
+        sock.settimeout(self.read_timeout)
+        with self.lock:
+            self.stats["connects"] += 1
+        return sock
+
+    def acquire(self):
+        """
+        Get a connection, reusing a healthy idle one when possible.
+
+        :rtype tuple: (socket, reused) where reused tells whether the socket
+                      already carried a request.
+        """
+        now = time.monotonic()
+        while True:
+            with self.lock:
+                if not self.idle:
+                    break
+                # LIFO: the most recently used connection is the least likely
+                # to have been closed by the backend.
+                sock, since = self.idle.pop()
+            if now - since < self.idle_ttl and is_alive(sock):
+                with self.lock:
+                    self.stats["reuses"] += 1
+                return sock, True
+            with self.lock:
+                self.stats["stale"] += 1
+            close_quietly(sock)
+        return self.connect(), False
+
+    def release(self, sock):
+        """Return a connection whose last response was fully read."""
+        evicted = None
+        with self.lock:
+            self.idle.append((sock, time.monotonic()))
+            if len(self.idle) > self.max_idle:
+                evicted = self.idle.popleft()[0]
+        if evicted is not None:
+            close_quietly(evicted)
+
+    def discard(self, sock):
+        """Close a connection that must not be reused."""
+        close_quietly(sock)
+
+    def clear(self):
+        """Close every idle connection."""
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for sock, _ in idle:
+            close_quietly(sock)
+
+
+class PoolManager:
+    """Lazily creates and holds one :class:`ConnectionPool` per upstream address."""
+
+    def __init__(self, **pool_kwargs):
+        self.pool_kwargs = pool_kwargs
+        self.lock = threading.Lock()
+        self.pools = {}
+
+    def get(self, address):
+        """
+        Pool for ``address``.
+
+        :params address (tuple): (host, port) of the upstream.
+
+        :rtype ConnectionPool: the pool, created on first use.
+        """
+        pool = self.pools.get(address)
+        if pool is None:
+            with self.lock:
+                pool = self.pools.get(address)
+                if pool is None:
+                    pool = ConnectionPool(address, **self.pool_kwargs)
+                    self.pools[address] = pool
+        return pool
+
+
+def connect(address, timeout):
+    """
+    Open a connection to an upstream.
+
+    :params address (tuple): (host, port), or (``UNIX``, socket path).
+    :params timeout (float): connect timeout in seconds.
+
+    :rtype socket.socket: the connected socket.
+    """
+    if address[0] == UNIX:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address[1])
+        except OSError:
+            sock.close()
+            raise
+        return sock
+    sock = socket.create_connection(address, timeout=timeout)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return sock
+
+
+def upstream_address(host, port):
+    """
+    Address of an upstream from the (host, port) strings of a route.
+
+    :rtype tuple: (host, int port), or (``UNIX``, socket path).
+    """
+    if host == UNIX:
+        return host, port
+    return host, int(port)
+
+
+def is_alive(sock):
+    """
+    Check that an idle connection can carry a new request.
+
+    An idle HTTP connection must not be readable: readability means the peer
+    closed it (EOF) or sent unsolicited bytes, and it cannot be reused.
+    """
+    timeout = sock.gettimeout()
+    try:
+        sock.setblocking(False)
+        sock.recv(1, socket.MSG_PEEK)
+    except BlockingIOError:
+        return True
+    except OSError:
+        return False
+    finally:
+        try:
+            sock.settimeout(timeout)
+        except OSError:
+            pass
+    return False
+
+
+def close_quietly(sock):
+    try:
+        sock.close()
+    except OSError:
+        pass
+
+
+#: Pools shared by every client connection of the proxy.
+POOLS = PoolManager()
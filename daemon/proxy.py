@@ -27,9 +27,26 @@ Requirement:
 - dictionary: :class: `CaseInsensitiveDict <CaseInsensitiveDict>` for managing headers and cookies.
 
 """
+import selectors
 import socket
 import threading
+import time
+
+from . import tracing
+from .balancer import get_balancer, request_key
+from .cache import (CACHE, FRESH, STALE, conditional_headers, lookup_request, render,
+                    response_storable, revalidate_in_background)
+from .coalesce import FLIGHTS, coalesce_key
+from .framing import NO_BODY, UNTIL_CLOSE, FramingError, body_framing, read_head, relay_body
+from .health import HEALTH, start_health_checks
+from .hedge import RequestRetries, get_policy
+from .httpadapter import BAD_REQUEST, KEEPALIVE_TIMEOUT, MAX_KEEPALIVE_REQUESTS
+from .pool import POOLS, READ_TIMEOUT, upstream_address
+from .proxyconf import ConfigSource, current_routes, resolve_location
+from .ratelimit import check_limits, too_many_requests
 from .response import *
+from .static import send_file, static_response
+from .tunnel import TOO_MANY_TUNNELS, TUNNELS, is_upgrade, relay_tunnel, tunnel_settings
 
 #: A dictionary mapping hostnames to backend IP and port tuples.
 #: Used to determine routing targets for incoming requests.
@@ -38,60 +55,352 @@ PROXY_PASS = {
     "app.local": [('127.0.0.1', 9001), ('127.0.0.1', 9002)],
 }
 
-def forward_request(host, port, request):
+NOT_FOUND = (
+    "HTTP/1.1 404 Not Found\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 13\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "404 Not Found"
+).encode('utf-8')
+
+#: Hop-by-hop headers that are not relayed as they are.
+HOP_HEADERS = ("Connection", "Keep-Alive", "Proxy-Connection")
+
+def forward_request(host, port, head, conn, buffer, keep_alive=False, lease=None,
+                    cache_key=None, stale=None, flight=None, retries=None):
     """
-    Forwards an HTTP request to a backend server and retrieves the response.
+    Forwards an HTTP request to a backend server and streams the response
+    back to the client.
+
+    The request travels on a pooled keep-alive connection (see
+    :mod:`daemon.pool`). Request and response bodies are relayed as they
+    arrive, through a fixed buffer, and the exchange ends exactly where the
+    response framing says the message ends. A reused connection the backend
+    closed in the meantime is retried once on a fresh one when the request
+    has no body to replay.
+
+    For hosts with ``proxy_cache on;`` (see :mod:`daemon.cache`) a storable
+    response is kept while it is relayed, and a ``stale`` entry is
+    revalidated with a conditional request: on ``304 Not Modified`` the
+    client is answered from the refreshed entry. The response of a coalesced
+    request (see :mod:`daemon.coalesce`) is handed over to its ``flight``.
+
+    With ``retries`` (see :mod:`daemon.hedge`) an upstream that refuses the
+    connection is replaced by another one, and an idempotent request still
+    waiting for its response head after the hedge delay is also sent to a
+    second upstream; the first to answer is relayed.
 
     :params host (str): IP address of the backend server.
     :params port (int): port number of the backend server.
-    :params request (str): incoming HTTP request.
-
-    :rtype bytes: Raw HTTP response from the backend server. If the connection
-                  fails, returns a 404 Not Found response.
+    :params head (MessageHead): head of the client request.
+    :params conn (socket.socket): client connection, the request body is
+                                  read from it and the response written to it.
+    :params buffer (bytearray): bytes already received from the client.
+    :params keep_alive (bool): whether the client connection may stay open.
+    :params lease (Lease): balancer lease completed with the time to the
+                           response head.
+    :params cache_key (str): cache key of the request, None if the host does
+                             not cache or the request is not cacheable.
+    :params stale (CacheEntry): stored response to revalidate.
+    :params flight (Flight): flight led by this request, if coalesced.
+    :params retries (RequestRetries): retries and hedges left to the request.
+
+    :rtype bool: True if the client connection can carry another request. If
+                 the backend is unreachable, a 404 Not Found is sent instead.
     """
 
-    backend = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    backend.settimeout(2)
+    # Hop span: the backend continues the trace from this span.
+    span = tracing.start_span(
+        "forward {}:{}".format(host, port),
+        kind="client",
+        attributes={"net.peer": "{}:{}".format(host, port)},
+    )
+    for name in HOP_HEADERS:
+        head.remove(name)
+    head.set("Connection", "keep-alive")
+    head.set(tracing.TRACEPARENT, span.context.to_header())
+    # Conditional headers added by the proxy itself, removed again before
+    # the client is answered from the revalidated entry.
+    validators = []
+    if stale is not None and not head.get("If-None-Match") and not head.get("If-Modified-Since"):
+        validators = conditional_headers(stale)
+        for name, value in validators:
+            head.set(name, value)
+    request_framing = body_framing(head)
+    started = time.monotonic()
+    hedge_delay = retries.hedge_delay(head) if retries is not None else None
 
     try:
-        backend.connect((host, port))
-        backend.sendall(request.encode())
-        response = b""
-        backend.settimeout(2)
         while True:
+            pool = POOLS.get((host, port))
+            if retries is not None:
+                retries.tried.append("{}:{}".format(host, port))
             try:
-                chunk = backend.recv(4096)
-                if not chunk:
-                    break
-                response += chunk
-            except socket.timeout:
-                break
-        return response
-    
-    except socket.error as e:
+                backend, reused = pool.acquire()
+            except socket.error as e:
+                # Nothing was sent yet: another upstream may take the request.
+                alternate = retries.next_upstream() if retries is not None else None
+                if alternate is None:
+                    raise
+                print("[Proxy] Cannot connect to {}:{} ({}), retrying".format(host, port, e))
+                fail_upstream(host, port, lease, time.monotonic() - started)
+                host, port, lease = alternate
+                span.set_attribute("net.peer", "{}:{}".format(host, port))
+                span.set_attribute("net.retried", True)
+                continue
+            upstream = bytearray()
+            try:
+                backend.sendall(head.to_bytes())
+                relay_body(conn, backend, buffer, request_framing)
+                if hedge_delay is not None and not readable(backend, hedge_delay):
+                    hedged = hedge_request(head, retries, (backend, host, port, pool, lease, reused))
+                    backend, host, port, pool, lease, reused = hedged
+                    span.set_attribute("net.peer", "{}:{}".format(host, port))
+                resp = read_head(backend, upstream)
+                if resp is None:
+                    raise FramingError("upstream closed the connection")
+            except (socket.error, FramingError) as e:
+                pool.discard(backend)
+                # The backend may close an idle connection at any time; only
+                # a reused connection that failed before answering a request
+                # without body is retried.
+                if (reused and request_framing[0] == NO_BODY and not upstream
+                        and not isinstance(e, socket.timeout)):
+                    span.set_attribute("net.retried", True)
+                    continue
+                raise
+            break
+    except (socket.error, FramingError) as e:
         print("Socket error: {}".format(e))
-        return (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
+        span.set_attribute("error", str(e))
+        span.finish()
+        fail_upstream(host, port, lease, time.monotonic() - started)
+        conn.sendall(NOT_FOUND)
+        return False
+
+    ttfb = time.monotonic() - started
+    ok = True
+    if retries is not None:
+        retries.record(ttfb)
+
+    try:
+        framing = body_framing(resp, request_method=head.method)
+        until_close = framing[0] == UNTIL_CLOSE
+        keep_alive = keep_alive and not until_close
+        span.set_attribute("net.reused", reused)
+        span.set_attribute("http.status_line", resp.start_line)
+
+        if validators and resp.status == 304:
+            CACHE.refresh(stale, resp)
+            for name, _ in validators:
+                head.remove(name)
+            head_bytes, body = render(stale, head, keep_alive, status="REVALIDATED")
+            conn.sendall(head_bytes)
+            if body:
+                conn.sendall(body)
+        else:
+            for name in HOP_HEADERS:
+                resp.remove(name)
+            resp.set("Connection", "keep-alive" if keep_alive else "close")
+            storable = False
+            if cache_key is not None:
+                resp.set("X-Cache", "MISS")
+                storable = response_storable(head, resp, framing, CACHE.max_entry_bytes)
+            shared = flight is not None and flight.shareable(resp, framing)
+            tee = bytearray() if storable or shared else None
+            conn.sendall(resp.to_bytes())
+            relay_body(backend, conn, upstream, framing, tee=tee)
+            if storable:
+                CACHE.store(cache_key, resp, tee)
+            if shared:
+                FLIGHTS.complete(flight, resp, tee)
+    except (socket.error, FramingError) as e:
+        # The response has started: the client can only see it cut short.
+        print("[Proxy] Relay from {}:{} aborted: {}".format(host, port, e))
+        # A body cut short by the upstream counts against it.
+        if isinstance(e, FramingError):
+            ok = False
+        span.set_attribute("error", str(e))
+        pool.discard(backend)
+        return False
     finally:
-        backend.close()
+        span.finish()
+        HEALTH.observe("{}:{}".format(host, port), ttfb, ok)
+        if lease is not None:
+            lease.done(ttfb, ok)
 
-global round_robin_counters
-round_robin_counters = dict()
+    if resp.keep_alive() and not until_close and not upstream:
+        pool.release(backend)
+    else:
+        pool.discard(backend)
+    return keep_alive
 
-def resolve_routing_policy(hostname, routes):
+def tunnel_request(hostname, table, head, conn, buffer, addr, params):
+    """
+    Forwards a request asking for a protocol upgrade (WebSocket) and, once
+    the backend answers ``101 Switching Protocols``, relays the connection
+    as a byte tunnel until either side closes it (see :mod:`daemon.tunnel`).
+
+    The backend connection is opened for the tunnel alone and never pooled.
+    Any other answer is relayed as a final response. Either way the client
+    connection carries no other request afterwards.
+
+    :params hostname (str): virtual host of the request.
+    :params table (dict): routing table the request was resolved with.
+    :params head (MessageHead): head of the client request.
+    :params conn (socket.socket): client connection.
+    :params buffer (bytearray): bytes already received from the client.
+    :params addr (tuple): client address.
+    :params params (dict): route parameters of the request.
+    """
+    if not TUNNELS.acquire(hostname, params):
+        print("[Proxy] Tunnel limit of {} reached, refusing upgrade".format(hostname))
+        conn.sendall(TOO_MANY_TUNNELS)
+        return
+    host, port, lease = select_upstream(hostname, table, head, addr)
+    if not host:
+        TUNNELS.release(hostname)
+        conn.sendall(NOT_FOUND)
+        return
+    host, port = upstream_address(host, port)
+    span = tracing.start_span(
+        "tunnel {}".format(head.start_line),
+        kind="server",
+        parent=tracing.SpanContext.from_header(head.get(tracing.TRACEPARENT)),
+        attributes={"http.host": hostname, "net.peer": "{}:{}".format(host, port)},
+    )
+    for name in ("Keep-Alive", "Proxy-Connection"):
+        head.remove(name)
+    head.set("Connection", "Upgrade")
+    head.set(tracing.TRACEPARENT, span.context.to_header())
+    started = time.monotonic()
+    backend = None
+    ttfb = None
+    try:
+        backend = POOLS.get((host, port)).connect()
+        backend.sendall(head.to_bytes())
+        relay_body(conn, backend, buffer, body_framing(head))
+        upstream = bytearray()
+        resp = read_head(backend, upstream)
+        if resp is None:
+            raise FramingError("upstream closed the connection")
+        ttfb = time.monotonic() - started
+        HEALTH.observe("{}:{}".format(host, port), ttfb, True)
+        if lease is not None:
+            lease.done(ttfb, True)
+        span.set_attribute("http.status_line", resp.start_line)
+        if resp.status != 101:
+            # No tunnel: a final response, ending the client connection.
+            for name in HOP_HEADERS:
+                resp.remove(name)
+            resp.set("Connection", "close")
+            conn.sendall(resp.to_bytes())
+            relay_body(backend, conn, upstream, body_framing(resp, request_method=head.method))
+            return
+        conn.sendall(resp.to_bytes())
+        print("[Proxy] Tunnel {} to {}:{} opened".format(hostname, host, port))
+        idle = tunnel_settings(params)["idle"]
+        conn.settimeout(idle)
+        backend.settimeout(idle)
+        upstream_sent, client_sent = relay_tunnel(conn, backend, buffer, upstream, idle)
+        span.set_attribute("tunnel.bytes_up", upstream_sent)
+        span.set_attribute("tunnel.bytes_down", client_sent)
+        print("[Proxy] Tunnel {} to {}:{} closed after {:.1f}s".format(
+            hostname, host, port, time.monotonic() - started))
+    except (socket.error, FramingError) as e:
+        print("[Proxy] Tunnel to {}:{} failed: {}".format(host, port, e))
+        span.set_attribute("error", str(e))
+        if ttfb is None:
+            fail_upstream(host, port, lease, time.monotonic() - started)
+            try:
+                conn.sendall(NOT_FOUND)
+            except socket.error:
+                pass
+    finally:
+        TUNNELS.release(hostname)
+        span.finish()
+        if backend is not None:
+            backend.close()
+
+def fail_upstream(host, port, lease, latency):
+    """Report a request that ``host:port`` could not answer."""
+    HEALTH.observe("{}:{}".format(host, port), latency, False)
+    if lease is not None:
+        lease.done(latency, ok=False)
+
+def readable(sock, timeout):
+    """Whether ``sock`` has data (or EOF) to read within ``timeout`` seconds."""
+    with selectors.DefaultSelector() as selector:
+        selector.register(sock, selectors.EVENT_READ)
+        return bool(selector.select(timeout))
+
+def hedge_request(head, retries, primary):
+    """
+    Send ``head`` to a second upstream and keep whichever answers first.
+
+    :params head (MessageHead): request head, without body.
+    :params retries (RequestRetries): allowance of the request.
+    :params primary (tuple): (sock, host, port, pool, lease, reused) of the
+                             upstream already waited for.
+
+    :rtype tuple: the same fields for the winning upstream. The other one is
+                  dropped without counting against its health.
+    """
+    alternate = retries.next_upstream(hedge=True)
+    if alternate is None:
+        return primary
+    host, port, lease = alternate
+    pool = POOLS.get((host, port))
+    try:
+        sock, reused = pool.acquire()
+    except socket.error as e:
+        fail_upstream(host, port, lease, 0.0)
+        print("[Proxy] Hedge to {}:{} failed: {}".format(host, port, e))
+        return primary
+    try:
+        sock.sendall(head.to_bytes())
+    except socket.error:
+        pool.discard(sock)
+        if lease is not None:
+            lease.done()
+        return primary
+
+    print("[Proxy] Hedging {} to {}:{}".format(head.start_line, host, port))
+    hedge = (sock, host, port, pool, lease, reused)
+    # A selector (epoll on Linux) works with descriptors above 1024, which
+    # select() does not.
+    with selectors.DefaultSelector() as selector:
+        selector.register(primary[0], selectors.EVENT_READ)
+        selector.register(sock, selectors.EVENT_READ)
+        ready = [key.fileobj for key, _ in selector.select(READ_TIMEOUT)]
+    winner, loser = (hedge, primary) if sock in ready and primary[0] not in ready else (primary, hedge)
+    loser[3].discard(loser[0])
+    if loser[4] is not None:
+        loser[4].done()
+    return winner
+
+def select_upstream(hostname, routes, head=None, addr=None, exclude=()):
     """
     Handles an routing policy to return the matching proxy_pass.
     It determines the target backend to forward the request to.
 
-    :params host (str): IP address of the request target server.
-    :params port (int): port number of the request target server.
+    The ``location`` of the host with the longest prefix of the request path
+    applies, if any. With several backends the ``dist_policy`` picks one through
+    its :mod:`balancer <daemon.balancer>`, skipping the backends that
+    :mod:`health <daemon.health>` reports as down or ejected. The returned lease must be
+    completed with the request latency (``lease.done(latency, ok)``) so that
+    load and latency aware policies see the outcome.
+
+    :params hostname (str): hostname of the request.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params head (MessageHead): request head, source of the ``hash_key``.
+    :params addr (tuple): client address, key of ``hash_key ip``.
+    :params exclude (tuple): ``host:port`` of upstreams already tried, only
+                             picked when no other one is available.
+
+    :rtype tuple: (host, port, lease) where lease is None when no balancer
+                  was involved.
     """
     proxy_host = '127.0.0.1'
     proxy_port = '9000'
@@ -100,23 +409,28 @@ def resolve_routing_policy(hostname, routes):
         hostname = hostname.split(":")[0]
 
     mapping = routes.get(hostname)
+    if head is not None:
+        mapping = resolve_location(mapping, head.target)
     if not mapping:
         print(f"[Proxy] No mapping for {hostname}, fallback to default")
-        return proxy_host, proxy_port
+        return proxy_host, proxy_port, None
 
-    proxy_map, policy = mapping
+    proxy_map, policy = mapping[:2]
+    params = mapping[2] if len(mapping) > 2 else {}
     print(f"[Proxy] Proxy map: {proxy_map}")
     print(f"[Proxy] Policy: {policy}")
 
     if not proxy_map or proxy_map == "":
         print(f"[Proxy] Empty proxy map for {hostname}")
-        return proxy_host, proxy_port
+        return proxy_host, proxy_port, None
 
     proxy_host = ''
     proxy_port = '9000'
+    lease = None
 
     # Many backends
-    if isinstance(proxy_map, list):
+    if isinstance(proxy_map, (list, tuple)):
+        balancer = get_balancer(hostname, proxy_map, policy, params.get("weights"))
         if len(proxy_map) == 0:
             print("[Proxy] Empty resolved routing of hostname {}".format(hostname))
             print("[Proxy] Empty proxy_map result")
@@ -128,14 +442,15 @@ def resolve_routing_policy(hostname, routes):
             proxy_port = '9000'
         elif len(proxy_map) == 1:
             proxy_host, proxy_port = proxy_map[0].split(":", 2)
-        
-        #elif: # apply the policy handling 
-        #   proxy_map
-        #   policy
-        elif policy == "round-robin":
-            idx = round_robin_counters.get(hostname, 0) % len(proxy_map)
-            round_robin_counters[hostname] = round_robin_counters.get(hostname, 0) + 1
-            proxy_host, proxy_port = proxy_map[idx].split(":", 1)
+        elif balancer is not None:
+            key = None
+            if policy == "hash" and head is not None:
+                key = request_key(params.get("hash_key"), head, addr)
+            available = HEALTH.available
+            if exclude:
+                available = lambda backend: backend not in exclude and HEALTH.available(backend)
+            lease = balancer.acquire(key, available=available)
+            proxy_host, proxy_port = lease.backend.split(":", 1)
         else:
             # Out-of-handle mapped host
             proxy_host, proxy_port = proxy_map[0].split(":", 1)
@@ -144,24 +459,35 @@ def resolve_routing_policy(hostname, routes):
         print("[Proxy] resolve route of hostname {} is a singulair to".format(hostname))
         proxy_host, proxy_port = proxy_map.split(":", 2)
 
-    return proxy_host, proxy_port
+    return proxy_host, proxy_port, lease
 
-######
-def read_full_request(conn):
-    conn.settimeout(3)
-    data = b""
-    try:
-        while True:
-            chunk = conn.recv(4096)
-            if not chunk:
-                break
-            data += chunk
-            if b"\r\n\r\n" in data:
-                break
-    except socket.timeout:
-        pass
-    return data.decode(errors="ignore")
-####
+def select_alternate(hostname, routes, head, addr, exclude):
+    """
+    Another upstream than those of ``exclude``, for a retry or a hedge.
+
+    :rtype tuple: (host, port, lease), or None if there is no other one.
+    """
+    host, port, lease = select_upstream(hostname, routes, head, addr, exclude)
+    if not host or "{}:{}".format(host, port) in exclude:
+        if lease is not None:
+            lease.done()
+        return None
+    return upstream_address(host, port) + (lease,)
+
+def resolve_routing_policy(hostname, routes):
+    """
+    Returns the (host, port) the request for ``hostname`` is forwarded to.
+
+    Like :func:`select_upstream` for callers that do not report the outcome
+    of the request.
+
+    :params hostname (str): hostname of the request.
+    :params routes (dict): dictionary mapping hostnames and location.
+    """
+    proxy_host, proxy_port, lease = select_upstream(hostname, routes)
+    if lease is not None:
+        lease.done()
+    return proxy_host, proxy_port
 
 def handle_client(ip, port, conn, addr, routes):
     """
@@ -174,6 +500,8 @@ def handle_client(ip, port, conn, addr, routes):
 
     The handler sends the backend response back to the client or
     returns 404 if the hostname is unreachable or is not recognized.
+    Requests are read by their framing, so a keep-alive client can send
+    several of them on the connection.
 
     :params ip (str): IP address of the proxy server.
     :params port (int): port number of the proxy server.
@@ -182,45 +510,154 @@ def handle_client(ip, port, conn, addr, routes):
     :params routes (dict): dictionary mapping hostnames and location.
     """
 
-    # request = conn.recv(1024).decode()
-    request = read_full_request(conn)
+    conn.settimeout(KEEPALIVE_TIMEOUT)
+    buffer = bytearray()
+    try:
+        for served in range(1, MAX_KEEPALIVE_REQUESTS + 1):
+            try:
+                head = read_head(conn, buffer)
+                if head is None:
+                    break
+                # Ambiguous framing is refused before any upstream sees it.
+                body_framing(head)
+            except socket.timeout:
+                break
+            except FramingError as e:
+                print("[Proxy] Bad request from {}: {}".format(addr, e))
+                conn.sendall(BAD_REQUEST)
+                break
+
+            # Extract hostname
+            hostname = (head.get("Host") or "").split(":")[0].strip()
+            if not hostname:
+                print(f"[Proxy] Skipping invalid request from {addr}: {head.start_line}")
+                break
+
+            keep_alive = head.keep_alive() and served < MAX_KEEPALIVE_REQUESTS
+            # The table is taken once per request: a reload only affects the
+            # next requests.
+            table = current_routes(routes)
+            route = resolve_location(table.get(hostname), head.target)
+            params = route[2] if route and len(route) > 2 else None
+
+            # Limited clients are answered before any upstream is involved.
+            wait = check_limits(params, hostname, head, addr)
+            if wait:
+                keep_alive = keep_alive and body_framing(head)[0] == NO_BODY
+                conn.sendall(too_many_requests(wait, keep_alive))
+                if not keep_alive:
+                    break
+                continue
+
+            # Static files are served from disk, without any backend.
+            root = params.get("root") if params else None
+            if root is not None:
+                keep_alive = keep_alive and body_framing(head)[0] == NO_BODY
+                head_bytes, path, size = static_response(root, head, keep_alive)
+                conn.sendall(head_bytes)
+                if path is not None:
+                    send_file(conn, path, size)
+                if not keep_alive:
+                    break
+                continue
 
-    # Extract hostname
-    hostname = None
-    for line in request.splitlines():
-        if line.lower().startswith('host:'):
-            hostname = line.split(':', 1)[1].strip().split(':')[0]
-            break
+            # Upgraded connections (WebSocket) become a tunnel to a backend.
+            if is_upgrade(head):
+                tunnel_request(hostname, table, head, conn, buffer, addr, params)
+                break
 
-    if not hostname:
-        first_line = request.split("\r\n", 1)[0] if request else ""
-        if first_line.strip() != "":
-            print(f"[Proxy] Skipping invalid request from {addr}: {first_line}")
+            key, entry = lookup_request(route, hostname, head)
+            if entry is not None and entry.state() != STALE:
+                serve_cached(entry, head, conn, keep_alive, hostname, table, addr)
+                if not keep_alive:
+                    break
+                continue
+
+            # Identical requests in flight share the response of the first.
+            flight = None
+            flight_key = coalesce_key(params, hostname, head)
+            if flight_key is not None:
+                flight, leader = FLIGHTS.join(flight_key)
+                if not leader:
+                    if flight.done.wait(READ_TIMEOUT) and flight.response is not None:
+                        conn.sendall(flight.render(keep_alive))
+                        if not keep_alive:
+                            break
+                        continue
+                    flight = None
+
+            try:
+                # Resolve the matching destination in routes and need conver port
+                # to integer value.
+                resolved_host, resolved_port, lease = select_upstream(hostname, table, head, addr)
+                try:
+                    resolved_host, resolved_port = upstream_address(resolved_host, resolved_port)
+                except ValueError:
+                    print("[Proxy] Resolved_port is not a valid integer")
+
+                if not resolved_host:
+                    conn.sendall(NOT_FOUND)
+                    break
+
+                print("[Proxy] Host name {} is forwarded to {}:{}".format(hostname,resolved_host, resolved_port))
+                span = tracing.start_span(
+                    "proxy {}".format(head.start_line),
+                    kind="server",
+                    parent=tracing.SpanContext.from_header(head.get(tracing.TRACEPARENT)),
+                    attributes={"http.host": hostname, "net.peer": "{}:{}".format(*addr[:2])},
+                )
+                retries = None
+                policy = get_policy(hostname, params)
+                if policy is not None:
+                    retries = RequestRetries(policy, lambda exclude: select_alternate(
+                        hostname, table, head, addr, exclude))
+                with tracing.activate(span, finish=True):
+                    keep_alive = forward_request(resolved_host, resolved_port, head, conn, buffer,
+                                                 keep_alive, lease, key, entry, flight, retries)
+            finally:
+                # Followers of a failed or unshareable flight send their own request.
+                if flight is not None and not flight.done.is_set():
+                    FLIGHTS.complete(flight)
+            if not keep_alive:
+                break
+    except socket.error as e:
+        print("[Proxy] Connection {} aborted: {}".format(addr, e))
+    finally:
         conn.close()
-        return
 
-    # Resolve the matching destination in routes and need conver port
-    # to integer value
-    resolved_host, resolved_port = resolve_routing_policy(hostname, routes)
-    try:
-        resolved_port = int(resolved_port)
-    except ValueError:
-        print("[Proxy] Resolved_port is not a valid integer")
+def serve_cached(entry, head, conn, keep_alive, hostname, table, addr):
+    """
+    Answer a request from a fresh, or stale but revalidatable, cache entry.
 
-    if resolved_host:
-        print("[Proxy] Host name {} is forwarded to {}:{}".format(hostname,resolved_host, resolved_port))
-        response = forward_request(resolved_host, resolved_port, request)        
-    else:
-        response = (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
-    conn.sendall(response)
-    conn.close()
+    A stale entry within its ``stale-while-revalidate`` window is served
+    as is while a background request to a backend refreshes it.
+
+    :params entry (CacheEntry): stored response.
+    :params head (MessageHead): client request head.
+    :params conn (socket.socket): client connection.
+    :params keep_alive (bool): whether the client connection stays open.
+    """
+    fresh = entry.state() == FRESH
+    head_bytes, body = render(entry, head, keep_alive, status="HIT" if fresh else "STALE")
+    conn.sendall(head_bytes)
+    if body:
+        conn.sendall(body)
+    if not fresh:
+        revalidate_entry(entry, head, hostname, table, addr)
+
+def revalidate_entry(entry, head, hostname, table, addr):
+    """Refresh ``entry`` in the background through the host's balancer."""
+    host, port, lease = select_upstream(hostname, table, head, addr)
+    backend = "{}:{}".format(host, port)
+
+    def on_done(latency, ok):
+        HEALTH.observe(backend, latency, ok)
+        if lease is not None:
+            lease.done(latency, ok)
+
+    if not revalidate_in_background(CACHE, entry, *upstream_address(host, port), head, on_done) \
+            and lease is not None:
+        lease.done()
 
 def run_proxy(ip, port, routes):
     """
@@ -237,6 +674,8 @@ def run_proxy(ip, port, routes):
     """
 
     proxy = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    tracing.set_service("proxy:{}".format(port))
+    start_checks(routes)
 
     try:
         proxy.bind((ip, port))
@@ -245,6 +684,9 @@ def run_proxy(ip, port, routes):
         while True:
             try:    
                 conn, addr = proxy.accept()
+                # Heads and bodies are relayed in separate sends; without
+                # this, Nagle holds the body until the client's delayed ACK.
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 #
                 #  TODO: implement the step of the client incomping connection
                 #        using multi-thread programming with the
@@ -259,13 +701,37 @@ def run_proxy(ip, port, routes):
     except socket.error as e:
         print("[Proxy] Socket error: {}".format(e))
 
-def create_proxy(ip, port, routes):
+def start_checks(routes):
+    """
+    Start the active health checks of ``routes`` and keep them following
+    configuration reloads.
+
+    :params routes: a :class:`ConfigSource <daemon.proxyconf.ConfigSource>`
+                    or a plain routes dict.
+    """
+    checker = start_health_checks(current_routes(routes))
+    if isinstance(routes, ConfigSource):
+        routes.on_reload(checker.update)
+    return checker
+
+def create_proxy(ip, port, routes, engine="threaded"):
     """
     Entry point for launching the proxy server.
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (dict): dictionary mapping hostnames and location, or a
+                           :class:`ConfigSource <daemon.proxyconf.ConfigSource>`
+                           reloading it from ``proxy.conf``.
+    :params engine (str): ``threaded`` (one thread per client) or ``asyncio``
+                          (every connection on one event loop, see
+                          :mod:`daemon.aioproxy`).
     """
 
-    run_proxy(ip, port, routes)
+    if engine == "asyncio":
+        from .aioproxy import run_aioproxy
+        run_aioproxy(ip, port, routes)
+    elif engine == "threaded":
+        run_proxy(ip, port, routes)
+    else:
+        raise ValueError("Unknown proxy engine {!r}".format(engine))
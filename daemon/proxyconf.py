@@ -0,0 +1,448 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.proxyconf
+~~~~~~~~~~~~~~~~~
+
+This module compiles ``proxy.conf`` into the routing table of the proxy and
+reloads it while the proxy runs.
+
+The configuration is tokenized (``#`` comments, quoted strings, ``{``, ``}``
+and ``;`` or end of line as directive terminators) and compiled into a
+read-only ``hostname -> (proxy_pass, dist_policy, params)`` mapping.
+``location <prefix> { ... }`` blocks inside a host get routes of their own,
+found by longest prefix through a :class:`LocationTrie <LocationTrie>`. A
+:class:`ConfigSource <ConfigSource>` holds the current table and replaces it
+as a whole, on ``SIGHUP`` or when the file modification time changes. Each
+request takes the table once, so requests in flight finish on the table they
+started with, and a host lookup stays one dict probe. A configuration that
+fails to compile is reported and the running table is kept.
+
+Usage Example:
+--------------
+>>> source = ConfigSource("config/proxy.conf").watch()
+>>> create_proxy("0.0.0.0", 8080, source)
+>>> current_routes(source).get("app.local")
+(('192.168.1.3:9001', '192.168.1.3:9002'), 'round-robin', {'weights': (1, 1)})
+
+"""
+
+import os
+import signal
+import threading
+import time
+from types import MappingProxyType
+
+from .coalesce import parse_coalesce
+from .health import parse_health_check
+from .hedge import parse_hedge, parse_retry
+from .ratelimit import parse_limit
+from .tunnel import parse_tunnel
+
+#: Seconds between two checks of the configuration file modification time.
+WATCH_INTERVAL = 1.0
+
+
+class ConfigError(Exception):
+    """The configuration cannot be compiled."""
+
+    def __init__(self, message, line=None):
+        if line is not None:
+            message = "line {}: {}".format(line, message)
+        super().__init__(message)
+
+
+def tokenize(text):
+    """
+    Split a configuration into tokens.
+
+    :params text (str): configuration text.
+
+    :rtype list: (token, line) pairs; ``;`` also stands for every end of
+                 line so that directives may omit it.
+    """
+    tokens = []
+    i, line, size = 0, 1, len(text)
+    while i < size:
+        char = text[i]
+        if char == "\n":
+            tokens.append((";", line))
+            line += 1
+            i += 1
+        elif char.isspace():
+            i += 1
+        elif char == "#":
+            while i < size and text[i] != "\n":
+                i += 1
+        elif char in "{};":
+            tokens.append((char, line))
+            i += 1
+        elif char in "\"'":
+            end = text.find(char, i + 1)
+            if end < 0:
+                raise ConfigError("unterminated string", line)
+            tokens.append((text[i + 1:end], line))
+            line += text.count("\n", i, end)
+            i = end + 1
+        else:
+            start = i
+            while i < size and not text[i].isspace() and text[i] not in "{};#\"'":
+                i += 1
+            tokens.append((text[start:i], line))
+    return tokens
+
+
+def parse_blocks(tokens):
+    """
+    Group tokens into ``host "<name>" { directives }`` blocks.
+
+    :rtype list: (hostname, [(directive, args, line, children), ...]) pairs,
+                 where children are the directives of a nested block such as
+                 ``location /api { ... }``, None for a simple directive.
+    """
+    blocks = []
+    pos = 0
+    while pos < len(tokens):
+        token, line = tokens[pos]
+        if token == ";":
+            pos += 1
+            continue
+        if token != "host":
+            raise ConfigError("expected 'host', found {!r}".format(token), line)
+        if pos + 2 >= len(tokens) or tokens[pos + 2][0] != "{":
+            raise ConfigError("expected 'host \"<name>\" {'", line)
+        name = tokens[pos + 1][0]
+        directives, pos = _parse_directives(tokens, pos + 3, "host {!r}".format(name), line)
+        blocks.append((name, directives))
+    return blocks
+
+
+def _parse_directives(tokens, pos, block, line):
+    """Directives up to the ``}`` closing ``block``, and the position after it."""
+    directives, words, start = [], [], None
+    while True:
+        if pos >= len(tokens):
+            raise ConfigError("missing '}}' closing {}".format(block), line)
+        token, tline = tokens[pos]
+        pos += 1
+        if token in (";", "}"):
+            if words:
+                directives.append((words[0], words[1:], start, None))
+                words = []
+            if token == "}":
+                return directives, pos
+        elif token == "{":
+            if len(words) != 2 or words[0] != "location":
+                raise ConfigError("unexpected '{'", tline)
+            children, pos = _parse_directives(
+                tokens, pos, "location {!r}".format(words[1]), tline)
+            directives.append((words[0], words[1:], start, children))
+            words = []
+        else:
+            if not words:
+                start = tline
+            words.append(token)
+
+
+class LocationTrie:
+    """
+    Routes of the ``location`` blocks of a host, by path prefix.
+
+    A character trie: :meth:`match` walks the request path once and keeps
+    the deepest prefix ending on the way, so the longest matching location
+    is found in O(path length) whatever the number of locations.
+    """
+
+    __slots__ = ("root", "prefixes")
+
+    def __init__(self):
+        #: node: [children {char: node}, route or None]
+        self.root = [{}, None]
+        self.prefixes = []
+
+    def insert(self, prefix, route):
+        node = self.root
+        for char in prefix:
+            child = node[0].get(char)
+            if child is None:
+                child = node[0][char] = [{}, None]
+            node = child
+        node[1] = route
+        self.prefixes.append(prefix)
+
+    def match(self, path):
+        """Route of the longest location prefix of ``path``, or None."""
+        node = self.root
+        found = node[1]
+        for char in path:
+            node = node[0].get(char)
+            if node is None:
+                break
+            if node[1] is not None:
+                found = node[1]
+        return found
+
+    def routes(self):
+        """Every location route."""
+        stack, routes = [self.root], []
+        while stack:
+            node = stack.pop()
+            if node[1] is not None:
+                routes.append(node[1])
+            stack.extend(node[0].values())
+        return routes
+
+    def __repr__(self):
+        return "LocationTrie({})".format(sorted(self.prefixes))
+
+
+#: Directives a location does not inherit from its host.
+LOCAL_PARAMS = ("weights", "locations", "location", "root")
+
+
+def compile_host(name, directives):
+    """
+    Compile the directives of one host into its route.
+
+    Each ``location <prefix> { ... }`` block is compiled into a route of its
+    own: it has its own ``proxy_pass`` set and ``dist_policy`` (those of the
+    host when it has none) and inherits the other settings of the host
+    unless it overrides them. The locations go to ``params["locations"]``.
+
+    :rtype tuple: (proxy_pass or tuple of them, dist_policy, params).
+    """
+    locations = [(args, line, children) for directive, args, line, children in directives
+                 if children is not None]
+    route = _compile_route(name, [d for d in directives if d[3] is None], {})
+    if not locations:
+        return route
+
+    trie = LocationTrie()
+    for args, line, children in locations:
+        if not args[0].startswith("/"):
+            raise ConfigError("location expects a path prefix", line)
+        if any(child[3] is not None for child in children):
+            raise ConfigError("nested location blocks are not supported", line)
+        inherited = {k: v for k, v in route[2].items() if k not in LOCAL_PARAMS}
+        location = _compile_route(name, children, inherited, default=route)
+        location[2]["location"] = args[0]
+        trie.insert(args[0], (location[0], location[1], MappingProxyType(location[2])))
+    params = dict(route[2])
+    params["locations"] = trie
+    return (route[0], route[1], MappingProxyType(params))
+
+
+def _compile_route(name, directives, params, default=None):
+    """
+    Compile simple directives into a route.
+
+    :params params (dict): inherited settings, updated in place.
+    :params default (tuple): host route whose backends and policy are used
+                             when ``directives`` have no ``proxy_pass``.
+
+    :rtype tuple: (proxy_pass or tuple of them, dist_policy, params); the
+                  params of a host route are read-only.
+    """
+    proxy_passes = []
+    weights = []
+    limits = []
+    dist_policy = None
+    for directive, args, line, _ in directives:
+        if directive == "proxy_pass":
+            if not args or not args[0].startswith(("http://", "unix:")):
+                raise ConfigError("proxy_pass expects http://host:port or unix:/path.sock", line)
+            weight = 1
+            for option in args[1:]:
+                if option.startswith("weight="):
+                    try:
+                        weight = max(int(option[len("weight="):]), 1)
+                    except ValueError:
+                        raise ConfigError("invalid {!r}".format(option), line)
+            if args[0].startswith("unix:"):
+                # Kept as unix:<path>; select_upstream splits it like host:port.
+                proxy_passes.append(args[0])
+            else:
+                proxy_passes.append(args[0][len("http://"):].rstrip("/"))
+            weights.append(weight)
+        elif directive == "dist_policy" and args:
+            dist_policy = args[0]
+        elif directive == "hash_key" and args:
+            params["hash_key"] = args[0]
+        elif directive == "health_check":
+            try:
+                params["health_check"] = MappingProxyType(parse_health_check(" ".join(args)))
+            except ValueError as e:
+                raise ConfigError("invalid health_check: {}".format(e), line)
+        elif directive == "proxy_cache":
+            if args[:1] not in (["on"], ["off"]):
+                raise ConfigError("proxy_cache expects on or off", line)
+            params["proxy_cache"] = args[0] == "on"
+        elif directive == "proxy_coalesce":
+            try:
+                params["coalesce"] = MappingProxyType(parse_coalesce(args))
+            except ValueError as e:
+                raise ConfigError("invalid proxy_coalesce: {}".format(e), line)
+        elif directive in ("proxy_retry", "proxy_hedge"):
+            parse = parse_retry if directive == "proxy_retry" else parse_hedge
+            try:
+                params[directive[len("proxy_"):]] = MappingProxyType(parse(args))
+            except ValueError as e:
+                raise ConfigError("invalid {}: {}".format(directive, e), line)
+        elif directive == "limit_req":
+            try:
+                limits.append(MappingProxyType(parse_limit(args)))
+            except ValueError as e:
+                raise ConfigError("invalid limit_req: {}".format(e), line)
+        elif directive == "proxy_tunnel":
+            try:
+                params["tunnel"] = MappingProxyType(parse_tunnel(args))
+            except ValueError as e:
+                raise ConfigError("invalid proxy_tunnel: {}".format(e), line)
+        elif directive == "root":
+            if len(args) != 1:
+                raise ConfigError("root expects a directory", line)
+            params["root"] = os.path.abspath(args[0])
+        elif directive == "proxy_set_header":
+            pass
+        else:
+            print("[Proxy] Ignoring unknown directive {!r} in host {!r} (line {})".format(
+                directive, name, line))
+
+    if limits:
+        params["limit_req"] = tuple(limits)
+    if default is not None and not proxy_passes:
+        params["weights"] = default[2]["weights"]
+        return (default[0], dist_policy or default[1], params)
+    params["weights"] = tuple(weights)
+    proxy_map = proxy_passes[0] if len(proxy_passes) == 1 else tuple(proxy_passes)
+    route_params = params if default is not None else MappingProxyType(params)
+    return (proxy_map, dist_policy or "round-robin", route_params)
+
+
+def compile_config(text):
+    """
+    Compile a configuration text into a read-only routing table.
+
+    :params text (str): content of ``proxy.conf``.
+
+    :rtype MappingProxyType: hostname -> (proxy_pass, dist_policy, params).
+    """
+    routes = {}
+    for name, directives in parse_blocks(tokenize(text)):
+        routes[name] = compile_host(name, directives)
+    return MappingProxyType(routes)
+
+
+def load_config(path):
+    """Compile the configuration file at ``path``."""
+    with open(path, "r", encoding="utf-8") as f:
+        return compile_config(f.read())
+
+
+class ConfigSource:
+    """
+    The current routing table of a configuration file.
+
+    :attrs path (str): configuration file.
+    :attrs current (MappingProxyType): routing table in use, replaced as a
+                                       whole by :meth:`reload`.
+    :attrs version (int): number of tables loaded so far.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+        self.current = load_config(path)
+        self.version = 1
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def on_reload(self, callback):
+        """Call ``callback(routes)`` with every newly loaded table."""
+        self.listeners.append(callback)
+
+    def reload(self):
+        """
+        Load the file again and swap the table if it compiles.
+
+        :rtype bool: True if a new table is in use.
+        """
+        with self.lock:
+            try:
+                self.mtime = os.stat(self.path).st_mtime_ns
+                routes = load_config(self.path)
+            except (OSError, UnicodeDecodeError, ConfigError) as e:
+                print("[Proxy] Keeping the current routes, cannot load {}: {}".format(self.path, e))
+                return False
+            self.current = routes
+            self.version += 1
+        print("[Proxy] Loaded {} (version {}, {} hosts)".format(self.path, self.version, len(routes)))
+        for callback in self.listeners:
+            callback(routes)
+        return True
+
+    def _poll(self):
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError:
+                continue
+            if mtime != self.mtime:
+                self.reload()
+
+    def watch(self):
+        """
+        Reload on ``SIGHUP`` (where available) and on file changes.
+
+        Must be called from the main thread to install the signal handler.
+
+        :rtype ConfigSource: self.
+        """
+        sighup = getattr(signal, "SIGHUP", None)
+        if sighup is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(sighup, lambda signum, frame: threading.Thread(
+                target=self.reload, daemon=True).start())
+        threading.Thread(target=self._poll, name="config-watch", daemon=True).start()
+        return self
+
+
+def resolve_location(route, target):
+    """
+    Route of a request target within a host route.
+
+    :params route (tuple): routing table entry of the host, or None.
+    :params target (str): request target.
+
+    :rtype tuple: the route of the longest matching ``location``, else
+                  ``route`` itself.
+    """
+    if not route or len(route) < 3:
+        return route
+    locations = route[2].get("locations")
+    if locations is None:
+        return route
+    return locations.match(target.split("?", 1)[0]) or route
+
+
+def current_routes(routes):
+    """
+    The routing table to use for one request.
+
+    :params routes: a :class:`ConfigSource` or a plain routes dict.
+
+    :rtype dict: the table.
+    """
+    if isinstance(routes, ConfigSource):
+        return routes.current
+    return routes
@@ -0,0 +1,181 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.ratelimit
+~~~~~~~~~~~~~~~~~
+
+This module provides the request rate limits of the proxy.
+
+A host may carry any number of ``limit_req`` directives in ``proxy.conf``:
+
+    limit_req ip rate=10 burst=20;
+    limit_req cookie:username rate=5 burst=10;
+    limit_req host rate=200 burst=400;
+
+Each one is a token bucket per key (the client IP, a cookie or header value,
+or the whole host): a request takes a token, tokens come back at ``rate``
+per second and at most ``burst`` are saved. A request finding an empty
+bucket is answered ``429 Too Many Requests`` with ``Retry-After`` by the
+proxy itself, before any upstream is chosen or connected to.
+
+Buckets live in a table bounded to ``MAX_KEYS`` entries; the least recently
+seen key is evicted first. An evicted key was idle, so its bucket had refilled
+and dropping it changes nothing.
+
+Usage Example:
+--------------
+>>> wait = check_limits(params, "tracker.local", head, addr)
+>>> if wait:
+>>>     conn.sendall(too_many_requests(wait, keep_alive=True))
+
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from .balancer import request_key
+
+#: Keys tracked per ``limit_req`` directive.
+MAX_KEYS = 10000
+
+
+class TokenBucketTable:
+    """
+    Token buckets of one limit, keyed by client identity.
+
+    :attrs rate (float): tokens added per second.
+    :attrs burst (float): capacity of a bucket.
+    """
+
+    def __init__(self, rate, burst, max_keys=MAX_KEYS):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """
+        Take one token from the bucket of ``key``.
+
+        :rtype float: 0 if the request may proceed, else the seconds until
+                      a token is available.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = [self.burst, now]
+                self.buckets[key] = bucket
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return 0.0
+            return (1.0 - bucket[0]) / self.rate
+
+
+def parse_limit(args):
+    """
+    Settings of a ``limit_req <key> rate=<r/s> [burst=<n>]`` directive.
+
+    :params args (list): directive arguments; the key is ``ip``, ``host``,
+                         ``cookie:<name>`` or ``header:<name>``.
+
+    :rtype dict: {"key": str, "rate": float, "burst": float}.
+    """
+    if not args:
+        raise ValueError("expected ip, host, cookie:<name> or header:<name>")
+    key = args[0]
+    if key not in ("ip", "host") and not key.startswith(("cookie:", "header:")):
+        raise ValueError("unknown key {!r}".format(key))
+    settings = {"key": key, "rate": None, "burst": None}
+    for arg in args[1:]:
+        name, _, value = arg.partition("=")
+        if name not in ("rate", "burst"):
+            raise ValueError("unknown option {!r}".format(arg))
+        # nginx writes rates as 10r/s
+        settings[name] = float(value[:-len("r/s")] if value.endswith("r/s") else value)
+    if not settings["rate"] or settings["rate"] <= 0:
+        raise ValueError("expected rate=<requests per second>")
+    settings["burst"] = max(settings["burst"] or settings["rate"], 1.0)
+    return settings
+
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_table(hostname, settings):
+    """Bucket table of one ``limit_req`` of a host, kept across reloads."""
+    key = (hostname, settings["key"], settings["rate"], settings["burst"])
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                table = _tables[key] = TokenBucketTable(settings["rate"], settings["burst"])
+    return table
+
+
+def check_limits(params, hostname, head, addr):
+    """
+    Apply the ``limit_req`` directives of a host to one request.
+
+    :params params (dict): route parameters of the host.
+    :params hostname (str): virtual host name.
+    :params head (MessageHead): request head.
+    :params addr (tuple): client address.
+
+    :rtype float: 0 if the request may proceed, else the seconds to wait.
+    """
+    limits = params.get("limit_req") if params else None
+    if not limits:
+        return 0.0
+    wait = 0.0
+    for settings in limits:
+        if settings["key"] == "host":
+            key = hostname
+        else:
+            key = request_key(settings["key"], head, addr)
+        if key is None:
+            continue
+        wait = max(wait, get_table(hostname, settings).take(key))
+    return wait
+
+
+def too_many_requests(wait, keep_alive):
+    """
+    The ``429 Too Many Requests`` answer of a limited request.
+
+    :params wait (float): seconds until the client may retry.
+    :params keep_alive (bool): whether the client connection stays open.
+
+    :rtype bytes: the response.
+    """
+    body = b"429 Too Many Requests"
+    return (
+        "HTTP/1.1 429 Too Many Requests\r\n"
+        "Content-Type: text/plain\r\n"
+        "Content-Length: {}\r\n"
+        "Retry-After: {}\r\n"
+        "Connection: {}\r\n"
+        "\r\n".format(len(body), max(int(math.ceil(wait)), 1),
+                      "keep-alive" if keep_alive else "close")
+    ).encode("latin-1") + body
@@ -0,0 +1,592 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.registry
+~~~~~~~~~~~~~~~~~
+
+This module provides the peer registry of the tracker.
+
+Peers are kept by id (``peer-<owner>``) with two secondary indexes, by owner
+and by ``ip:port``, so registration and every lookup cost one dict probe
+instead of a scan over the peers. Each peer expires ``ttl`` seconds after it
+was last seen unless it renews itself with a heartbeat; deadlines are kept
+in a heap, so pruning only looks at the peers that actually expired.
+
+A heartbeat pushes a new deadline and leaves the old one in the heap; stale
+deadlines are recognized by the peer's ``last_seen`` when they are popped,
+and the heap is rebuilt when they outnumber the peers.
+
+Every registration, update and removal increments the registry ``version``
+and is kept in a change log of the last ``CHANGE_LOG_SIZE`` changes, so
+that a poller holding version ``v`` gets only what changed since ``v``
+(:meth:`PeerRegistry.changes_since`) and a :class:`PeerMirror` stays in
+sync with traffic proportional to the churn instead of to the number of
+peers. Heartbeats only move ``last_seen`` and are not changes. A poller
+too far behind, or holding a version of another registry ``epoch`` (the
+tracker restarted), receives a full snapshot instead.
+
+Full snapshots are read far more often than the registry changes, so
+:meth:`PeerRegistry.encoded_snapshot` keeps the last one encoded as an
+immutable :class:`EncodedSnapshot` (JSON bytes, their gzip and an ETag) and
+encodes it again only after a change; reading it is then just writing
+bytes out.
+
+Watchers (long polls and event streams) block in
+:meth:`PeerRegistry.wait_for_change` on a condition of the registry lock:
+each change wakes every watcher once, and nothing polls in between.
+
+Pages of peers (:meth:`PeerRegistry.query`) are read from sorted indexes
+kept next to the dicts: by owner, by IP address and by ``last_seen``. A
+filter on an owner prefix, a subnet or a last-seen window is a range of one
+of them found with ``bisect``; the smallest range is walked from the
+page cursor and the other filters are checked on its peers only.
+
+All operations take one lock for a few dict operations (``O(log n)`` with
+the heap), and :meth:`PeerRegistry.snapshot` hands out copies, so handler
+threads never see a peer half updated.
+
+Usage Example:
+--------------
+>>> peers = PeerRegistry(ttl=90)
+>>> peers.register("peer-alice", "192.168.1.5", "9005", "alice")
+>>> peers.by_owner("alice")["port"]
+'9005'
+>>> peers.renew("peer-alice")
+True
+>>> peers.changes_since(0)["added"]
+{'peer-alice': {'ip': '192.168.1.5', 'port': '9005', 'owner': 'alice', ...}}
+
+"""
+
+import base64
+import gzip
+import heapq
+import ipaddress
+import json
+import math
+import os
+from bisect import bisect_left, bisect_right, insort
+import threading
+import time
+from collections import deque
+
+#: Seconds a peer stays listed without a heartbeat.
+PEER_TTL = 90.0
+#: Changes kept for pollers asking for a delta.
+CHANGE_LOG_SIZE = 1024
+#: Smallest encoded snapshot that is worth a gzip variant.
+GZIP_MIN_SIZE = 1024
+#: Peers per page when a query gives no limit, and the most it may ask.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Sorts after any owner starting with a prefix.
+_PREFIX_END = "\U0010ffff"
+
+
+class EncodedSnapshot:
+    """
+    Full snapshot of a registry version, encoded once and never modified.
+
+    :attrs version (int): registry version of the snapshot.
+    :attrs body (bytes): ``{"epoch", "version", "full": True,
+                         "active_peers"}`` as JSON.
+    :attrs gzip (bytes): gzip of ``body``, None for a small body.
+    :attrs etag (str): validator of the version, weak so that it stands for
+                       both encodings.
+    """
+
+    __slots__ = ("version", "body", "gzip", "etag")
+
+    def __init__(self, epoch, version, peers):
+        self.version = version
+        self.body = json.dumps({"epoch": epoch, "version": version, "full": True,
+                                "active_peers": peers}).encode("utf-8")
+        self.gzip = gzip.compress(self.body, 6) if len(self.body) >= GZIP_MIN_SIZE else None
+        self.etag = 'W/"{}-{:x}"'.format(epoch, version)
+
+
+class PeerRegistry:
+    """
+    Registered peers with owner and address indexes and TTL expiry.
+
+    :attrs ttl (float): seconds a peer lives without a heartbeat.
+    """
+
+    def __init__(self, ttl=PEER_TTL, log_size=CHANGE_LOG_SIZE):
+        self.ttl = ttl
+        #: Identifies this registry instance: versions of another epoch
+        #: (before a tracker restart) cannot be compared.
+        self.epoch = os.urandom(4).hex()
+        self.version = 0
+        #: (version, peer id, kind, record copy or None), oldest first.
+        self.changes = deque(maxlen=log_size)
+        #: peer id -> {"ip", "port", "owner", "last_seen"}.
+        self.peers = {}
+        self.owners = {}
+        self.addresses = {}
+        #: Sorted (owner, peer id), (IP version, IP as int, peer id) and
+        #: (last_seen, peer id) of the peers, see :meth:`query`.
+        self.owner_index = []
+        self.ip_index = []
+        self.seen_index = []
+        #: (deadline, peer id), possibly stale after a heartbeat.
+        self.deadlines = []
+        self.lock = threading.Lock()
+        #: Notified on every change, see :meth:`wait_for_change`.
+        self.changed = threading.Condition(self.lock)
+        #: Last :class:`EncodedSnapshot`, see :meth:`encoded_snapshot`.
+        self.encoded = None
+        #: Held by the one caller encoding a new snapshot.
+        self.build_lock = threading.Lock()
+
+    def register(self, peer_id, ip, port, owner, now=None):
+        """
+        Add a peer, or update the address of a registered one.
+
+        :rtype dict: a copy of the peer record.
+
+        :raises ValueError: if an argument is not a string.
+        """
+        now = time.time() if now is None else now
+        if not all(isinstance(value, str) for value in (peer_id, ip, port, owner)):
+            raise ValueError("peer id, ip, port and owner must be strings")
+        address = "{}:{}".format(ip, port)
+        record = {"ip": ip, "port": port, "owner": owner, "last_seen": now}
+        # Every index key is built before anything changes: a failure
+        # leaves the registry as it was.
+        keys = self._index_keys(peer_id, record)
+        with self.lock:
+            self._prune(now)
+            old = self.peers.get(peer_id)
+            if old is not None:
+                self._unindex(peer_id, old)
+            self.peers[peer_id] = record
+            self.owners[owner] = peer_id
+            self.addresses[address] = peer_id
+            self._index(keys)
+            self._schedule(peer_id, now)
+            self._log(peer_id, "add" if old is None else "update", record)
+            return dict(record)
+
+    def renew(self, peer_id, now=None):
+        """
+        Heartbeat of a peer: push its expiry ``ttl`` seconds further.
+
+        :rtype bool: False if the peer is not (or no longer) registered.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._prune(now)
+            record = self.peers.get(peer_id)
+            if record is None:
+                return False
+            _discard(self.seen_index, (record["last_seen"], peer_id))
+            record["last_seen"] = now
+            insort(self.seen_index, (now, peer_id))
+            self._schedule(peer_id, now)
+            return True
+
+    def remove(self, peer_id):
+        """
+        Unregister a peer.
+
+        :rtype bool: False if it was not registered.
+        """
+        with self.lock:
+            record = self.peers.pop(peer_id, None)
+            if record is None:
+                return False
+            self._unindex(peer_id, record)
+            self._log(peer_id, "remove", None)
+            return True
+
+    def get(self, peer_id, now=None):
+        """Copy of the record of ``peer_id``, or None."""
+        with self.lock:
+            self._prune(time.time() if now is None else now)
+            record = self.peers.get(peer_id)
+            return dict(record) if record is not None else None
+
+    def by_owner(self, owner, now=None):
+        """Copy of the record of the peer registered by ``owner``, or None."""
+        with self.lock:
+            self._prune(time.time() if now is None else now)
+            record = self.peers.get(self.owners.get(owner))
+            return dict(record) if record is not None else None
+
+    def by_address(self, ip, port, now=None):
+        """Id of the peer listening on ``ip:port``, or None."""
+        with self.lock:
+            self._prune(time.time() if now is None else now)
+            return self.addresses.get("{}:{}".format(ip, port))
+
+    def snapshot(self, now=None):
+        """
+        Every live peer.
+
+        :rtype dict: peer id -> copy of its record.
+        """
+        with self.lock:
+            self._prune(time.time() if now is None else now)
+            return {peer_id: dict(record) for peer_id, record in self.peers.items()}
+
+    def query(self, limit=DEFAULT_PAGE_SIZE, cursor=None, owner=None, subnet=None,
+              seen_within=None, now=None):
+        """
+        One page of the peers matching every given filter.
+
+        Peers come in the order of the index answering the query: by owner,
+        or by address or last heartbeat when that filter selects fewer
+        peers. The cursor remembers the index, so following pages keep the
+        order of the first one.
+
+        :params limit (int): peers per page, at most ``MAX_PAGE_SIZE``.
+        :params cursor (str): ``next`` of the previous page, None for the
+                              first page.
+        :params owner (str): prefix of the owners.
+        :params subnet (str): network of the peer addresses, e.g.
+                              ``192.168.1.0/24``.
+        :params seen_within (float): seconds since the last heartbeat.
+
+        :rtype dict: ``{"epoch", "version", "active_peers", "next"}``;
+                     ``next`` is the cursor of the next page, None after
+                     the last one.
+
+        :raises ValueError: on a malformed cursor, subnet or limit.
+        """
+        now = time.time() if now is None else now
+        limit = int(limit)
+        if not 0 < limit <= MAX_PAGE_SIZE:
+            raise ValueError("limit must be between 1 and {}".format(MAX_PAGE_SIZE))
+        network = ipaddress.ip_network(subnet, strict=False) if subnet else None
+        seen_after = now - float(seen_within) if seen_within is not None else None
+        after = _decode_cursor(cursor) if cursor else None
+
+        with self.lock:
+            self._prune(now)
+            ranges = {"owner": (self.owner_index, 0, len(self.owner_index))}
+            if owner:
+                ranges["owner"] = (self.owner_index, bisect_left(self.owner_index, (owner,)),
+                                   bisect_left(self.owner_index, (owner + _PREFIX_END,)))
+            if network is not None:
+                low = (network.version, int(network.network_address))
+                high = (network.version, int(network.broadcast_address) + 1)
+                ranges["ip"] = (self.ip_index, bisect_left(self.ip_index, low),
+                                bisect_left(self.ip_index, high))
+            if seen_after is not None:
+                ranges["seen"] = (self.seen_index, bisect_left(self.seen_index, (seen_after,)),
+                                  len(self.seen_index))
+
+            if after is not None:
+                name, key = after
+                if name not in ranges:
+                    raise ValueError("cursor of another query")
+            else:
+                name = min(ranges, key=lambda n: ranges[n][2] - ranges[n][1])
+                key = None
+            index, start, end = ranges[name]
+            if key is not None:
+                try:
+                    start = max(start, bisect_right(index, key))
+                except TypeError:
+                    raise ValueError("malformed cursor")
+
+            page, last = {}, None
+            for position in range(start, end):
+                entry = index[position]
+                peer_id = entry[-1]
+                record = self.peers[peer_id]
+                if (owner and not record["owner"].startswith(owner)
+                        or network is not None and not _in_network(record["ip"], network)
+                        or seen_after is not None and record["last_seen"] < seen_after):
+                    continue
+                if len(page) == limit:
+                    break
+                page[peer_id] = dict(record)
+                last = entry
+            else:
+                last = None
+            return {"epoch": self.epoch, "version": self.version, "active_peers": page,
+                    "next": _encode_cursor(name, last) if last is not None else None}
+
+    def encoded_snapshot(self, now=None):
+        """
+        Every live peer, encoded.
+
+        The snapshot is encoded once per change, by the first caller after
+        it, outside of the registry lock. Callers arriving meanwhile get the
+        previous snapshot (they wait only when there is none yet) instead
+        of encoding the same version again. Heartbeats are not changes:
+        ``last_seen`` in the snapshot is the one of its version.
+
+        :rtype EncodedSnapshot: the snapshot of the current version, or of
+                                the previous one while it is being encoded.
+        """
+        with self.lock:
+            self._prune(time.time() if now is None else now)
+            encoded = self.encoded
+            if encoded is not None and encoded.version == self.version:
+                return encoded
+        if not self.build_lock.acquire(blocking=encoded is None):
+            return encoded
+        try:
+            with self.lock:
+                # Encoded by the builder this caller waited for.
+                if self.encoded is not None and self.encoded.version == self.version:
+                    return self.encoded
+                epoch, version = self.epoch, self.version
+                peers = {peer_id: dict(record) for peer_id, record in self.peers.items()}
+            encoded = EncodedSnapshot(epoch, version, peers)
+            with self.lock:
+                self.encoded = encoded
+            return encoded
+        finally:
+            self.build_lock.release()
+
+    def changes_since(self, version, epoch=None, now=None):
+        """
+        What changed after ``version``, for a poller that has applied it.
+
+        :params version (int): last version the poller has, None for none.
+        :params epoch (str): epoch the version belongs to, None if unknown.
+
+        :rtype dict: ``{"epoch", "version", "full": False, "added",
+                     "updated", "removed"}`` with the last state of each
+                     changed peer, or a full snapshot ``{"epoch",
+                     "version", "full": True, "active_peers"}`` when the
+                     change log no longer reaches back to ``version``.
+        """
+        with self.lock:
+            self._prune(time.time() if now is None else now)
+            return self._changes_since(version, epoch)
+
+    def wait_for_change(self, version, epoch=None, timeout=None):
+        """
+        Block until the registry moves past ``version``, then return what
+        changed like :meth:`changes_since`.
+
+        The caller sleeps on :attr:`changed` and is woken by the change
+        itself; it only wakes up earlier to expire peers whose deadline
+        falls within ``timeout``.
+
+        :params timeout (float): seconds to wait at most; the answer is then
+                                 an empty delta.
+
+        :raises ValueError: if ``timeout`` is NaN, which no deadline ever
+                            reaches.
+        """
+        if timeout is not None and math.isnan(timeout):
+            raise ValueError("timeout is NaN")
+        if timeout is not None and math.isinf(timeout):
+            timeout = None if timeout > 0 else 0.0
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.changed:
+            while True:
+                self._prune(time.time())
+                if (version is None or version != self.version
+                        or (epoch is not None and epoch != self.epoch)):
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                if self.deadlines:
+                    expiry = max(self.deadlines[0][0] - time.time(), 0.0)
+                    remaining = expiry if remaining is None else min(remaining, expiry)
+                self.changed.wait(remaining)
+            return self._changes_since(version, epoch)
+
+    def _changes_since(self, version, epoch):
+        oldest = self.changes[0][0] if self.changes else self.version + 1
+        if (version is None or (epoch is not None and epoch != self.epoch)
+                or version > self.version or version < oldest - 1):
+            return {"epoch": self.epoch, "version": self.version, "full": True,
+                    "active_peers": {peer_id: dict(record)
+                                     for peer_id, record in self.peers.items()}}
+        # First kind and last state of every peer changed since then.
+        first, last = {}, {}
+        for change_version, peer_id, kind, record in reversed(self.changes):
+            if change_version <= version:
+                break
+            first[peer_id] = kind
+            last.setdefault(peer_id, record)
+        delta = {"epoch": self.epoch, "version": self.version, "full": False,
+                 "added": {}, "updated": {}, "removed": []}
+        for peer_id, record in last.items():
+            if record is None:
+                # Added and removed in between: the poller never saw it.
+                if first[peer_id] != "add":
+                    delta["removed"].append(peer_id)
+            elif first[peer_id] == "add":
+                delta["added"][peer_id] = dict(record)
+            else:
+                delta["updated"][peer_id] = dict(record)
+        return delta
+
+    def prune(self, now=None):
+        """
+        Drop the peers whose ``ttl`` elapsed since their last heartbeat.
+
+        :rtype list: ids of the dropped peers.
+        """
+        with self.lock:
+            return self._prune(time.time() if now is None else now)
+
+    def __len__(self):
+        return len(self.peers)
+
+    def _schedule(self, peer_id, now):
+        heapq.heappush(self.deadlines, (now + self.ttl, peer_id))
+        if len(self.deadlines) > 2 * len(self.peers) + 64:
+            self.deadlines = [(record["last_seen"] + self.ttl, pid)
+                              for pid, record in self.peers.items()]
+            heapq.heapify(self.deadlines)
+
+    def _log(self, peer_id, kind, record):
+        self.version += 1
+        self.changes.append((self.version, peer_id, kind,
+                             dict(record) if record is not None else None))
+        self.changed.notify_all()
+
+    @staticmethod
+    def _index_keys(peer_id, record):
+        ip_key = _ip_key(record["ip"])
+        return ((record["owner"], peer_id),
+                ip_key + (peer_id,) if ip_key is not None else None,
+                (record["last_seen"], peer_id))
+
+    def _index(self, keys):
+        owner_key, ip_key, seen_key = keys
+        insort(self.owner_index, owner_key)
+        if ip_key is not None:
+            insort(self.ip_index, ip_key)
+        insort(self.seen_index, seen_key)
+
+    def _unindex(self, peer_id, record):
+        _discard(self.owner_index, (record["owner"], peer_id))
+        ip_key = _ip_key(record["ip"])
+        if ip_key is not None:
+            _discard(self.ip_index, ip_key + (peer_id,))
+        _discard(self.seen_index, (record["last_seen"], peer_id))
+        if self.owners.get(record["owner"]) == peer_id:
+            del self.owners[record["owner"]]
+        address = "{}:{}".format(record["ip"], record["port"])
+        if self.addresses.get(address) == peer_id:
+            del self.addresses[address]
+
+    def _prune(self, now):
+        expired = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            deadline, peer_id = heapq.heappop(self.deadlines)
+            record = self.peers.get(peer_id)
+            # A heartbeat since then scheduled a later deadline.
+            if record is None or record["last_seen"] + self.ttl > now:
+                continue
+            del self.peers[peer_id]
+            self._unindex(peer_id, record)
+            self._log(peer_id, "remove", None)
+            expired.append(peer_id)
+        if expired:
+            print("[Registry] Expired peers without heartbeat: {}".format(", ".join(expired)))
+        return expired
+
+
+def _discard(index, key):
+    position = bisect_left(index, key)
+    if position < len(index) and index[position] == key:
+        del index[position]
+
+
+def _ip_key(ip):
+    """(version, integer) of an IP address, None for a host name."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    return (address.version, int(address))
+
+
+def _in_network(ip, network):
+    key = _ip_key(ip)
+    return (key is not None and key[0] == network.version
+            and int(network.network_address) <= key[1] <= int(network.broadcast_address))
+
+
+def _encode_cursor(name, key):
+    raw = json.dumps([name, list(key)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("malformed cursor")
+    if (not isinstance(name, str) or not isinstance(key, list)
+            or not all(isinstance(part, (str, int, float)) for part in key)):
+        raise ValueError("malformed cursor")
+    return name, tuple(key)
+
+
+class PeerMirror:
+    """
+    Local copy of a tracker's peers, kept in sync with deltas.
+
+    Usage::
+
+      >>> mirror = PeerMirror()
+      >>> payload = fetch("/get-list" + mirror.query())
+      >>> mirror.apply(payload)
+      >>> mirror.peers
+    """
+
+    def __init__(self):
+        self.epoch = None
+        self.version = None
+        self.peers = {}
+        self.lock = threading.Lock()
+
+    def query(self):
+        """Query string asking the tracker for the changes since the last sync."""
+        with self.lock:
+            if self.version is None:
+                return ""
+            return "?since={}&epoch={}".format(self.version, self.epoch)
+
+    def snapshot(self):
+        """Copy of the peers, that callers may modify."""
+        with self.lock:
+            return {peer_id: dict(record) for peer_id, record in self.peers.items()}
+
+    def apply(self, payload):
+        """
+        Apply a ``/get-list`` answer, full or delta.
+
+        :rtype dict: copy of the peers after the update, that callers may
+                     modify.
+        """
+        with self.lock:
+            if payload.get("full", True):
+                self.peers = dict(payload.get("active_peers", {}))
+            elif payload.get("epoch") == self.epoch:
+                for peer_id in payload.get("removed", ()):
+                    self.peers.pop(peer_id, None)
+                self.peers.update(payload.get("added", {}))
+                self.peers.update(payload.get("updated", {}))
+            else:
+                # A delta for another epoch cannot be applied; resync.
+                self.version = None
+                return {peer_id: dict(record) for peer_id, record in self.peers.items()}
+            self.epoch = payload.get("epoch")
+            self.version = payload.get("version")
+            return {peer_id: dict(record) for peer_id, record in self.peers.items()}
@@ -18,8 +18,9 @@ This module provides a Request object to manage and persist
 request settings (cookies, auth, proxies).
 """
 from .dictionary import CaseInsensitiveDict
+from . import tracing
 import json as _json
-from urllib.parse import urlparse, urlencode
+from urllib.parse import parse_qsl, urlparse, urlencode
 
 PROXY_IP = "127.0.0.1"
 PROXY_PORT = 8080
@@ -52,7 +53,8 @@ class Request():
         "routes",
         "hook",
         "json",
-        "form"
+        "form",
+        "query"
     ]
 
     def __init__(self):
@@ -64,6 +66,8 @@ class Request():
         self.headers = None
         #: HTTP path
         self.path = None        
+        #: query string parameters of the request target
+        self.query = {}
         # The cookies set used to create Cookie header
         self.cookies = None
         #: request body to send to the server.
@@ -82,6 +86,9 @@ class Request():
             lines = request.splitlines()
             first_line = lines[0]
             method, path, version = first_line.split()
+            # Routes match the path alone; the query string is parsed apart.
+            path, _, query = path.partition('?')
+            self.query = dict(parse_qsl(query))
             if path == '/':
                 path = '/index' # default
             elif path == '/submit-info' and method == 'GET':
@@ -237,6 +244,8 @@ class Request():
         host = parsed_url.hostname
         port = parsed_url.port or 80
         path = parsed_url.path or "/"
+        if parsed_url.query:
+            path = "{}?{}".format(path, parsed_url.query)
 
         print(f"[Request] url: {url} with hostname {host} and port {port}")
 
@@ -262,17 +271,28 @@ class Request():
         else:
             dest = (host, port)
 
+        # Client span, child of the span handling the current request (if any)
+        span = tracing.start_span(
+            "{} {}{}".format(method, host, path),
+            kind="client",
+            attributes={"http.method": method, "http.url": url,
+                        "net.peer": "{}:{}".format(*dest)},
+        )
+        headers[tracing.TRACEPARENT] = span.context.to_header()
+
         request_data = (
             f"{method} {path} HTTP/1.1\r\n" +
             "".join(f"{k}: {v}\r\n" for k, v in headers.items()) +
             "\r\n"
         ).encode("utf-8") + self.body
 
-        with socket.create_connection(dest, timeout=timeout) as sock:
-            sock.sendall(request_data)
-            sock.shutdown(socket.SHUT_WR)
-            response = b""
-            while chunk := sock.recv(4096):
-                response += chunk
+        with tracing.activate(span, finish=True):
+            with socket.create_connection(dest, timeout=timeout) as sock:
+                sock.sendall(request_data)
+                sock.shutdown(socket.SHUT_WR)
+                response = b""
+                while chunk := sock.recv(4096):
+                    response += chunk
+            span.set_attribute("http.status_line", response.split(b"\r\n", 1)[0].decode("latin-1"))
 
         return response.decode("utf-8", errors="ignore")
@@ -23,8 +23,12 @@ The current version supports MIME type detection, content loading and header for
 
 from datetime import datetime, timezone, timedelta
 import os
+from email.utils import formatdate
 from .dictionary import CaseInsensitiveDict
 
+#: Cache-Control of files under static/ (css, js, images).
+STATIC_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=60"
+
 # BASE_DIR = ""
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..')) + os.sep
 
@@ -54,6 +58,19 @@ def _json(data, code=200):
     r.headers["Access-Control-Allow-Origin"] = "*"
     return r
 
+def _stream(chunks, content_type="text/event-stream", code=200):
+    """
+    Response whose body is produced by ``chunks`` (an iterable of bytes)
+    while it is sent, e.g. a generator of server-sent events.
+    """
+    r = Response()
+    r.status_code = code
+    r.headers["Content-Type"] = content_type
+    r.headers["Cache-Control"] = "no-cache"
+    r.content = b""
+    r.stream = chunks
+    return r
+
 def handle_text_other(sub_type):
     if sub_type == 'csv':
         return 'static/'
@@ -107,6 +124,7 @@ class Response():
         "request",
         "body",
         "reason",
+        "stream",
     ]
 
 
@@ -151,6 +169,10 @@ class Response():
         #: The :class:`Request <Request>` object to which this
         #: is a response.
         self.request = request
+
+        #: Iterable of body chunks sent as they are produced, with chunked
+        #: transfer coding (event streams); None for a buffered body.
+        self.stream = None
     
     @property
     def content(self):
@@ -363,7 +385,9 @@ class Response():
         try:
             with open(filepath, 'rb') as f:
                 content = f.read()
+                stat = os.fstat(f.fileno())
             self._content = content
+            self.set_validators(stat, abs_base)
             c_len = self.prepare_content_length(self._content)
             return c_len, self._content
 
@@ -374,6 +398,28 @@ class Response():
             print("[Response] ERROR reading file:", e)
             return 0, self._content
 
+    def set_validators(self, stat, base_dir):
+        """
+        Add ``ETag``/``Last-Modified`` validators of a served file, and let
+        browsers and the proxy cache static assets.
+
+        :params stat (os.stat_result): status of the file.
+        :params base_dir (str): directory the file was served from.
+        """
+        self.headers['ETag'] = '"{:x}-{:x}"'.format(stat.st_mtime_ns // 1000, stat.st_size)
+        self.headers['Last-Modified'] = formatdate(stat.st_mtime, usegmt=True)
+        if os.path.normpath(base_dir).startswith(os.path.normpath(BASE_DIR + "static")):
+            self.headers['Cache-Control'] = STATIC_CACHE_CONTROL
+
+    def not_modified(self, request):
+        """Whether the request's ``If-None-Match`` matches the served file."""
+        etags = (getattr(request, "headers", {}) or {}).get("If-None-Match")
+        etag = self.headers.get('ETag')
+        if not etags or not etag:
+            return False
+        tags = [t.strip() for t in etags.split(",")]
+        return "*" in tags or etag in tags or "W/" + etag in tags
+
     def build_response_header(self, request):
         """
         Constructs the HTTP response headers based on the class:`Request <Request>
@@ -444,6 +490,11 @@ class Response():
         for k, v in rsphdr.items():
             merged[k] = v
 
+        if self.stream is not None:
+            # The length of a streamed body is unknown: chunked framing.
+            merged = {k: v for k, v in merged.items() if k.lower() != "content-length"}
+            merged["Transfer-Encoding"] = "chunked"
+
         printed = set()
         for key, value in merged.items():
             key_lower = key.lower()
@@ -517,7 +568,9 @@ class Response():
         import json
         self.request = request
 
-        if request.method == "OPTIONS":
+        prepared = self.status_code is not None and self._content not in (False, None)
+
+        if request.method == "OPTIONS" and not prepared:
             header_origin = request.headers.get("Origin", "")
             allow_origin = header_origin if header_origin else "*"
 
@@ -542,7 +595,7 @@ class Response():
             return self.headers.encode("utf-8")
         
 
-        if self._content not in (False, None) and self.status_code is not None:
+        if prepared:
             self.prepare_content_length(self._content)
             self.headers = self.build_response_header(request)
             return self.headers + (self._content if isinstance(self._content, (bytes, bytearray)) else str(self._content).encode('utf-8'))
@@ -565,6 +618,12 @@ class Response():
             return json.dumps(self.headers).encode("utf-8") + (self._content if isinstance(self._content, (bytes, bytearray)) else str(self._content).encode('utf-8'))
 
         c_len, self._content = self.build_content(path, base_dir)
+        if self.status_code is None and self.not_modified(request):
+            # The client (or the proxy cache) already has this version.
+            self.status_code = 304
+            self._content = b""
+            self.headers.pop('Content-Length', None)
+            return self.build_response_header(request)
         self.headers = self.build_response_header(request)
 
         if c_len == 0 or self._content == b"404 Not Found":
@@ -0,0 +1,197 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.static
+~~~~~~~~~~~~~~~~~
+
+This module serves static files straight from the proxy.
+
+A host or location with ``root <directory>;`` in ``proxy.conf`` is answered
+from disk without any backend: the file is the directory followed by the
+request path (``location /css/ { root static; }`` serves
+``static/css/styles.css`` for ``/css/styles.css``), like nginx does.
+
+- file metadata (size, validators, content type) is cached for
+  ``STAT_TTL`` seconds, so a popular file costs no ``stat`` call;
+- ``If-None-Match``/``If-Modified-Since`` are answered ``304 Not Modified``;
+- bodies are sent with ``sendfile``, from the page cache to the socket
+  without going through Python.
+
+Validators are computed like the backend does (see
+:meth:`Response.set_validators <daemon.response.Response.set_validators>`),
+so moving a path from a backend to the proxy keeps cached copies valid.
+
+Usage Example:
+--------------
+>>> head_bytes, path, size = static_response("/srv/static", head, keep_alive=True)
+>>> conn.sendall(head_bytes)
+>>> send_file(conn, path, size)
+
+"""
+
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from urllib.parse import unquote
+
+from .cache import not_modified
+from .response import STATIC_CACHE_CONTROL
+
+#: Seconds file metadata is trusted without a new ``stat``.
+STAT_TTL = 1.0
+#: Files whose metadata is cached.
+STAT_CACHE_SIZE = 1024
+
+
+class FileInfo:
+    """
+    Cached metadata of one file.
+
+    :attrs path (str): file system path, None if the file does not exist.
+    :attrs size (int): size in bytes.
+    :attrs headers (list): [name, value] headers of a ``200`` answer.
+    """
+
+    __slots__ = ("path", "size", "headers", "checked")
+
+    def __init__(self, path, stat, checked):
+        self.path = path
+        self.checked = checked
+        self.size = 0
+        self.headers = []
+        if stat is None:
+            return
+        self.size = stat.st_size
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.headers = [
+            ["Content-Type", content_type],
+            ["ETag", '"{:x}-{:x}"'.format(stat.st_mtime_ns // 1000, stat.st_size)],
+            ["Last-Modified", formatdate(stat.st_mtime, usegmt=True)],
+            ["Cache-Control", STATIC_CACHE_CONTROL],
+        ]
+
+    def get(self, name):
+        name = name.lower()
+        for key, value in self.headers:
+            if key.lower() == name:
+                return value
+        return None
+
+
+class StatCache:
+    """LRU of :class:`FileInfo`, each valid for ``ttl`` seconds."""
+
+    def __init__(self, ttl=STAT_TTL, size=STAT_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def lookup(self, path):
+        now = time.monotonic()
+        with self.lock:
+            info = self.entries.get(path)
+            if info is not None and now - info.checked < self.ttl:
+                self.entries.move_to_end(path)
+                return info
+        try:
+            stat = os.stat(path)
+            if not os.path.isfile(path):
+                stat = None
+        except OSError:
+            stat = None
+        info = FileInfo(path if stat is not None else None, stat, now)
+        with self.lock:
+            self.entries[path] = info
+            self.entries.move_to_end(path)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+        return info
+
+
+#: Metadata of the files served by this proxy process.
+STATS = StatCache()
+
+
+def file_path(root, target):
+    """
+    File of a request target under ``root``.
+
+    :params root (str): absolute directory.
+    :params target (str): request target.
+
+    :rtype str: the path, or None if the target leaves ``root``.
+    """
+    path = unquote(target.split("?", 1)[0])
+    if "\0" in path or "\\" in path:
+        return None
+    full = os.path.normpath(os.path.join(root, path.lstrip("/")))
+    if full != root and not full.startswith(root.rstrip(os.sep) + os.sep):
+        return None
+    return full
+
+
+def _answer(status, headers, keep_alive):
+    lines = ["HTTP/1.1 {}".format(status), "Server: WeApRous/0.1",
+             "Date: {}".format(formatdate(usegmt=True))]
+    lines.extend("{}: {}".format(name, value) for name, value in headers)
+    lines.append("Connection: {}".format("keep-alive" if keep_alive else "close"))
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def static_response(root, head, keep_alive):
+    """
+    Answer a request from the files under ``root``.
+
+    :params root (str): absolute directory of the ``root`` directive.
+    :params head (MessageHead): request head.
+    :params keep_alive (bool): whether the client connection stays open.
+
+    :rtype tuple: (head bytes, path of the body file or None, body size).
+    """
+    if head.method not in ("GET", "HEAD"):
+        body = b"405 Method Not Allowed"
+        return _answer("405 Method Not Allowed", [
+            ["Allow", "GET, HEAD"], ["Content-Type", "text/plain"],
+            ["Content-Length", len(body)]], keep_alive) + body, None, 0
+
+    path = file_path(root, head.target)
+    info = STATS.lookup(path) if path is not None else None
+    if info is None or info.path is None:
+        body = b"404 Not Found"
+        return _answer("404 Not Found", [
+            ["Content-Type", "text/plain"], ["Content-Length", len(body)]],
+            keep_alive) + body, None, 0
+
+    if not_modified(info, head):
+        headers = [h for h in info.headers if h[0] != "Content-Type"]
+        return _answer("304 Not Modified", headers, keep_alive), None, 0
+    headers = info.headers + [["Content-Length", info.size]]
+    if head.method == "HEAD":
+        return _answer("200 OK", headers, keep_alive), None, 0
+    return _answer("200 OK", headers, keep_alive), info.path, info.size
+
+
+def send_file(conn, path, size):
+    """
+    Send ``size`` bytes of the file at ``path`` on a blocking socket.
+
+    ``socket.sendfile`` uses ``os.sendfile`` where available.
+    """
+    with open(path, "rb") as f:
+        sent = conn.sendfile(f, 0, size)
+    if sent != size:
+        raise OSError("{} changed while being sent".format(path))
@@ -0,0 +1,298 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.tracing
+~~~~~~~~~~~~~~~~~
+
+This module provides a small distributed tracing facility for the WeApRous
+stack. Trace and span identifiers are generated per hop and propagated between
+processes with the W3C ``traceparent`` header, so that a single user action
+(browser -> proxy -> UI backend -> proxy -> tracker) can be reassembled from
+the spans recorded by each process.
+
+Finished spans are written as JSON lines by a :class:`FileExporter <FileExporter>`
+running in a background thread, so request threads never block on file I/O.
+Export is enabled by setting the ``WEAPROUS_TRACE_FILE`` environment variable
+(or by calling :func:`configure`); identifiers are always propagated.
+
+Usage Example:
+--------------
+>>> from daemon import tracing
+>>> tracing.configure("logs/traces.jsonl", service="proxy:8080")
+>>> span = tracing.start_span("GET /get-list", kind="client")
+>>> headers["traceparent"] = span.context.to_header()
+>>> span.finish()
+
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+#: Name of the propagation header (W3C trace context).
+TRACEPARENT = "traceparent"
+
+_local = threading.local()
+_exporter = None
+_service = os.environ.get("WEAPROUS_SERVICE", "weaprous")
+
+
+class SpanContext:
+    """
+    Identifiers carried across process boundaries.
+
+    :attrs trace_id (str): 32 hex digits shared by every span of a trace.
+    :attrs span_id (str): 16 hex digits identifying one span.
+    :attrs sampled (bool): whether the trace should be recorded.
+    """
+
+    __slots__ = ("trace_id", "span_id", "sampled")
+
+    def __init__(self, trace_id, span_id, sampled=True):
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    def to_header(self):
+        """Encode the context as a ``traceparent`` header value."""
+        return "00-{}-{}-{}".format(self.trace_id, self.span_id, "01" if self.sampled else "00")
+
+    @classmethod
+    def from_header(cls, value):
+        """
+        Decode a ``traceparent`` header value.
+
+        :params value (str): header value, e.g. ``00-<trace>-<span>-01``.
+
+        :rtype SpanContext: the decoded context, or None if malformed.
+        """
+        if not value:
+            return None
+        parts = value.strip().split("-")
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            int(parts[1], 16)
+            int(parts[2], 16)
+            flags = int(parts[3], 16)
+        except ValueError:
+            return None
+        return cls(parts[1], parts[2], bool(flags & 0x01))
+
+
+class Span:
+    """
+    A timed operation inside a trace.
+
+    Spans are created with :func:`start_span` and must be closed with
+    :meth:`finish`, which computes the duration and hands the span to the
+    exporter.
+    """
+
+    __slots__ = ("name", "kind", "context", "parent_id", "attributes",
+                 "start_time", "_start", "duration", "service")
+
+    def __init__(self, name, kind, context, parent_id=None, attributes=None):
+        self.name = name
+        self.kind = kind
+        self.context = context
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.service = _service
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def finish(self):
+        """Close the span and export it. Calling it twice has no effect."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        if _exporter is not None and self.context.sampled:
+            _exporter.export(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "service": self.service,
+            "start": round(self.start_time, 6),
+            "duration_ms": round((self.duration or 0.0) * 1000.0, 3),
+            "attributes": self.attributes,
+        }
+
+
+class FileExporter:
+    """
+    Appends finished spans as JSON lines to a local file.
+
+    Spans are queued by request threads and written in batches by a daemon
+    writer thread. Each batch is written with a single ``write`` call so that
+    several processes can share one file.
+
+    :params path (str): destination file, created if missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.Queue()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self.thread.start()
+
+    def export(self, span):
+        self.queue.put(span)
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def _write(self, batch):
+        lines = "".join(json.dumps(span.to_dict()) + "\n" for span in batch)
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+        except OSError as e:
+            print("[Tracing] Cannot write spans to {}: {}".format(self.path, e))
+
+    def flush(self):
+        """Block until every queued span has been written."""
+        self.queue.join()
+
+
+def configure(path=None, service=None):
+    """
+    Configure the span exporter and the name recorded for this process.
+
+    :params path (str): JSON lines file receiving spans, an empty string
+                        disables export and None keeps the current exporter.
+    :params service (str): service name attached to spans, e.g. ``proxy:8080``.
+    """
+    global _exporter, _service
+    if service:
+        _service = service
+    if path:
+        _exporter = FileExporter(path)
+        atexit.register(_exporter.flush)
+    elif path is not None:
+        _exporter = None
+
+
+def set_service(name):
+    """Set the service name unless one was given through the environment."""
+    global _service
+    if "WEAPROUS_SERVICE" not in os.environ:
+        _service = name
+
+
+def _new_id(bits):
+    return "{:0{}x}".format(random.getrandbits(bits), bits // 4)
+
+
+def current_span():
+    """Return the span active in the calling thread, or None."""
+    return getattr(_local, "span", None)
+
+
+def extract(headers):
+    """
+    Read the propagated context from incoming request headers.
+
+    :params headers (dict): request headers (case-insensitive lookup expected).
+
+    :rtype SpanContext: the remote parent context or None.
+    """
+    if not headers:
+        return None
+    return SpanContext.from_header(headers.get(TRACEPARENT))
+
+
+def start_span(name, kind="internal", parent=None, attributes=None):
+    """
+    Start a new span.
+
+    The parent is, in order of precedence, the explicit ``parent`` (a
+    :class:`Span` or :class:`SpanContext`), the span active in the calling
+    thread, or none at all, in which case a new trace is started.
+
+    :params name (str): operation name.
+    :params kind (str): ``server``, ``client`` or ``internal``.
+    :params parent: optional parent span or context.
+    :params attributes (dict): optional initial attributes.
+
+    :rtype Span: the started span.
+    """
+    if parent is None:
+        parent = current_span()
+    if isinstance(parent, Span):
+        parent = parent.context
+
+    if parent is not None:
+        context = SpanContext(parent.trace_id, _new_id(64), parent.sampled)
+        parent_id = parent.span_id
+    else:
+        context = SpanContext(_new_id(128), _new_id(64))
+        parent_id = None
+    return Span(name, kind, context, parent_id, attributes)
+
+
+@contextmanager
+def activate(span, finish=False):
+    """
+    Make ``span`` the current span of the calling thread for a ``with`` block.
+
+    :params span (Span): the span to activate.
+    :params finish (bool): finish the span when the block exits. An exception
+                           leaving the block is recorded as the ``error``
+                           attribute.
+
+    Usage::
+
+      >>> with tracing.activate(span, finish=True):
+      ...     handler(req)
+    """
+    previous = current_span()
+    _local.span = span
+    try:
+        yield span
+    except BaseException as exc:
+        span.set_attribute("error", repr(exc))
+        raise
+    finally:
+        _local.span = previous
+        if finish:
+            span.finish()
+
+
+if os.environ.get("WEAPROUS_TRACE_FILE"):
+    configure(os.environ["WEAPROUS_TRACE_FILE"])
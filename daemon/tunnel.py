@@ -0,0 +1,184 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.tunnel
+~~~~~~~~~~~~~~~~~
+
+This module lets upgraded connections (WebSocket and any other
+``Connection: Upgrade`` protocol) pass through the proxy.
+
+A request asking for an upgrade is sent to a backend on a connection of its
+own, outside of the pool. When the backend answers ``101 Switching
+Protocols`` the proxy stops parsing HTTP on both connections and relays
+bytes in both directions until either side closes or nothing was sent for
+the idle timeout. Any other answer is relayed as a normal final response.
+
+Tunnels hold a connection to a backend for as long as they live, so each
+host is bounded by ``proxy_tunnel`` in ``proxy.conf``:
+
+    proxy_tunnel max=500 idle=120;
+
+allows 500 open tunnels to the host (``DEFAULT_MAX_TUNNELS`` otherwise),
+closed after 120 seconds without traffic (``DEFAULT_IDLE_TIMEOUT``). An
+upgrade over the limit is answered ``503 Service Unavailable``.
+
+Usage Example:
+--------------
+>>> if is_upgrade(head) and TUNNELS.acquire("app.local", params):
+>>>     relay_tunnel(conn, backend, client_bytes, backend_bytes, idle=300)
+>>>     TUNNELS.release("app.local")
+
+"""
+
+import selectors
+import socket
+import threading
+
+from .framing import RELAY_BUFFER_SIZE
+
+#: Open tunnels allowed per host without a ``proxy_tunnel`` directive.
+DEFAULT_MAX_TUNNELS = 1000
+#: Seconds a tunnel may stay without traffic in either direction.
+DEFAULT_IDLE_TIMEOUT = 300.0
+
+#: Answer to an upgrade beyond the tunnel limit of its host.
+TOO_MANY_TUNNELS = (
+    "HTTP/1.1 503 Service Unavailable\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 19\r\n"
+    "Retry-After: 1\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "Service Unavailable"
+).encode("latin-1")
+
+
+def is_upgrade(head):
+    """Whether the request ``head`` asks to switch protocols."""
+    return bool(head.get("Upgrade")) and head.has_token("Connection", "upgrade")
+
+
+def parse_tunnel(args):
+    """
+    Settings of a ``proxy_tunnel [max=<tunnels>] [idle=<seconds>]`` directive.
+
+    :rtype dict: {"max": int, "idle": float}.
+    """
+    settings = {"max": DEFAULT_MAX_TUNNELS, "idle": DEFAULT_IDLE_TIMEOUT}
+    for arg in args:
+        name, _, value = arg.partition("=")
+        if name == "max":
+            settings["max"] = max(int(value), 0)
+        elif name == "idle":
+            settings["idle"] = float(value)
+            if settings["idle"] <= 0:
+                raise ValueError("idle must be positive")
+        else:
+            raise ValueError("unknown option {!r}".format(arg))
+    return settings
+
+
+def tunnel_settings(params):
+    """``proxy_tunnel`` settings of a route, the defaults when it has none."""
+    settings = params.get("tunnel") if params else None
+    return settings or {"max": DEFAULT_MAX_TUNNELS, "idle": DEFAULT_IDLE_TIMEOUT}
+
+
+class TunnelLimits:
+    """Open tunnels per host, bounded by their ``proxy_tunnel max``."""
+
+    def __init__(self):
+        self.open = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, hostname, params):
+        """
+        Account a new tunnel to ``hostname``.
+
+        :rtype bool: False if the host already has its maximum open; the
+                     tunnel must not be opened then.
+        """
+        limit = tunnel_settings(params)["max"]
+        with self.lock:
+            count = self.open.get(hostname, 0)
+            if count >= limit:
+                return False
+            self.open[hostname] = count + 1
+            return True
+
+    def release(self, hostname):
+        """Account a closed tunnel to ``hostname``."""
+        with self.lock:
+            count = self.open.get(hostname, 0) - 1
+            if count > 0:
+                self.open[hostname] = count
+            else:
+                self.open.pop(hostname, None)
+
+
+#: Open tunnels of this proxy process, for both engines.
+TUNNELS = TunnelLimits()
+
+
+def relay_tunnel(client, backend, client_bytes, backend_bytes, idle,
+                 bufsize=RELAY_BUFFER_SIZE):
+    """
+    Relay bytes between two blocking sockets until the tunnel ends.
+
+    A side that stops sending has its direction shut down on the other
+    socket, and the relay goes on in the opposite direction; the tunnel ends
+    when both directions are closed, on an error, or after ``idle`` seconds
+    without traffic.
+
+    :params client (socket.socket): client connection.
+    :params backend (socket.socket): backend connection.
+    :params client_bytes (bytearray): bytes the client sent past its request.
+    :params backend_bytes (bytearray): bytes the backend sent past its answer.
+    :params idle (float): idle timeout in seconds.
+
+    :rtype tuple: (bytes sent to the backend, bytes sent to the client).
+    """
+    sent = {client: 0, backend: 0}
+    peer = {client: backend, backend: client}
+    if client_bytes:
+        backend.sendall(client_bytes)
+        sent[backend] += len(client_bytes)
+    if backend_bytes:
+        client.sendall(backend_bytes)
+        sent[client] += len(backend_bytes)
+    # A selector (epoll on Linux) works with descriptors above 1024, which
+    # select() does not; long-lived tunnels reach them quickly.
+    with selectors.DefaultSelector() as selector:
+        selector.register(client, selectors.EVENT_READ)
+        selector.register(backend, selectors.EVENT_READ)
+        while selector.get_map():
+            ready = selector.select(idle)
+            if not ready:
+                print("[Proxy] Tunnel idle for {:.0f}s, closing".format(idle))
+                break
+            for key, _ in ready:
+                sock = key.fileobj
+                try:
+                    data = sock.recv(bufsize)
+                except socket.timeout:
+                    continue
+                if not data:
+                    selector.unregister(sock)
+                    try:
+                        peer[sock].shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+                    continue
+                peer[sock].sendall(data)
+                sent[peer[sock]] += len(data)
+    return sent[backend], sent[client]
@@ -10,6 +10,7 @@
 # while attending the course
 #
 
+import time
 from urllib.parse import urlparse, unquote
 
 def get_auth_from_url(url):
@@ -43,3 +44,22 @@ def add_cors(resp):
     resp.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
     resp.headers["Access-Control-Allow-Headers"] = "Content-Type"
     return resp
+
+_date_cache = (0, "")
+
+def http_date():
+    """
+    Current time as an HTTP-date (``Mon, 19 Oct 2026 07:00:00 GMT``).
+
+    The formatted value only changes once per second, so it is cached and
+    reused by every response built within the same second.
+
+    :rtype: str
+    """
+    global _date_cache
+    now = int(time.time())
+    cached_at, value = _date_cache
+    if cached_at != now:
+        value = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(now))
+        _date_cache = (now, value)
+    return value
@@ -18,6 +18,7 @@ This module provides a WeApRous object to deploy RESTful url web app with routin
 """
 
 from .backend import create_backend
+from .middleware import compile_chain
 
 class WeApRous:
     """The fully mutable :class:`WeApRous <WeApRous>` object, which is a lightweight,
@@ -40,6 +41,11 @@ class WeApRous:
       >>> def hello(headers, body):
       >>>     return {'message': 'Hello, world!'}
 
+      >>> app.use(cors())
+      >>> @app.route('/me', methods=['GET'], middleware=[auth('peer1')])
+      >>> def me(req):
+      >>>     return _json({'username': 'peer1'})
+
       >>> app.run()
     """
 
@@ -50,32 +56,58 @@ class WeApRous:
         Sets up an empty route registry and prepares placeholders for IP and port.
         """
         self.routes = {}
+        self.middleware = []
+        self.route_middleware = {}
+        #: Optional :class:`CorsPolicy <CorsPolicy>`; preflights are then
+        #: answered before routing.
+        self.cors = None
         self.ip = None
         self.port = None
+        #: Optional Unix socket path, listened on instead of ip:port.
+        self.unix = None
         return
 
-    def prepare_address(self, ip, port):
+    def prepare_address(self, ip, port, unix=None):
         """
         Configure the IP address and port for the backend server.
 
         :param ip (str): The IP address to bind the server.
         :param port (str): The port number to listen on.
+        :param unix (str): Optional Unix socket path to listen on instead,
+                           for a proxy on the same machine.
         """
         self.ip = ip
         self.port = port
+        self.unix = unix
+
+    def use(self, middleware):
+        """
+        Register an app-wide middleware, applied to every route.
+
+        App-wide middlewares wrap the per-route ones, in registration order.
+        Can be used as a decorator.
+
+        :param middleware (callable): ``middleware(req, call_next)``.
+
+        :rtype: callable - the middleware itself.
+        """
+        self.middleware.append(middleware)
+        return middleware
 
-    def route(self, path, methods=['GET']):
+    def route(self, path, methods=['GET'], middleware=None):
         """
         Decorator to register a route handler for a specific path and HTTP methods.
 
         :param path (str): The URL path to route.
         :param methods (list): A list of HTTP methods (e.g., ['GET', 'POST']) to bind.
+        :param middleware (list): Optional middlewares applied to this route only.
 
         :rtype: function - A decorator that registers the handler function.
         """
         def decorator(func):
             for method in methods:
                 self.routes[(method.upper(), path)] = func
+                self.route_middleware[(method.upper(), path)] = list(middleware or [])
 
             # Optional attach route metadata to the function
             func._route_path = path
@@ -84,6 +116,21 @@ class WeApRous:
             return func
         return decorator
 
+    def compile(self):
+        """
+        Compile every route with its middleware chain.
+
+        Each route becomes a single callable (app-wide middlewares, then the
+        route's own, then the handler), so the request path does not iterate
+        over middleware lists.
+
+        :rtype: dict - mapping of (method, path) to the compiled callable.
+        """
+        return {
+            key: compile_chain(handler, self.middleware + self.route_middleware.get(key, []))
+            for key, handler in self.routes.items()
+        }
+
     def run(self):
         """
         Start the backend server and begin handling requests.
@@ -93,9 +140,10 @@ class WeApRous:
 
         :raise: Error if IP or port has not been configured.
         """
-        if not self.ip or not self.port:
+        if not self.unix and (not self.ip or not self.port):
             print("Rous app need to prepare address"
                   "by calling app.prepare_address(ip, port)")
 
-        create_backend(self.ip, self.port, routes=self.routes)
+        create_backend(self.ip, self.port, routes=self.compile(), cors=self.cors,
+                       unix=self.unix)
         
@@ -23,17 +23,39 @@ server's IP address and port, and then launches the backend server.
 """
 
 import json
+import math
 import argparse
-import time
-from daemon import create_backend
 from daemon.weaprous import WeApRous
-from daemon.response import Response
+from daemon.response import Response, _stream
+from daemon.cors import CorsPolicy
+from daemon.middleware import cors
+from daemon.registry import DEFAULT_PAGE_SIZE, PeerRegistry
 
 # Default port number used if none is specified via command-line arguments.
 PORT = 9000 
 app = WeApRous()
 
-ACTIVE_PEERS = {}
+# Peer pages (http://<peer-ip>:<peer-port>) register through a credentialed
+# cross-origin fetch to /add-list and subscribe to /watch-peers with an
+# EventSource; browsers may cache the preflight 10 minutes.
+app.cors = CorsPolicy(
+    allow_methods=("GET", "POST", "OPTIONS"),
+    allow_headers=("Content-Type",),
+    allow_credentials=True,
+    max_age=600,
+)
+
+# Peers must renew themselves through /heartbeat, see start_peer.py.
+ACTIVE_PEERS = PeerRegistry()
+
+# Query parameters asking /get-list for a page instead of the whole list.
+PAGE_PARAMS = ("limit", "cursor", "owner", "subnet", "seen")
+
+# Longest hold of a /watch-peers long poll; the proxy gives up on an
+# upstream silent for 30 seconds.
+WATCH_TIMEOUT = 25
+# Seconds between keep-alive comments of an event stream.
+EVENT_KEEPALIVE = 15
 
 @app.route("/submit-info", methods=["POST"])
 def submit_info(req):
@@ -58,16 +80,17 @@ def submit_info(req):
         resp.content = b"Bad Request"
         return resp
     
-    for pid, info in ACTIVE_PEERS.items():
-        if info.get("owner") == username:
-            resp.status_code = 400
-            resp.headers["Content-Type"] = "application/json"
-            resp.content = b"Already submit"
-            return resp
+    if ACTIVE_PEERS.by_owner(username) is not None:
+        resp.status_code = 400
+        resp.headers["Content-Type"] = "application/json"
+        resp.content = b"Already submit"
+        return resp
     
     request_add = req
     request_add.json['owner'] = username
-    add_list(request_add)
+    added = add_list(request_add)
+    if added.status_code != 200:
+        return added
 
     print(f"[Server Tracker] submit-info: Peer {peer_id} registered.")
 
@@ -77,34 +100,29 @@ def submit_info(req):
 
     return resp
 
-@app.route("/add-list", methods=["OPTIONS"])
-def add_list_options(req):
-    resp = Response(req)
-    return resp
-
-@app.route("/add-list", methods=["POST"])
+@app.route("/add-list", methods=["POST"], middleware=[cors(app.cors)])
 def add_list(req):
     resp = Response(req)
-    
-    origin = req.headers.get("Origin", "*")
-    resp.headers["Access-Control-Allow-Origin"] = origin
-    resp.headers["Access-Control-Allow-Credentials"] = "true"
-    resp.headers["Access-Control-Allow-Methods"] = "POST, OPTIONS"
-    resp.headers["Access-Control-Allow-Headers"] = "Content-Type"
-    
     data = req.json or {}
     ip = data.get("ip")
-    port = str(data.get("port"))
+    port = data.get("port")
     owner = data.get("owner")
     print("[Server Tracker] add-list: ip is {} and port is {} with owner {}".format(ip, port, owner))
 
+    # Peers send their port as a number or a string.
+    if isinstance(port, int) and not isinstance(port, bool):
+        port = str(port)
+    if not all(isinstance(value, str) and value for value in (ip, port, owner)):
+        resp.status_code = 400
+        resp.headers["Content-Type"] = "application/json"
+        resp.content = json.dumps({
+            "status": "error",
+            "message": "ip, port and owner must be non-empty strings"
+        }).encode("utf-8")
+        return resp
+
     peer_id = f"peer-{owner}"
-    ACTIVE_PEERS[peer_id] = {
-        "ip": ip, 
-        "port": port, 
-        "owner": owner,
-        "last_seen": time.time()
-    }
+    ACTIVE_PEERS.register(peer_id, ip, port, owner)
     print(f"[Server Tracker] add-list: Added {peer_id} ({ip}:{port}) with {owner}")
 
     resp.status_code = 200
@@ -115,16 +133,149 @@ def add_list(req):
     }).encode("utf-8")
     return resp
 
+@app.route("/heartbeat", methods=["POST"])
+def heartbeat(req):
+    resp = Response(req)
+    data = req.json or {}
+    owner = data.get("owner") or req.cookies.get("username", "")
+    peer_id = f"peer-{owner}"
+    resp.headers["Content-Type"] = "application/json"
+
+    if not ACTIVE_PEERS.renew(peer_id):
+        # Expired or never registered: the peer has to submit its info again.
+        print(f"[Server Tracker] heartbeat: Unknown peer {peer_id}")
+        resp.status_code = 404
+        resp.content = json.dumps({"status": "error", "message": f"{peer_id} is not registered"}).encode("utf-8")
+        return resp
+
+    resp.status_code = 200
+    resp.content = json.dumps({"status": "ok", "ttl": ACTIVE_PEERS.ttl}).encode("utf-8")
+    return resp
+
+def parse_since(query):
+    """(version, epoch) of a ``since`` query, (None, None) when absent or invalid."""
+    try:
+        return int(query["since"]), query.get("epoch")
+    except (KeyError, ValueError):
+        return None, None
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an ``Accept-Encoding`` header accepts gzip: listed, or
+    covered by ``*``, with a non-zero q-value (``gzip;q=0`` refuses it).
+    """
+    qualities = {}
+    for member in accept_encoding.split(","):
+        coding, _, params = member.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding] = quality
+    quality = qualities.get("gzip", qualities.get("x-gzip", qualities.get("*", 0.0)))
+    return quality > 0
+
+def peer_events(version, epoch):
+    """Server-sent events of the registry changes after ``version``."""
+    while True:
+        result = ACTIVE_PEERS.wait_for_change(version, epoch, EVENT_KEEPALIVE)
+        if not result["full"] and result["version"] == version:
+            yield b": keep-alive\n\n"
+            continue
+        version, epoch = result["version"], result["epoch"]
+        yield "id: {}:{}\nevent: {}\ndata: {}\n\n".format(
+            epoch, version, "snapshot" if result["full"] else "changes",
+            json.dumps(result)).encode("utf-8")
+
+@app.route("/watch-peers", methods=["GET"], middleware=[cors(app.cors)])
+def watch_peers(req):
+    # ?since=<version>&epoch=<epoch> like /get-list; the answer is held until
+    # the registry changes, or streamed as events with ?stream=sse.
+    version, epoch = parse_since(req.query)
+    if req.query.get("stream") == "sse" or "text/event-stream" in req.headers.get("Accept", ""):
+        last_event = req.headers.get("Last-Event-ID", "")
+        if version is None and ":" in last_event:
+            # Reconnecting EventSource: resume after its last event.
+            epoch, _, last_version = last_event.partition(":")
+            version, epoch = parse_since({"since": last_version, "epoch": epoch})
+        print(f"[Server Tracker] watch-peers: event stream from version {version}")
+        return _stream(peer_events(version, epoch))
+
+    try:
+        timeout = float(req.query.get("timeout", WATCH_TIMEOUT))
+        if not math.isfinite(timeout):
+            raise ValueError("timeout must be finite")
+        timeout = max(0.0, min(timeout, WATCH_TIMEOUT))
+    except ValueError:
+        timeout = WATCH_TIMEOUT
+    result = ACTIVE_PEERS.wait_for_change(version, epoch, timeout)
+    resp = Response(req)
+    resp.status_code = 200
+    resp.headers["Content-Type"] = "application/json"
+    resp.headers["Cache-Control"] = "no-store"
+    resp.content = json.dumps(result).encode("utf-8")
+    return resp
+
 @app.route("/get-list", methods=["GET"])
 def get_list(req):
     resp = Response(req)
     user = req.cookies.get("username")
     current_peer_id = f"peer-{user}"
 
-    print(f"\n[Server Tracker] get-list: Request by {current_peer_id}, peers: {list(ACTIVE_PEERS.keys())}")
+    # ?limit=&cursor=&owner=&subnet=&seen= asks for one page of the peers
+    # matching the filters, read from the registry indexes.
+    if any(name in req.query for name in PAGE_PARAMS):
+        try:
+            page = ACTIVE_PEERS.query(
+                limit=req.query.get("limit", DEFAULT_PAGE_SIZE),
+                cursor=req.query.get("cursor"),
+                owner=req.query.get("owner"),
+                subnet=req.query.get("subnet"),
+                seen_within=req.query.get("seen"),
+            )
+        except ValueError as e:
+            resp.status_code = 400
+            resp.headers["Content-Type"] = "application/json"
+            resp.content = json.dumps({"status": "error", "message": str(e)}).encode("utf-8")
+            return resp
+        print(f"\n[Server Tracker] get-list: Request by {current_peer_id}, page of {len(page['active_peers'])} peers")
+        resp.status_code = 200
+        resp.headers["Content-Type"] = "application/json"
+        resp.content = json.dumps(page).encode("utf-8")
+        return resp
+
+    # ?since=<version>&epoch=<epoch> asks for the changes only (see PeerMirror).
+    since, epoch = parse_since(req.query)
+    result = ACTIVE_PEERS.changes_since(since, epoch) if since is not None else None
     resp.status_code = 200
     resp.headers["Content-Type"] = "application/json"
-    resp.content = json.dumps({"active_peers": ACTIVE_PEERS}).encode("utf-8")
+
+    if result is not None and not result["full"]:
+        print(f"\n[Server Tracker] get-list: Request by {current_peer_id}, changes since version {since}: "
+              f"{len(result['added'])} added, {len(result['updated'])} updated, {len(result['removed'])} removed")
+        resp.content = json.dumps(result).encode("utf-8")
+        return resp
+
+    # Full list: the bytes encoded at the last change of the registry.
+    snapshot = ACTIVE_PEERS.encoded_snapshot()
+    print(f"\n[Server Tracker] get-list: Request by {current_peer_id}, snapshot of version {snapshot.version}")
+    resp.headers["ETag"] = snapshot.etag
+    # Both encodings share the ETag: caches must key them apart.
+    resp.headers["Vary"] = "Accept-Encoding"
+    if snapshot.etag in [t.strip() for t in req.headers.get("If-None-Match", "").split(",")]:
+        resp.status_code = 304
+        resp.content = b""
+    elif snapshot.gzip is not None and accepts_gzip(req.headers.get("Accept-Encoding", "")):
+        resp.headers["Content-Encoding"] = "gzip"
+        resp.content = snapshot.gzip
+    else:
+        resp.content = snapshot.body
     return resp
 
 if __name__ == "__main__":
@@ -137,6 +288,7 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --unix-socket (str): Unix socket path to listen on instead of IP and port.
     """
 
     parser = argparse.ArgumentParser(
@@ -155,9 +307,16 @@ if __name__ == "__main__":
         default=PORT,
         help='Port number to bind the server. Default is {}.'.format(PORT)
     )
+    parser.add_argument(
+        '--unix-socket',
+        type=str,
+        default=None,
+        help='Unix socket path to listen on instead, for a proxy on the same machine.'
+    )
 
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    create_backend(ip, port, routes=app.routes)
+    app.prepare_address(ip, port, unix=args.unix_socket)
+    app.run()
@@ -1,16 +1,29 @@
-import json, time, sys, argparse
+import json, time, sys, argparse, threading
 
 from daemon.weaprous import WeApRous
 from daemon.request import Request
 from daemon.response import Response, _json
-from daemon.utils import add_cors, auth_check
+from daemon.middleware import auth, cors
+from daemon.registry import PeerMirror
 
 TRACKER_URL = "http://tracker.local:9000"
 DB_FILE = "db/database.json"
+# The tracker forgets peers silent for 90 seconds (daemon/registry.py).
+HEARTBEAT_INTERVAL = 30
+# Seconds the tracker holds a /watch-peers long poll.
+WATCH_TIMEOUT = 25
 
 app = WeApRous()
 
+# Only the owner of this peer (logged in through the UI backend) may use it.
+login_required = auth(lambda: app.peer_client.username)
+allow_cors = cors()
+
 LOCAL_ACTIVE_PEERS = {} 
+# Tracker peers, refreshed with the changes since the last /get-list.
+TRACKER_PEERS = PeerMirror()
+# Set while watch_tracker keeps TRACKER_PEERS current.
+WATCHING = threading.Event()
 CONNECTED_LIST = []
 MESSAGES = []           
 MSG_ID_COUNTER = 0
@@ -26,6 +39,8 @@ class Peer:
         
         if not self.cookie.get("auth") == "true":
             raise Exception(f"Cannot find cookie authentication for '{username}'. Please login first.")
+        # Set once the tracker accepted this peer; heartbeats start then.
+        self.registered = False
 
     def _load_cookie(self):
         try:
@@ -58,6 +73,7 @@ class Peer:
             
             if "HTTP/1.1 200 OK" in resp_str:
                 print("[Peer Client] submit-info: Submit info to Server Tracker successfully")
+                self.registered = True
                 return True, None
             else:
                 print(f"[Peer Client] submit-info error: {resp_str.splitlines()[0]}")
@@ -66,6 +82,29 @@ class Peer:
             print(f"[Peer Client] submit-info error: Error when connect to Server Tracker: {e}")
             return False, str(e)
 
+    def send_heartbeat(self):
+        """Renew the registration on the tracker, registering again if it expired."""
+        try:
+            resp_str = Request().send(
+                method="POST",
+                url=f"{TRACKER_URL}/heartbeat",
+                json_data={"owner": self.username},
+                headers={"Cookie": self.cookie_header},
+                useProxy=False
+            )
+        except Exception as e:
+            print(f"[Peer Client] heartbeat error: Error when connect to Server Tracker: {e}")
+            return
+        if "HTTP/1.1 404" in resp_str:
+            print("[Peer Client] heartbeat: Tracker forgot this peer, registering again")
+            self.register_to_server()
+
+    def heartbeat_loop(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            if self.registered:
+                self.send_heartbeat()
+
 @app.route("/submit-info", methods=["GET"])
 def serve_submit(req):
     resp = Response(req)
@@ -85,26 +124,23 @@ def chat(req):
         resp.content = b"File not found: www/chat.html. (Chay 'python peer_backend.py --username user1 --port 9005')"
     return resp
 
-@app.route("/chat_channel.html", methods=["GET"])
+@app.route("/chat_channel.html", methods=["GET"], middleware=[login_required])
 def chat_channel(req):
     resp = Response(req)
-    if not auth_check(app.peer_client.username, req): return _json({"error": "Unauthorized"}, 401)
     with open("www/chat_channel.html", "rb") as f: resp.content = f.read()
     resp.headers["Content-Type"] = "text/html"
     return resp
 
-@app.route("/chat_room.html", methods=["GET"])
+@app.route("/chat_room.html", methods=["GET"], middleware=[login_required])
 def chat_room(req):
     resp = Response(req)
-    if not auth_check(app.peer_client.username, req): return _json({"error": "Unauthorized"}, 401)
     with open("www/chat_room.html", "rb") as f: resp.content = f.read()
     resp.headers["Content-Type"] = "text/html"
     return resp
     
-@app.route("/current_channel.html", methods=["GET"])
+@app.route("/current_channel.html", methods=["GET"], middleware=[login_required])
 def current_channel(req):
     resp = Response(req)
-    if not auth_check(app.peer_client.username, req): return _json({"error": "Unauthorized"}, 401)
     with open("www/current_channel.html", "rb") as f: resp.content = f.read()
     resp.headers["Content-Type"] = "text/html"
     return resp
@@ -170,6 +206,7 @@ def submit_info(req):
     else:
         if error_response and "Already submit" in error_response:
             print("[Peer Client] submit-info: Peer has been submitted.")
+            peer.registered = True
             resp.status_code = 409 
             resp.content = json.dumps({
                 "status": "error", 
@@ -189,18 +226,46 @@ def submit_info(req):
             }).encode("utf-8")
             return resp
 
-@app.route("/get-list", methods=["GET"])
+def watch_tracker():
+    """Keep TRACKER_PEERS current with /watch-peers long polls on the Tracker."""
+    while True:
+        query = TRACKER_PEERS.query()
+        url = f"{TRACKER_URL}/watch-peers{query}{'&' if query else '?'}timeout={WATCH_TIMEOUT}"
+        try:
+            resp_str = Request().send(
+                method="GET",
+                url=url,
+                headers={"Cookie": app.peer_client.cookie_header},
+                timeout=WATCH_TIMEOUT + 10,
+                useProxy=False
+            )
+            header_part, _, body_part = resp_str.partition("\r\n\r\n")
+            if "HTTP/1.1 200 OK" not in header_part:
+                raise Exception(f"Tracker error: {header_part.splitlines()[0] if header_part else 'no response'}")
+            TRACKER_PEERS.apply(json.loads(body_part))
+            WATCHING.set()
+        except Exception as e:
+            print(f"[Peer Client] watch-peers error: {e}")
+            WATCHING.clear()
+            time.sleep(5)
+
+@app.route("/get-list", methods=["GET"], middleware=[login_required, allow_cors])
 def get_list(req):
-    if not auth_check(app.peer_client.username, req): return _json({"error": "Unauthorized"}, 401)
-    
     peer = app.peer_client
+    global LOCAL_ACTIVE_PEERS
+
+    if WATCHING.is_set():
+        # Already in sync with the Tracker, no request needed.
+        LOCAL_ACTIVE_PEERS = TRACKER_PEERS.snapshot()
+        return _json({"active_peers": LOCAL_ACTIVE_PEERS})
+
     print("\n[Peer Client] get-list: forwarding to Tracker...")
     
     try:
         req_to_tracker = Request()
         resp_tracker_raw = req_to_tracker.send(
             method="GET",
-            url=f"{TRACKER_URL}/get-list",
+            url=f"{TRACKER_URL}/get-list{TRACKER_PEERS.query()}",
             headers={"Cookie": peer.cookie_header}, 
             useProxy=False
         )
@@ -212,14 +277,13 @@ def get_list(req):
         if "HTTP/1.1 200 OK" not in header_part:
             raise Exception(f"Tracker error: {header_part.splitlines()[0]}")
 
-        global LOCAL_ACTIVE_PEERS
-        LOCAL_ACTIVE_PEERS = json.loads(body_part).get("active_peers", {})
+        LOCAL_ACTIVE_PEERS = TRACKER_PEERS.apply(json.loads(body_part))
         
         resp = Response(req)
         resp.status_code = 200
         resp.headers["Content-Type"] = "application/json"
-        resp.content = body_part.encode("utf-8")
-        return add_cors(resp)
+        resp.content = json.dumps({"active_peers": LOCAL_ACTIVE_PEERS}).encode("utf-8")
+        return resp
 
     except Exception as e:
         print(f"[Peer Client] get-list error: {e}")
@@ -227,11 +291,8 @@ def get_list(req):
         resp.content = json.dumps({"status": "error", "message": "Can't connect to Tracker"})
         return resp
 
-@app.route("/connect-peer", methods=["POST"])
+@app.route("/connect-peer", methods=["POST"], middleware=[login_required])
 def connect_peer(req):
-    if not auth_check(app.peer_client.username, req):
-        return _json({"error": "Unauthorized"}, 401)
-    
     data = req.json or {}
     me = data.get("from")
     target = data.get("to")
@@ -257,10 +318,8 @@ def connect_peer(req):
     return _json({"status": "ok", "message": f"{me} connected to {target}"})
 
 
-@app.route("/send-peer", methods=["POST"])
+@app.route("/send-peer", methods=["POST"], middleware=[login_required])
 def send_peer(req):
-    if not auth_check(app.peer_client.username, req): return _json({"error": "Unauthorized"}, 401)
-    
     peer = app.peer_client
     data = req.json or {}
     sender = data.get("from")
@@ -305,11 +364,8 @@ def send_peer(req):
     
     return _json({"status": "ok", "message": "sent"})
 
-@app.route("/broadcast-peer", methods=["POST"])
+@app.route("/broadcast-peer", methods=["POST"], middleware=[login_required])
 def broadcast_peer(req):
-    if not auth_check(app.peer_client.username, req): 
-        return _json({"error": "Unauthorized"}, 401)
-
     peer = app.peer_client
     data = req.json or {}
     sender = data.get("from")
@@ -363,20 +419,14 @@ def broadcast_peer(req):
 
     return _json({"status": "ok", "message": "Broadcast finished"})
 
-@app.route("/get-messages", methods=["GET"])
+@app.route("/get-messages", methods=["GET"], middleware=[login_required])
 def get_messages(req):
-    if not auth_check(app.peer_client.username, req): 
-        return _json({"error": "Unauthorized"}, 401)
-        
     print(f"\n[Peer Client] get-messages: Return {len(MESSAGES)} messages.") 
     
     return _json({"messages": MESSAGES})
 
-@app.route("/get-connected", methods=["GET"])
+@app.route("/get-connected", methods=["GET"], middleware=[login_required])
 def get_connected(req):
-    if not auth_check(app.peer_client.username, req):
-        return _json({"error": "Unauthorized"}, 401)
-
     my_peer_id = app.peer_client.peer_id
 
     if not LOCAL_ACTIVE_PEERS:
@@ -403,13 +453,7 @@ def get_connected(req):
     return _json({"connected_peers": connected_peers})
 
 
-@app.route("/receive", methods=["OPTIONS"])
-def receive_options(req):
-    resp = Response(req)
-    resp.status_code = 204
-    return add_cors(resp)
-
-@app.route("/receive", methods=["POST"])
+@app.route("/receive", methods=["POST", "OPTIONS"], middleware=[allow_cors])
 def receive(req):
     peer = app.peer_client
     resp = Response(req)
@@ -429,7 +473,7 @@ def receive(req):
         "ts": data.get("ts", time.strftime("%H:%M:%S"))
     })
     
-    return add_cors(_json({"status": "ok", "message": "received"}))
+    return _json({"status": "ok", "message": "received"})
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -464,6 +508,8 @@ if __name__ == "__main__":
         peer = Peer(username, ip, port)
         app.peer_client = peer
         app.prepare_address(ip, port)
+        threading.Thread(target=peer.heartbeat_loop, daemon=True).start()
+        threading.Thread(target=watch_tracker, daemon=True).start()
         print(f"[Peer Client] Running Peer Backend for {peer.peer_id}")
         print(f"[Peer Client] Running at: http://{ip}:{port}/submit-info")
         
@@ -27,7 +27,7 @@ Requirements:
 - socket: provide socket networking interface.
 - threading: enables concurrent client handling via threads.
 - argparse: parses command-line arguments for server configuration.
-- re: used for regular expression matching in configuration parsing
+- daemon.proxyconf: compiles and reloads the proxy configuration.
 - response: response utilities.
 - httpadapter: the class for handling HTTP requests.
 - urlparse: parses URLs to extract host and port information.
@@ -36,9 +36,11 @@ Requirements:
 """
 
 import argparse
-import re
+import sys
 
 from daemon import create_proxy
+from daemon.cache import configure as configure_cache
+from daemon.proxyconf import ConfigError, ConfigSource, load_config
 
 PROXY_PORT = 8080
 
@@ -46,37 +48,23 @@ def parse_virtual_hosts(config_file):
     """
     Parses virtual host blocks from a config file.
 
+    A ``proxy_pass`` may carry a weight for the ``weighted`` policy, e.g.
+    ``proxy_pass http://127.0.0.1:9001 weight=3;``. The ``hash`` policy
+    reads its key from ``hash_key`` (``ip``, ``cookie:<name>`` or
+    ``header:<name>``). ``health_check /path interval=5 timeout=1 fall=3
+    rise=2;`` enables active probes of the backends and ``proxy_cache on;``
+    the shared response cache. ``location /prefix { ... }`` blocks route
+    the matching paths to their own ``proxy_pass`` set and ``dist_policy``.
+
+    The parsing itself lives in :mod:`daemon.proxyconf`, which also reloads
+    the file while the proxy runs.
+
     :config_file (str): Path to the NGINX config file.
-    :rtype list of dict: Each dict contains 'listen' and 'server_name'.
+    :rtype dict: hostname -> (proxy_pass or tuple of them, dist_policy,
+                 {"weights": (...), "hash_key": ..., "health_check": {...}}).
     """
 
-    with open(config_file, 'r') as f:
-        config_text = f.read()
-
-    host_blocks = re.findall(r'host\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL)
-
-    routes = {}
-    for host, block in host_blocks:
-        proxy_passes = re.findall(r'proxy_pass\s+http://([^\s;]+);', block)
-        
-        policy_match = re.search(r'dist_policy\s+([\w\-]+)', block)
-        dist_policy = policy_match.group(1) if policy_match else 'round-robin'
-        #
-        # @bksysnet: Build the mapping and policy
-        # TODO: this policy varies among scenarios 
-        #       the default policy is provided with one proxy_pass
-        #       In the multi alternatives of proxy_pass then
-        #       the policy is applied to identify the highes matching
-        #       proxy_pass
-        #
-        if len(proxy_passes) == 1:
-            routes[host] = (proxy_passes[0], dist_policy)
-        else:
-            routes[host] = (proxy_passes, dist_policy)
-        # esle if:
-        #         TODO:  apply further policy matching here
-        #
-        
+    routes = load_config(config_file)
     for key, value in routes.items():
         print(key, value)
     return routes
@@ -92,16 +80,33 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --engine (str): threaded (default) or asyncio event loop engine.
+    :arg --cache-size (int): megabytes of responses cached in memory for
+                             hosts with ``proxy_cache on;`` (default: 32).
+    :arg --cache-dir (str): directory of the disk cache tier (default: none).
+    :arg --cache-disk-size (int): megabytes of the disk tier (default: 256).
     """
 
     parser = argparse.ArgumentParser(prog='Proxy', description='', epilog='Proxy daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PROXY_PORT)
+    parser.add_argument('--engine', choices=['threaded', 'asyncio'], default='threaded')
+    parser.add_argument('--cache-size', type=int, default=32)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--cache-disk-size', type=int, default=256)
 
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    routes = parse_virtual_hosts("config/proxy.conf")
+    # The routes follow config/proxy.conf: edit the file (or send SIGHUP)
+    # to reload them without restarting the proxy.
+    try:
+        routes = ConfigSource("config/proxy.conf").watch()
+    except (OSError, ConfigError) as e:
+        sys.exit("[Proxy] Cannot load config/proxy.conf: {}".format(e))
+    for key, value in routes.current.items():
+        print(key, value)
 
-    create_proxy(ip, port, routes)
+    configure_cache(args.cache_size << 20, args.cache_dir, args.cache_disk_size << 20)
+    create_proxy(ip, port, routes, engine=args.engine)
@@ -21,12 +21,16 @@ import argparse
 import json
 import sqlite3
 import os
+from urllib.parse import urlencode
 
 from daemon.weaprous import WeApRous
 from daemon import Response
 from daemon.request import Request
+from daemon.registry import PeerMirror
 
 TRACKER_URL = "http://tracker.local:9000"
+# Query parameters of a /get-list page, see start_backend.py.
+PAGE_PARAMS = ("limit", "cursor", "owner", "subnet", "seen")
 
 PORT = 9001
 DB_PATH = os.path.join("db", "users.db")
@@ -34,6 +38,9 @@ DB_FILE = "db/database.json"
 
 app = WeApRous()
 
+# Peers of the tracker, refreshed with the changes since the last /get-list.
+PEERS = PeerMirror()
+
 # utils #
 def load_db():
     if not os.path.exists(DB_FILE):
@@ -186,11 +193,34 @@ def get_list(req):
     user_cookie_header = req.headers.get("Cookie", "")
 
     tracker_request = Request()
-    
+
+    # A page (?limit=&cursor=&owner=&subnet=&seen=) is asked to the Tracker
+    # as is; it is answered from the Tracker indexes, not from PEERS.
+    if any(name in req.query for name in PAGE_PARAMS):
+        try:
+            resp_tracker_raw = tracker_request.send(
+                method="GET",
+                url=f"{TRACKER_URL}/get-list?{urlencode(req.query)}",
+                headers={"Cookie": user_cookie_header},
+                useProxy=True
+            )
+            header_part, _, body_part = resp_tracker_raw.partition("\r\n\r\n")
+            resp.status_code = 400 if "HTTP/1.1 400" in header_part else 200
+            if resp.status_code == 200 and "HTTP/1.1 200 OK" not in header_part:
+                raise Exception("Tracker returned an error")
+            resp.headers["Content-Type"] = "application/json"
+            resp.content = body_part.encode("utf-8")
+            return resp
+        except Exception as e:
+            print(f"[GET-LIST ERROR] Error when get-list from Tracker: {e}")
+            resp.status_code = 502
+            resp.content = json.dumps({"status": "error", "message": "Can't connect to Tracker"}).encode("utf-8")
+            return resp
+
     try:
         resp_tracker_raw = tracker_request.send(
             method="GET",
-            url=f"{TRACKER_URL}/get-list",
+            url=f"{TRACKER_URL}/get-list{PEERS.query()}",
             headers={"Cookie": user_cookie_header},
             useProxy=True 
         )
@@ -203,9 +233,10 @@ def get_list(req):
         if "HTTP/1.1 200 OK" not in header_part:
           raise Exception("Tracker returned an error")
 
+        peers = PEERS.apply(json.loads(body_part))
         resp.status_code = 200
         resp.headers["Content-Type"] = "application/json"
-        resp.content = body_part.encode("utf-8")
+        resp.content = json.dumps({"active_peers": peers}).encode("utf-8")
         return resp
 
     except Exception as e:
@@ -218,10 +249,11 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='WeApRous', description='Web Dashboard')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PORT)
+    parser.add_argument('--unix-socket', default=None)
 
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
 
-    app.prepare_address(ip, port)
+    app.prepare_address(ip, port, unix=args.unix_socket)
     app.run()
\ No newline at end of file
@@ -99,6 +99,10 @@ async function loadPeers() {
 
 document.getElementById("refresh").addEventListener("click", loadPeers);
 
+// Reload the table whenever the Tracker pushes a change of the peer list.
+const peerEvents = new EventSource(`${TRACKER_URL}/watch-peers?stream=sse`, { withCredentials: true });
+peerEvents.addEventListener("changes", loadPeers);
+
 async function connectPeer(targetId, targetIp, targetPort) {
   const me = `peer-${owner}`;
 
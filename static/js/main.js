@@ -1,13 +1,27 @@
+const TRACKER_URL = "http://tracker.local:9000";
+
 document.addEventListener("DOMContentLoaded", () => {
   const btnRefresh = document.getElementById("btn-refresh");
   const peerListTbody = document.getElementById("peer-list-container");
 
-  btnRefresh.addEventListener("click", fetchPeerList);
+  btnRefresh.addEventListener("click", () => fetchPeerList());
+
+  // Peers are fetched a page at a time; filters given to this page
+  // (?owner=<prefix>&subnet=<cidr>&seen=<seconds>) are passed on.
+  const PAGE_SIZE = 50;
+  const filters = new URLSearchParams(window.location.search);
 
-  async function fetchPeerList() {
-    peerListTbody.innerHTML = '<tr><td colspan="4">Loading...</td></tr>';
+  async function fetchPeerList(cursor) {
+    if (!cursor) {
+      peerListTbody.innerHTML = '<tr><td colspan="4">Loading...</td></tr>';
+    }
     try {
-      const res = await fetch("/get-list");
+      const params = new URLSearchParams({ limit: PAGE_SIZE });
+      ["owner", "subnet", "seen"].forEach((name) => {
+        if (filters.get(name)) params.set(name, filters.get(name));
+      });
+      if (cursor) params.set("cursor", cursor);
+      const res = await fetch(`/get-list?${params}`);
 
       if (res.status === 401) {
         window.location.href = "/login.html";
@@ -19,21 +33,27 @@ document.addEventListener("DOMContentLoaded", () => {
       }
 
       const data = await res.json();
-      renderPeers(data.active_peers);
+      if (!cursor) {
+        peerListTbody.innerHTML = "";
+      }
+      renderPeers(data.active_peers, data.next, !cursor);
     } catch (err) {
       console.error("Failed to load peer list:", err);
       peerListTbody.innerHTML = `<tr><td colspan="4">Error: ${err.message}</td></tr>`;
     }
   }
 
-  function renderPeers(peers) {
-    if (!peers || Object.keys(peers).length === 0) {
+  function renderPeers(peers, next, first) {
+    const more = document.getElementById("btn-more-peers");
+    if (more) {
+      more.closest("tr").remove();
+    }
+
+    if (first && (!peers || Object.keys(peers).length === 0)) {
       peerListTbody.innerHTML = '<tr><td colspan="4">(No active peers)</td></tr>';
       return;
     }
 
-    peerListTbody.innerHTML = "";
-
     Object.entries(peers).forEach(([peerId, info]) => {
       const row = document.createElement('tr');
       row.innerHTML = `
@@ -44,7 +64,22 @@ document.addEventListener("DOMContentLoaded", () => {
       `;
       peerListTbody.appendChild(row);
     });
+
+    if (next) {
+      const row = document.createElement('tr');
+      row.innerHTML = '<td colspan="4"><button id="btn-more-peers">More peers</button></td>';
+      row.querySelector("button").addEventListener("click", () => fetchPeerList(next));
+      peerListTbody.appendChild(row);
+    }
+  }
+
+  // Reload the first page whenever the Tracker pushes a change of the
+  // peer list.
+  function watchPeers() {
+    const events = new EventSource(`${TRACKER_URL}/watch-peers?stream=sse`, { withCredentials: true });
+    events.addEventListener("changes", () => fetchPeerList());
   }
 
   fetchPeerList();
+  watchPeers();
 });
\ No newline at end of file